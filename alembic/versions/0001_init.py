@@ -1,115 +0,0 @@
-"""initial schema
-
-Revision ID: 0001_init
-Revises: 
-Create Date: 2024-12-04
-"""
-
-from alembic import op
-import sqlalchemy as sa
-
-
-# revision identifiers, used by Alembic.
-revision = "0001_init"
-down_revision = None
-branch_labels = None
-depends_on = None
-
-
-def upgrade() -> None:
-    op.create_table(
-        "users",
-        sa.Column("id", sa.String(length=36), nullable=False),
-        sa.Column("username", sa.String(length=128), nullable=False),
-        sa.Column("email", sa.String(length=256), nullable=True),
-        sa.Column("role", sa.String(length=32), nullable=True),
-        sa.Column("password_hash", sa.String(length=256), nullable=True),
-        sa.Column("created_at", sa.DateTime(), nullable=True),
-        sa.Column("updated_at", sa.DateTime(), nullable=True),
-        sa.PrimaryKeyConstraint("id"),
-        sa.UniqueConstraint("email"),
-        sa.UniqueConstraint("username"),
-    )
-
-    op.create_table(
-        "questions",
-        sa.Column("id", sa.String(length=36), nullable=False),
-        sa.Column("question_text", sa.Text(), nullable=False),
-        sa.Column("options", sa.JSON(), nullable=True),
-        sa.Column("answer", sa.Text(), nullable=False),
-        sa.Column("explanation", sa.Text(), nullable=True),
-        sa.Column("has_geometry", sa.Boolean(), nullable=True),
-        sa.Column("geometry_svg", sa.Text(), nullable=True),
-        sa.Column("geometry_tikz", sa.Text(), nullable=True),
-        sa.Column("knowledge_points", sa.JSON(), nullable=True),
-        sa.Column("difficulty", sa.String(length=16), nullable=True),
-        sa.Column("question_type", sa.String(length=16), nullable=True),
-        sa.Column("source", sa.String(length=256), nullable=True),
-        sa.Column("year", sa.Integer(), nullable=True),
-        sa.Column("ai_generated", sa.Boolean(), nullable=True),
-        sa.Column("created_by", sa.String(length=36), nullable=True),
-        sa.Column("created_at", sa.DateTime(), nullable=True),
-        sa.Column("updated_at", sa.DateTime(), nullable=True),
-        sa.PrimaryKeyConstraint("id"),
-    )
-
-    op.create_table(
-        "question_reviews",
-        sa.Column("id", sa.String(length=36), nullable=False),
-        sa.Column("question_id", sa.String(length=36), nullable=False),
-        sa.Column("reviewer_id", sa.String(length=36), nullable=True),
-        sa.Column("status", sa.String(length=32), nullable=True),
-        sa.Column("comment", sa.Text(), nullable=True),
-        sa.Column("created_at", sa.DateTime(), nullable=True),
-        sa.Column("updated_at", sa.DateTime(), nullable=True),
-        sa.ForeignKeyConstraint(
-            ["question_id"],
-            ["questions.id"],
-        ),
-        sa.PrimaryKeyConstraint("id"),
-    )
-
-    op.create_table(
-        "papers",
-        sa.Column("id", sa.String(length=36), nullable=False),
-        sa.Column("title", sa.String(length=256), nullable=False),
-        sa.Column("description", sa.Text(), nullable=True),
-        sa.Column("template_type", sa.String(length=64), nullable=True),
-        sa.Column("total_score", sa.Integer(), nullable=True),
-        sa.Column("time_limit", sa.Integer(), nullable=True),
-        sa.Column("tags", sa.JSON(), nullable=True),
-        sa.Column("subject", sa.String(length=64), nullable=True),
-        sa.Column("grade_level", sa.String(length=64), nullable=True),
-        sa.Column("created_by", sa.String(length=36), nullable=True),
-        sa.Column("created_at", sa.DateTime(), nullable=True),
-        sa.Column("updated_at", sa.DateTime(), nullable=True),
-        sa.Column("published_at", sa.DateTime(), nullable=True),
-        sa.PrimaryKeyConstraint("id"),
-    )
-
-    op.create_table(
-        "paper_questions",
-        sa.Column("id", sa.String(length=36), nullable=False),
-        sa.Column("paper_id", sa.String(length=36), nullable=False),
-        sa.Column("question_id", sa.String(length=36), nullable=False),
-        sa.Column("order", sa.Integer(), nullable=False),
-        sa.Column("score", sa.Integer(), nullable=False),
-        sa.Column("custom_label", sa.String(length=64), nullable=True),
-        sa.ForeignKeyConstraint(
-            ["paper_id"],
-            ["papers.id"],
-        ),
-        sa.ForeignKeyConstraint(
-            ["question_id"],
-            ["questions.id"],
-        ),
-        sa.PrimaryKeyConstraint("id"),
-    )
-
-
-def downgrade() -> None:
-    op.drop_table("question_reviews")
-    op.drop_table("paper_questions")
-    op.drop_table("papers")
-    op.drop_table("questions")
-    op.drop_table("users")
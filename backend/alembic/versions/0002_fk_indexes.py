@@ -0,0 +1,49 @@
+"""add indexes on foreign key columns
+
+Revision ID: 0002_fk_indexes
+Revises: 0001_init
+Create Date: 2026-10-16
+"""
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = "0002_fk_indexes"
+down_revision = "0001_init"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # CREATE INDEX CONCURRENTLY 不能在事务中执行，需放在 autocommit 块内
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_question_reviews_question_id",
+            "question_reviews",
+            ["question_id"],
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+        op.create_index(
+            "ix_paper_questions_question_id",
+            "paper_questions",
+            ["question_id"],
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+        # (paper_id, order) 同时覆盖按 paper_id 的查找与按顺序读取
+        op.create_index(
+            "ix_paper_questions_paper_order",
+            "paper_questions",
+            ["paper_id", "order"],
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index("ix_paper_questions_paper_order", table_name="paper_questions", postgresql_concurrently=True, if_exists=True)
+        op.drop_index("ix_paper_questions_question_id", table_name="paper_questions", postgresql_concurrently=True, if_exists=True)
+        op.drop_index("ix_question_reviews_question_id", table_name="question_reviews", postgresql_concurrently=True, if_exists=True)
@@ -0,0 +1,48 @@
+"""add server-side defaults for ids and timestamps
+
+Revision ID: 0003_server_defaults
+Revises: 0002_fk_indexes
+Create Date: 2026-10-16
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "0003_server_defaults"
+down_revision = "0002_fk_indexes"
+branch_labels = None
+depends_on = None
+
+
+# 表名 -> 时间戳列
+_TIMESTAMP_COLUMNS = {
+    "users": ["created_at", "updated_at"],
+    "questions": ["created_at", "updated_at"],
+    "question_reviews": ["created_at", "updated_at"],
+    "papers": ["created_at", "updated_at"],
+}
+_UUID_TABLES = ["users", "questions", "question_reviews", "papers", "paper_questions"]
+
+
+def upgrade() -> None:
+    # SQLite 不支持 ALTER COLUMN，新库由 create_all 直接带上默认值
+    if op.get_bind().dialect.name != "postgresql":
+        return
+    for table, columns in _TIMESTAMP_COLUMNS.items():
+        for column in columns:
+            op.alter_column(table, column, server_default=sa.text("now()"))
+    # gen_random_uuid() 自 PostgreSQL 13 起内置，无需 pgcrypto
+    for table in _UUID_TABLES:
+        op.alter_column(table, "id", server_default=sa.text("gen_random_uuid()::text"))
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name != "postgresql":
+        return
+    for table in _UUID_TABLES:
+        op.alter_column(table, "id", server_default=None)
+    for table, columns in _TIMESTAMP_COLUMNS.items():
+        for column in columns:
+            op.alter_column(table, column, server_default=None)
@@ -0,0 +1,49 @@
+"""add indexes for question list queries
+
+Revision ID: 0004_question_list_indexes
+Revises: 0003_server_defaults
+Create Date: 2026-10-16
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = "0004_question_list_indexes"
+down_revision = "0003_server_defaults"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    # 0001 中 questions 还没有 is_public 列（由应用启动时补齐），部分索引依赖该列
+    if bind.dialect.name == "postgresql":
+        op.execute("ALTER TABLE questions ADD COLUMN IF NOT EXISTS is_public BOOLEAN DEFAULT FALSE")
+    elif "is_public" not in {c["name"] for c in sa.inspect(bind).get_columns("questions")}:
+        op.add_column("questions", sa.Column("is_public", sa.Boolean(), server_default=sa.false()))
+
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_questions_created_by_created_at",
+            "questions",
+            ["created_by", "created_at"],
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+        op.create_index(
+            "ix_questions_public_created_at",
+            "questions",
+            ["created_at"],
+            postgresql_where=sa.text("is_public = true"),
+            sqlite_where=sa.text("is_public = 1"),
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index("ix_questions_public_created_at", table_name="questions", postgresql_concurrently=True, if_exists=True)
+        op.drop_index("ix_questions_created_by_created_at", table_name="questions", postgresql_concurrently=True, if_exists=True)
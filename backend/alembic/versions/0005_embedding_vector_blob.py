@@ -0,0 +1,33 @@
+"""store question embeddings as float16 bytes
+
+Revision ID: 0005_embedding_vector_blob
+Revises: 0004_question_list_indexes
+Create Date: 2026-10-16
+"""
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = "0005_embedding_vector_blob"
+down_revision = "0004_question_list_indexes"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # question_embeddings 由应用 create_all 创建，0001 中没有该表，故使用 IF EXISTS；
+    # SQLite 需重建表，交给 db._ensure_embedding_nullable 处理
+    if op.get_bind().dialect.name != "postgresql":
+        return
+    op.execute(
+        "ALTER TABLE IF EXISTS question_embeddings "
+        "ADD COLUMN IF NOT EXISTS vector BYTEA, "
+        "ALTER COLUMN embedding DROP NOT NULL"
+    )
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name != "postgresql":
+        return
+    op.execute("ALTER TABLE IF EXISTS question_embeddings DROP COLUMN IF EXISTS vector")
@@ -0,0 +1,57 @@
+"""use jsonb for json columns on postgres
+
+Revision ID: 0006_jsonb_columns
+Revises: 0005_embedding_vector_blob
+Create Date: 2026-10-16
+"""
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = "0006_jsonb_columns"
+down_revision = "0005_embedding_vector_blob"
+branch_labels = None
+depends_on = None
+
+
+_COLUMNS = [
+    ("questions", "options"),
+    ("questions", "knowledge_points"),
+    ("papers", "tags"),
+    ("paper_drafts", "questions_data"),
+]
+
+
+def upgrade() -> None:
+    # JSONB 仅 PostgreSQL 支持；其他数据库保持 JSON
+    if op.get_bind().dialect.name != "postgresql":
+        return
+    for table, column in _COLUMNS:
+        # paper_drafts 由应用 create_all 创建，不在 0001 中，故使用 IF EXISTS
+        op.execute(
+            f"ALTER TABLE IF EXISTS {table} "
+            f"ALTER COLUMN {column} TYPE JSONB USING {column}::jsonb"
+        )
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_questions_knowledge_points_gin",
+            "questions",
+            ["knowledge_points"],
+            postgresql_using="gin",
+            postgresql_ops={"knowledge_points": "jsonb_path_ops"},
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name != "postgresql":
+        return
+    with op.get_context().autocommit_block():
+        op.drop_index("ix_questions_knowledge_points_gin", table_name="questions", postgresql_concurrently=True, if_exists=True)
+    for table, column in _COLUMNS:
+        op.execute(
+            f"ALTER TABLE IF EXISTS {table} "
+            f"ALTER COLUMN {column} TYPE JSON USING {column}::json"
+        )
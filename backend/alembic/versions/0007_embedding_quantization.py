@@ -0,0 +1,27 @@
+"""record the encoding of stored embedding vectors
+
+Revision ID: 0007_embedding_quantization
+Revises: 0006_jsonb_columns
+Create Date: 2026-10-16
+"""
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = "0007_embedding_quantization"
+down_revision = "0006_jsonb_columns"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    if op.get_bind().dialect.name != "postgresql":
+        return
+    op.execute("ALTER TABLE IF EXISTS question_embeddings ADD COLUMN IF NOT EXISTS quantization VARCHAR(8)")
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name != "postgresql":
+        return
+    op.execute("ALTER TABLE IF EXISTS question_embeddings DROP COLUMN IF EXISTS quantization")
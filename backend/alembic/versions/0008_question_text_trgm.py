@@ -0,0 +1,49 @@
+"""trigram indexes for question text search
+
+Revision ID: 0008_question_text_trgm
+Revises: 0007_embedding_quantization
+Create Date: 2026-10-16
+"""
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = "0008_question_text_trgm"
+down_revision = "0007_embedding_quantization"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # 题目搜索使用 ILIKE '%关键词%'，btree 无法使用；pg_trgm 的 GIN 索引可直接加速该查询
+    if op.get_bind().dialect.name != "postgresql":
+        return
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_questions_question_text_trgm",
+            "questions",
+            ["question_text"],
+            postgresql_using="gin",
+            postgresql_ops={"question_text": "gin_trgm_ops"},
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+        op.create_index(
+            "ix_questions_answer_trgm",
+            "questions",
+            ["answer"],
+            postgresql_using="gin",
+            postgresql_ops={"answer": "gin_trgm_ops"},
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name != "postgresql":
+        return
+    with op.get_context().autocommit_block():
+        op.drop_index("ix_questions_answer_trgm", table_name="questions", postgresql_concurrently=True, if_exists=True)
+        op.drop_index("ix_questions_question_text_trgm", table_name="questions", postgresql_concurrently=True, if_exists=True)
@@ -0,0 +1,69 @@
+"""include id in list indexes for keyset pagination
+
+Revision ID: 0009_keyset_indexes
+Revises: 0008_question_text_trgm
+Create Date: 2026-10-16
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = "0009_keyset_indexes"
+down_revision = "0008_question_text_trgm"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # 列表按 (created_at, id) 倒序 keyset 分页；索引带上 id，游标条件可直接做索引范围扫描
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_questions_created_by_created_at_id",
+            "questions",
+            ["created_by", "created_at", "id"],
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+        op.create_index(
+            "ix_questions_public_created_at_id",
+            "questions",
+            ["created_at", "id"],
+            postgresql_where=sa.text("is_public = true"),
+            sqlite_where=sa.text("is_public = 1"),
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+        op.create_index(
+            "ix_papers_created_at_id",
+            "papers",
+            ["created_at", "id"],
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+        op.drop_index("ix_questions_public_created_at", table_name="questions", postgresql_concurrently=True, if_exists=True)
+        op.drop_index("ix_questions_created_by_created_at", table_name="questions", postgresql_concurrently=True, if_exists=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_questions_created_by_created_at",
+            "questions",
+            ["created_by", "created_at"],
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+        op.create_index(
+            "ix_questions_public_created_at",
+            "questions",
+            ["created_at"],
+            postgresql_where=sa.text("is_public = true"),
+            sqlite_where=sa.text("is_public = 1"),
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+        op.drop_index("ix_papers_created_at_id", table_name="papers", postgresql_concurrently=True, if_exists=True)
+        op.drop_index("ix_questions_public_created_at_id", table_name="questions", postgresql_concurrently=True, if_exists=True)
+        op.drop_index("ix_questions_created_by_created_at_id", table_name="questions", postgresql_concurrently=True, if_exists=True)
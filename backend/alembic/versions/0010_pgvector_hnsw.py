@@ -0,0 +1,43 @@
+"""pgvector column and HNSW index for question embeddings
+
+Revision ID: 0010_pgvector_hnsw
+Revises: 0009_keyset_indexes
+Create Date: 2026-10-16
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = "0010_pgvector_hnsw"
+down_revision = "0009_keyset_indexes"
+branch_labels = None
+depends_on = None
+
+# 迁移冻结当时的 embedding 维度（BGE-M3 为 1024），不读取运行时配置；更换维度需新增迁移
+PGVECTOR_DIM = 1024
+
+
+def upgrade() -> None:
+    # 语义检索在库内走 HNSW 近似 top-k；已有向量由应用首次检索时回填 vector_v
+    if op.get_bind().dialect.name != "postgresql":
+        return
+    # question_embeddings 由应用 create_all 创建（0001 中没有），表不存在时跳过
+    if not op.get_context().as_sql and not sa.inspect(op.get_bind()).has_table("question_embeddings"):
+        return
+    op.execute("CREATE EXTENSION IF NOT EXISTS vector")
+    op.execute(f"ALTER TABLE IF EXISTS question_embeddings ADD COLUMN IF NOT EXISTS vector_v vector({PGVECTOR_DIM})")
+    with op.get_context().autocommit_block():
+        op.execute(
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_qemb_hnsw ON question_embeddings "
+            "USING hnsw (vector_v vector_cosine_ops) WITH (m = 16, ef_construction = 200)"
+        )
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name != "postgresql":
+        return
+    with op.get_context().autocommit_block():
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS ix_qemb_hnsw")
+    op.execute("ALTER TABLE question_embeddings DROP COLUMN IF EXISTS vector_v")
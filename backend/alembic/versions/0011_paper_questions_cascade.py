@@ -0,0 +1,38 @@
+"""cascade paper_questions on paper delete
+
+Revision ID: 0011_paper_questions_cascade
+Revises: 0010_pgvector_hnsw
+Create Date: 2026-10-16
+"""
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = "0011_paper_questions_cascade"
+down_revision = "0010_pgvector_hnsw"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # 删除试卷时由数据库级联删除题目关联，接口只需一条 DELETE。
+    # SQLite 不支持修改约束（且默认未启用外键），由删除接口手动清理
+    if op.get_bind().dialect.name != "postgresql":
+        return
+    op.drop_constraint("paper_questions_paper_id_fkey", "paper_questions", type_="foreignkey")
+    op.create_foreign_key(
+        "paper_questions_paper_id_fkey",
+        "paper_questions",
+        "papers",
+        ["paper_id"],
+        ["id"],
+        ondelete="CASCADE",
+    )
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name != "postgresql":
+        return
+    op.drop_constraint("paper_questions_paper_id_fkey", "paper_questions", type_="foreignkey")
+    op.create_foreign_key("paper_questions_paper_id_fkey", "paper_questions", "papers", ["paper_id"], ["id"])
@@ -0,0 +1,50 @@
+"""unique index on paper_drafts.user_id
+
+Revision ID: 0012_paper_drafts_user_unique
+Revises: 0011_paper_questions_cascade
+Create Date: 2026-10-16
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = "0012_paper_drafts_user_unique"
+down_revision = "0011_paper_questions_cascade"
+branch_labels = None
+depends_on = None
+
+# 每个用户保留最近更新的一份草稿（唯一索引建立前清理历史重复数据）；与 db 中的启动时去重一致，此处冻结一份
+_DEDUPE_PAPER_DRAFTS_SQL = """
+DELETE FROM paper_drafts WHERE EXISTS (
+    SELECT 1 FROM paper_drafts d2
+    WHERE d2.user_id = paper_drafts.user_id
+      AND (COALESCE(d2.updated_at, d2.created_at) > COALESCE(paper_drafts.updated_at, paper_drafts.created_at)
+           OR (COALESCE(d2.updated_at, d2.created_at) = COALESCE(paper_drafts.updated_at, paper_drafts.created_at)
+               AND d2.id > paper_drafts.id))
+)
+"""
+
+
+def upgrade() -> None:
+    # 草稿接口每次按 user_id 查询（自动保存频繁）；每个用户只保留一份草稿，索引设为唯一。
+    # paper_questions 按 paper_id 的查询已由 ix_paper_questions_paper_order 的前缀覆盖，无需另建
+    # paper_drafts 由应用 create_all 创建，不在 0001 中，表不存在时跳过
+    if not op.get_context().as_sql and not sa.inspect(op.get_bind()).has_table("paper_drafts"):
+        return
+    op.execute(_DEDUPE_PAPER_DRAFTS_SQL)
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_paper_drafts_user_id",
+            "paper_drafts",
+            ["user_id"],
+            unique=True,
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index("ix_paper_drafts_user_id", table_name="paper_drafts", postgresql_concurrently=True, if_exists=True)
@@ -0,0 +1,47 @@
+"""track when each question embedding was last written
+
+Revision ID: 0013_embedding_updated_at
+Revises: 0012_paper_drafts_user_unique
+Create Date: 2026-10-16
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = "0013_embedding_updated_at"
+down_revision = "0012_paper_drafts_user_unique"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # 多 worker 各自维护进程内向量索引，用 count(*) + max(updated_at) 判断是否需要重建。
+    # question_embeddings 由应用 create_all 创建（0001 中没有），应用启动时也可能已补过该列
+    bind = op.get_bind()
+    if bind.dialect.name == "postgresql":
+        op.execute("ALTER TABLE IF EXISTS question_embeddings ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP")
+        return
+    if op.get_context().as_sql:
+        return
+    inspector = sa.inspect(bind)
+    if not inspector.has_table("question_embeddings"):
+        return
+    if "updated_at" in {c["name"] for c in inspector.get_columns("question_embeddings")}:
+        return
+    op.add_column("question_embeddings", sa.Column("updated_at", sa.DateTime(), nullable=True))
+
+
+def downgrade() -> None:
+    bind = op.get_bind()
+    if bind.dialect.name == "postgresql":
+        op.execute("ALTER TABLE IF EXISTS question_embeddings DROP COLUMN IF EXISTS updated_at")
+        return
+    if op.get_context().as_sql:
+        return
+    inspector = sa.inspect(bind)
+    if not inspector.has_table("question_embeddings"):
+        return
+    if "updated_at" in {c["name"] for c in inspector.get_columns("question_embeddings")}:
+        op.drop_column("question_embeddings", "updated_at")
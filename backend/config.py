@@ -6,6 +6,9 @@ from pydantic_settings import BaseSettings
 
 class Settings(BaseSettings):
     database_url: str = "sqlite:///./app.db"
+    # 连接池（仅对非 SQLite 生效）
+    db_pool_size: int = 10
+    db_max_overflow: int = 20
     
     # AI Provider选择: "gemini" 或 "openai"
     ai_provider: str = "gemini"
@@ -18,11 +21,25 @@ class Settings(BaseSettings):
     openai_api_key: Optional[str] = None
     openai_model: str = "gpt-4o"
     openai_base_url: Optional[str] = None  # 如 http://localhost:3000/v1 用于代理
+
+    # 模型调用限流（每个 worker 独立）：同时进行的请求数上限；每秒最多发起的请求数，0 为不限
+    ai_max_concurrency: int = 4
+    ai_rps: float = 0
+    # 合批（仅 openai 兼容接口）：ai_batch_wait_ms 窗口内的多张图片合成一次多图请求，最多 ai_batch_size 张；
+    # 1 为不合批。合批减少调用次数，但单次响应更长、质量依赖模型，默认关闭
+    ai_batch_size: int = 1
+    ai_batch_wait_ms: int = 100
     
     # 硅基流动 Embedding 配置
     siliconflow_api_key: Optional[str] = None
     siliconflow_base_url: str = "https://api.siliconflow.cn/v1"
     siliconflow_embed_model: str = "BAAI/bge-m3"  # 效果好的中文 embedding 模型
+    # 向量存储精度: "f16" 或 "i8"（int8 标量量化，体积减半，相似度误差约 1e-3）
+    embedding_quantization: str = "f16"
+    # PostgreSQL + pgvector：向量同时写入 vector(pgvector_dim) 列，检索走 HNSW 索引；
+    # 维度需与 embedding 模型一致（bge-m3 为 1024），不一致的向量只走进程内检索
+    pgvector_dim: int = 1024
+    pgvector_ef_search: int = 40
     
     # 安全配置
     secret_key: str = "change-me"
@@ -32,11 +49,20 @@ class Settings(BaseSettings):
     # 注册邀请码（为空则不需要邀请码）
     invite_code: Optional[str] = None
 
+    # Redis（可选）：多 worker 共享验证码等短期状态，如 redis://localhost:6379/0
+    redis_url: Optional[str] = None
+
     class Config:
         env_file = ".env"
         env_file_encoding = "utf-8"
+        # 全进程共享同一实例，禁止运行时修改
+        frozen = True
+
+
+# 导入时解析一次 .env / 环境变量；gunicorn --preload 下 fork 出的 worker 直接继承
+SETTINGS = Settings()
 
 
 @lru_cache
 def get_settings() -> Settings:
-    return Settings()
+    return SETTINGS
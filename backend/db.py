@@ -1,20 +1,65 @@
+import logging
 import os
 from contextlib import contextmanager
+from itertools import islice
 
-from sqlalchemy import create_engine, text
+from sqlalchemy import create_engine, event, inspect, text
 from sqlalchemy.orm import declarative_base, sessionmaker
+from sqlalchemy.pool import QueuePool, StaticPool
 
 from config import get_settings
 
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None
+
+
+logger = logging.getLogger(__name__)
 
 settings = get_settings()
 DATABASE_URL = settings.database_url
 _is_sqlite = DATABASE_URL.startswith("sqlite")
 
-engine = create_engine(
-    DATABASE_URL,
-    connect_args={"check_same_thread": False} if _is_sqlite else {},
-)
+if _is_sqlite and ":memory:" in DATABASE_URL:
+    # 内存库每个连接都是独立数据库，必须共享同一连接
+    _engine_kwargs = dict(
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+elif _is_sqlite:
+    _engine_kwargs = dict(
+        # timeout：写锁被占用时等待（sqlite3 的 busy handler）而非立即报 database is locked；
+        # 默认 5 秒在 PDF 导出等长事务期间容易超时
+        connect_args={"check_same_thread": False, "timeout": 30},
+        pool_pre_ping=True,
+    )
+else:
+    _engine_kwargs = dict(
+        poolclass=QueuePool,
+        pool_size=settings.db_pool_size,
+        max_overflow=settings.db_max_overflow,
+        pool_timeout=30,
+        pool_recycle=1800,
+        pool_pre_ping=True,
+    )
+
+engine = create_engine(DATABASE_URL, **_engine_kwargs)
+
+
+if _is_sqlite:
+    @event.listens_for(engine, "connect")
+    def _sqlite_pragmas(dbapi_conn, _):
+        # WAL 让读写互不阻塞；synchronous=NORMAL 在 WAL 下仍保证崩溃一致性，且免去每次提交的 fsync
+        cur = dbapi_conn.cursor()
+        cur.execute("PRAGMA journal_mode=WAL")
+        cur.execute("PRAGMA synchronous=NORMAL")
+        cur.execute("PRAGMA temp_store=MEMORY")
+        cur.execute("PRAGMA cache_size=-64000")  # 约 64MB 页缓存
+        cur.execute("PRAGMA mmap_size=268435456")  # 256MB
+        cur.close()
+
+
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
@@ -23,45 +68,278 @@ def init_db():
     from models import orm  # noqa: F401  # ensure models are imported
     from models import review  # noqa: F401
 
-    Base.metadata.create_all(bind=engine)
-    _ensure_extra_columns()
+    with _startup_ddl_lock():
+        Base.metadata.create_all(bind=engine)
+        _ensure_extra_columns()
+        _ensure_embedding_nullable()
+        _dedupe_paper_drafts()
+        _ensure_indexes()
+        _ensure_paper_question_cascade()
+        _ensure_trgm_indexes()
+        _ensure_pgvector()
+
+
+# 启动期建表 / 补列的 PostgreSQL advisory lock 键（任意固定值，各 worker 一致即可）
+_STARTUP_DDL_LOCK_KEY = 0x7A756A75
+
+
+@contextmanager
+def _startup_ddl_lock():
+    """
+    多个 worker（WEB_CONCURRENCY > 1）同时启动时串行执行 init_db 的 DDL，
+    避免并发建索引、重建 SQLite 表互相冲突：PostgreSQL 用 advisory lock，SQLite 用数据库文件旁的文件锁。
+    后进入的 worker 再执行时各步骤均已完成，只做检查。
+    """
+    if DATABASE_URL.startswith("postgres"):
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            conn.execute(text("SELECT pg_advisory_lock(:key)"), {"key": _STARTUP_DDL_LOCK_KEY})
+            try:
+                yield
+            finally:
+                conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": _STARTUP_DDL_LOCK_KEY})
+        return
+    path = engine.url.database if _is_sqlite else None
+    if not path or path == ":memory:" or fcntl is None:
+        yield
+        return
+    with open(f"{path}.init.lock", "w") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+# 需要自动补齐的列：表名 -> [(列名, SQLite 类型定义, PostgreSQL 类型定义)]
+_EXTRA_COLUMNS = {
+    "questions": [
+        ("is_public", "BOOLEAN DEFAULT 0", "BOOLEAN DEFAULT FALSE"),
+        ("status", "VARCHAR(32) DEFAULT 'pending'", "VARCHAR(32) DEFAULT 'pending'"),
+        ("is_high_school", "BOOLEAN DEFAULT 1", "BOOLEAN DEFAULT TRUE"),
+    ],
+    "question_embeddings": [
+        ("vector", "BLOB", "BYTEA"),
+        ("quantization", "VARCHAR(8)", "VARCHAR(8)"),
+        ("updated_at", "DATETIME", "TIMESTAMP"),
+    ],
+}
 
 
 def _ensure_extra_columns():
     """
-    简单迁移：如 questions 表缺少新增列，则自动添加。
+    简单迁移：如表缺少新增列，则自动添加。
+    每张表只反射一次列信息；列都已存在时不执行任何 DDL。
     仅做轻量防护，真正生产环境应使用 Alembic。
     """
-    def _ensure_column_sqlite(conn, col_name, col_type):
-        res = conn.execute(text("PRAGMA table_info(questions);"))
-        cols = [row[1] for row in res.fetchall()]
-        if col_name not in cols:
-            conn.execute(text(f"ALTER TABLE questions ADD COLUMN {col_name} {col_type};"))
-
-    def _ensure_column_pg(conn, col_name, col_type, default_sql=""):
-        res = conn.execute(
-            text("SELECT column_name FROM information_schema.columns WHERE table_name='questions';")
-        )
-        cols = [row[0] for row in res.fetchall()]
-        if col_name not in cols:
-            conn.execute(text(f"ALTER TABLE questions ADD COLUMN {col_name} {col_type} {default_sql};"))
+    is_pg = DATABASE_URL.startswith("postgres")
+    if not (_is_sqlite or is_pg):
+        # 其他数据库不做自动迁移
+        return
 
     try:
         with engine.begin() as conn:
-            if _is_sqlite:
-                _ensure_column_sqlite(conn, "is_public", "BOOLEAN DEFAULT 0")
-                _ensure_column_sqlite(conn, "status", "VARCHAR(32) DEFAULT 'pending'")
-                _ensure_column_sqlite(conn, "is_high_school", "BOOLEAN DEFAULT 1")
-            elif DATABASE_URL.startswith("postgres"):
-                _ensure_column_pg(conn, "is_public", "BOOLEAN", "DEFAULT FALSE")
-                _ensure_column_pg(conn, "status", "VARCHAR(32)", "DEFAULT 'pending'")
-                _ensure_column_pg(conn, "is_high_school", "BOOLEAN", "DEFAULT TRUE")
-            else:
-                # 其他数据库不做自动迁移
-                pass
+            inspector = inspect(conn)
+            for table, columns in _EXTRA_COLUMNS.items():
+                existing = {c["name"] for c in inspector.get_columns(table)}
+                missing = [col for col in columns if col[0] not in existing]
+                if not missing:
+                    continue
+                if is_pg:
+                    # 合并为一条 ALTER，只获取一次表锁
+                    clauses = ", ".join(f"ADD COLUMN {name} {pg_type}" for name, _, pg_type in missing)
+                    conn.execute(text(f"ALTER TABLE {table} {clauses};"))
+                else:
+                    # SQLite 不支持单条语句添加多列，在同一事务中逐列添加
+                    for name, sqlite_type, _ in missing:
+                        conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {name} {sqlite_type};"))
     except Exception:
         # 若迁移失败，不影响应用启动，但后续查询可能报错，建议使用 Alembic 正式迁移
-        pass
+        logger.warning("补齐新增列失败", exc_info=True)
+
+
+def _ensure_embedding_nullable():
+    """
+    向量改存到 question_embeddings.vector 后，旧的 JSON 列 embedding 不再写入，
+    需去掉其 NOT NULL 约束。SQLite 不支持修改列约束，只能按新模型重建表。
+    """
+    from models import orm
+
+    try:
+        with engine.begin() as conn:
+            cols = {c["name"]: c for c in inspect(conn).get_columns("question_embeddings")}
+            if "embedding" not in cols or cols["embedding"]["nullable"]:
+                return
+            if not _is_sqlite:
+                conn.execute(text("ALTER TABLE question_embeddings ALTER COLUMN embedding DROP NOT NULL;"))
+                return
+            table = orm.QuestionEmbedding.__table__
+            shared = ", ".join(c.name for c in table.columns if c.name in cols)
+            conn.execute(text("ALTER TABLE question_embeddings RENAME TO _question_embeddings_old;"))
+            table.create(bind=conn)
+            conn.execute(text(
+                f"INSERT INTO question_embeddings ({shared}) SELECT {shared} FROM _question_embeddings_old;"
+            ))
+            conn.execute(text("DROP TABLE _question_embeddings_old;"))
+    except Exception:
+        logger.warning("question_embeddings 去除 NOT NULL 失败", exc_info=True)
+
+
+_OBSOLETE_INDEXES = ("ix_questions_created_by_created_at", "ix_questions_public_created_at")
+
+
+# 每个用户保留最近更新的一份草稿（唯一索引建立前清理历史重复数据）
+_DEDUPE_PAPER_DRAFTS_SQL = """
+DELETE FROM paper_drafts WHERE EXISTS (
+    SELECT 1 FROM paper_drafts d2
+    WHERE d2.user_id = paper_drafts.user_id
+      AND (COALESCE(d2.updated_at, d2.created_at) > COALESCE(paper_drafts.updated_at, paper_drafts.created_at)
+           OR (COALESCE(d2.updated_at, d2.created_at) = COALESCE(paper_drafts.updated_at, paper_drafts.created_at)
+               AND d2.id > paper_drafts.id))
+)
+"""
+
+
+def _dedupe_paper_drafts():
+    """ix_paper_drafts_user_id 为唯一索引，已有重复草稿时建索引会失败，先去重"""
+    try:
+        if not inspect(engine).has_table("paper_drafts"):
+            return
+        with engine.begin() as conn:
+            conn.execute(text(_DEDUPE_PAPER_DRAFTS_SQL))
+    except Exception:
+        logger.warning("草稿去重失败", exc_info=True)
+
+
+def _needs_jsonb(index) -> bool:
+    """jsonb_path_ops 等 GIN 操作符类只适用于 jsonb 列"""
+    ops = index.dialect_options["postgresql"]["ops"] or {}
+    return any(op.startswith("jsonb_") for op in ops.values())
+
+
+def _is_jsonb_index_ready(index) -> bool:
+    # create_all 建的旧库列仍是 json（迁移 0006 才转为 jsonb），此时建 GIN 索引必然失败
+    from sqlalchemy.dialects.postgresql import JSONB
+
+    columns = {c["name"]: c["type"] for c in inspect(engine).get_columns(index.table.name)}
+    return all(isinstance(columns.get(col.name), JSONB) for col in index.columns)
+
+
+def _ensure_indexes():
+    """
+    create_all 只会为新建的表创建索引；对已存在的表补建模型中新增的索引。
+    每个索引单独一个事务：某个索引失败不会回滚其余索引（尤其是草稿 upsert 依赖的唯一索引）。
+    """
+    is_pg = DATABASE_URL.startswith("postgres")
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            try:
+                if is_pg and _needs_jsonb(index) and not _is_jsonb_index_ready(index):
+                    logger.warning("跳过索引 %s：列尚未迁移为 jsonb，请执行 alembic upgrade", index.name)
+                    continue
+                with engine.begin() as conn:
+                    index.create(bind=conn, checkfirst=True)
+            except Exception:
+                # 与补列一致：失败不影响启动，正式环境以 Alembic 迁移为准
+                logger.warning("创建索引 %s 失败", index.name, exc_info=True)
+    # 已被含 id 的新索引取代，删除以免重复维护
+    for name in _OBSOLETE_INDEXES:
+        try:
+            with engine.begin() as conn:
+                conn.execute(text(f"DROP INDEX IF EXISTS {name}"))
+        except Exception:
+            logger.warning("删除旧索引 %s 失败", name, exc_info=True)
+
+
+def _ensure_paper_question_cascade():
+    """
+    PostgreSQL：旧库的 paper_questions.paper_id 外键没有 ON DELETE CASCADE，删除试卷会因外键失败。
+    仅在尚未级联时重建约束（重建需校验全表，不能每次启动都做）
+    """
+    if _is_sqlite or not DATABASE_URL.startswith("postgres"):
+        return
+    try:
+        with engine.begin() as conn:
+            rule = conn.execute(text(
+                "SELECT confdeltype FROM pg_constraint WHERE conname = 'paper_questions_paper_id_fkey'"
+            )).scalar()
+            if rule is not None and rule != "c":
+                conn.execute(text(
+                    "ALTER TABLE paper_questions DROP CONSTRAINT paper_questions_paper_id_fkey, "
+                    "ADD CONSTRAINT paper_questions_paper_id_fkey FOREIGN KEY (paper_id) "
+                    "REFERENCES papers (id) ON DELETE CASCADE"
+                ))
+    except Exception:
+        logger.warning("paper_questions 级联外键重建失败", exc_info=True)
+
+
+def _ensure_trgm_indexes():
+    """
+    PostgreSQL：为题干/答案建立 pg_trgm GIN 索引，使 ILIKE '%关键词%' 可走索引而非全表扫描。
+    依赖扩展，不放在模型里（否则缺少扩展时 create_all 会失败）；扩展不可用时跳过。
+    """
+    if _is_sqlite or not DATABASE_URL.startswith("postgres"):
+        return
+    try:
+        with engine.begin() as conn:
+            conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm;"))
+            conn.execute(text(
+                "CREATE INDEX IF NOT EXISTS ix_questions_question_text_trgm "
+                "ON questions USING gin (question_text gin_trgm_ops);"
+            ))
+            conn.execute(text(
+                "CREATE INDEX IF NOT EXISTS ix_questions_answer_trgm "
+                "ON questions USING gin (answer gin_trgm_ops);"
+            ))
+    except Exception:
+        logger.warning("创建 pg_trgm 索引失败", exc_info=True)
+
+
+def _ensure_pgvector():
+    """
+    PostgreSQL：为 question_embeddings 增加 pgvector 列 vector_v 及 HNSW 余弦索引，
+    语义检索可在库内做近似 top-k。同样不放在模型里；pgvector 扩展未安装时跳过，检索退回进程内。
+    """
+    if _is_sqlite or not DATABASE_URL.startswith("postgres"):
+        return
+    try:
+        with engine.begin() as conn:
+            conn.execute(text("CREATE EXTENSION IF NOT EXISTS vector;"))
+            conn.execute(text(
+                f"ALTER TABLE question_embeddings ADD COLUMN IF NOT EXISTS vector_v vector({settings.pgvector_dim});"
+            ))
+            conn.execute(text(
+                "CREATE INDEX IF NOT EXISTS ix_qemb_hnsw ON question_embeddings "
+                "USING hnsw (vector_v vector_cosine_ops) WITH (m = 16, ef_construction = 200);"
+            ))
+    except Exception:
+        logger.warning("创建 pgvector 列或 HNSW 索引失败", exc_info=True)
+
+
+def dialect_insert(model):
+    """
+    返回当前数据库方言的 insert()，以便使用 on_conflict_do_nothing / on_conflict_do_update。
+    仅支持 PostgreSQL 与 SQLite（均支持 ON CONFLICT ... RETURNING）。
+    """
+    if _is_sqlite:
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        from sqlalchemy.dialects.postgresql import insert
+    return insert(model)
+
+
+def bulk_create(session, model, rows, batch_size=1000):
+    """
+    批量插入字典行，每 batch_size 行一条多值 INSERT 并提交一次。
+    跳过 ORM 单元工作（不触发关系级联、不回填对象），适合导入/初始化数据。
+    列上的 Python 端 default（如 id、created_at）仍由 Core 在插入时生成。
+    """
+    it = iter(rows)
+    while True:
+        chunk = list(islice(it, batch_size))
+        if not chunk:
+            return
+        session.bulk_insert_mappings(model, chunk)
+        session.commit()
 
 
 @contextmanager
@@ -1,14 +1,46 @@
-from fastapi import FastAPI
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+
+from fastapi import Depends, FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
 from routers import auth, teacher, student, review
 from db import init_db
+from services.captcha_service import warm_captcha_pool
+from utils.deps import require_db_ready
+from utils.responses import FastJSONResponse
+
+logger = logging.getLogger(__name__)
+
+
+async def _run_init(app: FastAPI):
+    # 建表/补列放到线程里执行，不阻塞事件循环，/health 可立即响应
+    try:
+        await asyncio.to_thread(init_db)
+    except Exception:
+        # 初始化失败时保持未就绪，由 /health 的 db_ready 暴露给编排系统
+        logger.exception("数据库初始化失败")
+        return
+    app.state.db_ready = True
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # 简单同步建表，后续可替换为 Alembic 迁移
+    app.state.db_ready = False
+    init_task = asyncio.create_task(_run_init(app))
+    warm_captcha_pool()
+    yield
+    init_task.cancel()
 
 
 app = FastAPI(
     title="Zujuan API",
     version="0.1.0",
     description="AI 驱动的智能组卷与教学辅助平台后端骨架",
+    lifespan=lifespan,
+    default_response_class=FastJSONResponse,
 )
 
 app.add_middleware(
@@ -19,21 +51,17 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-app.include_router(auth.router, prefix="/api")
-app.include_router(teacher.router, prefix="/api/teacher")
-app.include_router(student.router, prefix="/api/student")
-app.include_router(review.router, prefix="/api")
+_ready = [Depends(require_db_ready)]
+app.include_router(auth.router, prefix="/api", dependencies=_ready)
+app.include_router(teacher.router, prefix="/api/teacher", dependencies=_ready)
+app.include_router(student.router, prefix="/api/student", dependencies=_ready)
+app.include_router(review.router, prefix="/api", dependencies=_ready)
 
 
 @app.get("/health")
 async def health():
-    return {"status": "ok"}
-
-
-@app.on_event("startup")
-async def startup():
-    # 简单同步建表，后续可替换为 Alembic 迁移
-    init_db()
+    # 存活检查始终返回 ok；db_ready 用于区分就绪状态
+    return {"status": "ok", "db_ready": getattr(app.state, "db_ready", False)}
 
 
 if __name__ == "__main__":
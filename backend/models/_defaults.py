@@ -0,0 +1,16 @@
+"""
+orm 与 review 模型共用的列默认值：
+- 主键：UUIDv7 字符串（见 utils.ids）
+- 时间戳：带时区的当前 UTC 时间
+"""
+from datetime import datetime, timezone
+from functools import partial
+
+from utils.ids import new_id
+
+
+def new_uuid() -> str:
+    return new_id()
+
+
+utc_now = partial(datetime.now, timezone.utc)
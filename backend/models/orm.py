@@ -1,41 +1,61 @@
-import uuid
-from datetime import datetime, timezone
-
-from sqlalchemy import Boolean, Column, DateTime, Integer, JSON, String, Text, ForeignKey
+from sqlalchemy import Boolean, Column, DateTime, Index, Integer, JSON, String, Text, ForeignKey, LargeBinary, func, text
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import relationship
 
 from db import Base
+from models._defaults import new_uuid as _uuid, utc_now as _now
 from models import review
 
-
-def _uuid():
-    return str(uuid.uuid4())
+# PostgreSQL 上使用 JSONB（二进制存储，可建 GIN 索引），其他数据库保持 JSON
+_JSON = JSON().with_variant(JSONB(), "postgresql")
 
 
 class User(Base):
     __tablename__ = "users"
+    # SQLite：行较窄、按字符串主键查找，WITHOUT ROWID 让主键 B-tree 直接存行，省去一次回表
+    __table_args__ = {"sqlite_with_rowid": False}
 
     id = Column(String(36), primary_key=True, default=_uuid)
     username = Column(String(128), unique=True, nullable=False)
     email = Column(String(256), unique=True, nullable=True)
     role = Column(String(32), default="teacher")
     password_hash = Column(String(256), nullable=True)
-    created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
-    updated_at = Column(DateTime, default=lambda: datetime.now(timezone.utc), onupdate=lambda: datetime.now(timezone.utc))
+    created_at = Column(DateTime, default=_now, server_default=func.now())
+    updated_at = Column(DateTime, default=_now, server_default=func.now(), onupdate=_now)
 
 
 class Question(Base):
     __tablename__ = "questions"
+    __table_args__ = (
+        # 题库列表：按 created_by 过滤、按 (created_at, id) 倒序 keyset 分页，
+        # 索引含 id 使游标条件 (created_at, id) < (?, ?) 成为纯索引范围扫描
+        Index("ix_questions_created_by_created_at_id", "created_by", "created_at", "id"),
+        # 公开题目只占少数，部分索引保持很小；谓词需与查询中的 is_public == True 一致
+        Index(
+            "ix_questions_public_created_at_id",
+            "created_at",
+            "id",
+            postgresql_where=text("is_public = true"),
+            sqlite_where=text("is_public = 1"),
+        ),
+        # 知识点包含查询（knowledge_points @> '["函数"]'）走 GIN；仅 PostgreSQL 创建
+        Index(
+            "ix_questions_knowledge_points_gin",
+            "knowledge_points",
+            postgresql_using="gin",
+            postgresql_ops={"knowledge_points": "jsonb_path_ops"},
+        ).ddl_if(dialect="postgresql"),
+    )
 
     id = Column(String(36), primary_key=True, default=_uuid)
     question_text = Column(Text, nullable=False)
-    options = Column(JSON, nullable=True)
+    options = Column(_JSON, nullable=True)
     answer = Column(Text, nullable=False)
     explanation = Column(Text, nullable=True)
     has_geometry = Column(Boolean, default=False)
     geometry_svg = Column(Text, nullable=True)
     geometry_tikz = Column(Text, nullable=True)
-    knowledge_points = Column(JSON, default=list)
+    knowledge_points = Column(_JSON, default=list)
     difficulty = Column(String(16), default="medium")
     question_type = Column(String(16), default="solve")
     source = Column(String(256), nullable=True)
@@ -45,8 +65,8 @@ class Question(Base):
     is_public = Column(Boolean, default=False)
     status = Column(String(32), default="pending")  # pending/approved/rejected
     created_by = Column(String(36), nullable=True)
-    created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
-    updated_at = Column(DateTime, default=lambda: datetime.now(timezone.utc), onupdate=lambda: datetime.now(timezone.utc))
+    created_at = Column(DateTime, default=_now, server_default=func.now())
+    updated_at = Column(DateTime, default=_now, server_default=func.now(), onupdate=_now)
     reviews = relationship("QuestionReview", back_populates="question", cascade="all, delete-orphan")
 
 
@@ -54,13 +74,23 @@ class QuestionEmbedding(Base):
     __tablename__ = "question_embeddings"
 
     question_id = Column(String(36), ForeignKey("questions.id"), primary_key=True)
-    # 使用 JSON 存储向量，便于快速落地，无需 pgvector 依赖；后续可替换为向量类型
-    embedding = Column(JSON, nullable=False)
-    created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
+    # 向量以 float16 小端字节存储（1024 维约 2KB），读取时直接 np.frombuffer，无需 JSON 解析
+    vector = Column(LargeBinary, nullable=True)
+    # vector 的编码：f16 / i8（int8 标量量化）；NULL 视为 f16
+    quantization = Column(String(8), nullable=True)
+    # 旧版以 JSON 列表存储，仅作兼容读取，新写入不再使用
+    embedding = Column(JSON, nullable=True)
+    created_at = Column(DateTime, default=_now, server_default=func.now())
+    # 每次写入向量时更新；count(*) 与 max(updated_at) 组成版本号，供各 worker 判断进程内索引是否过期
+    updated_at = Column(DateTime, default=_now, onupdate=_now, nullable=True)
 
 
 class Paper(Base):
     __tablename__ = "papers"
+    __table_args__ = (
+        # 试卷列表按 (created_at, id) 倒序 keyset 分页
+        Index("ix_papers_created_at_id", "created_at", "id"),
+    )
 
     id = Column(String(36), primary_key=True, default=_uuid)
     title = Column(String(256), nullable=False)
@@ -68,28 +98,36 @@ class Paper(Base):
     template_type = Column(String(64), default="custom")
     total_score = Column(Integer, default=0)
     time_limit = Column(Integer, nullable=True)  # minutes
-    tags = Column(JSON, default=list)
+    tags = Column(_JSON, default=list)
     subject = Column(String(64), default="math")
     grade_level = Column(String(64), default="high")
     created_by = Column(String(36), nullable=True)
-    created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
-    updated_at = Column(DateTime, default=lambda: datetime.now(timezone.utc), onupdate=lambda: datetime.now(timezone.utc))
+    created_at = Column(DateTime, default=_now, server_default=func.now())
+    updated_at = Column(DateTime, default=_now, server_default=func.now(), onupdate=_now)
     published_at = Column(DateTime, nullable=True)
 
-    questions = relationship("PaperQuestion", back_populates="paper", cascade="all, delete-orphan")
+    # 读取时须用 selectinload 显式预加载（详情 / 列表 / 导出均已如此）；遗漏时报错而不是逐卷懒加载（N+1）
+    questions = relationship("PaperQuestion", back_populates="paper", cascade="all, delete-orphan", lazy="raise_on_sql", passive_deletes=True)
 
 
 class PaperQuestion(Base):
     __tablename__ = "paper_questions"
+    __table_args__ = (
+        Index("ix_paper_questions_paper_order", "paper_id", "order"),
+        {"sqlite_with_rowid": False},
+    )
 
     id = Column(String(36), primary_key=True, default=_uuid)
-    paper_id = Column(String(36), ForeignKey("papers.id"), nullable=False)
-    question_id = Column(String(36), ForeignKey("questions.id"), nullable=False)
+    # 删除试卷时由数据库级联删除题目关联（SQLite 未启用外键约束，由删除接口手动清理）
+    paper_id = Column(String(36), ForeignKey("papers.id", ondelete="CASCADE"), nullable=False)
+    question_id = Column(String(36), ForeignKey("questions.id"), nullable=False, index=True)
     order = Column(Integer, nullable=False, default=1)
     score = Column(Integer, nullable=False, default=0)
     custom_label = Column(String(64), nullable=True)
 
     paper = relationship("Paper", back_populates="questions")
+    # 只在导出时通过 selectinload/joinedload 显式预加载；遗漏时直接报错，防止退化为逐行懒加载
+    question = relationship("Question", lazy="raise")
 
 
 class PublishReview(Base):
@@ -109,7 +147,7 @@ class PublishReview(Base):
     similar_question_id = Column(String(36), nullable=True)  # 最相似题目ID
     admin_notes = Column(Text, nullable=True)
     reviewed_by = Column(String(36), nullable=True)
-    created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
+    created_at = Column(DateTime, default=_now, server_default=func.now())
     reviewed_at = Column(DateTime, nullable=True)
 
     question = relationship("Question")
@@ -120,6 +158,10 @@ class PaperDraft(Base):
     试卷草稿，用于保存未完成的组卷进度
     """
     __tablename__ = "paper_drafts"
+    __table_args__ = (
+        # 每个用户只有一份草稿：按 user_id 查询走索引，唯一约束也让保存可改为单条 UPSERT
+        Index("ix_paper_drafts_user_id", "user_id", unique=True),
+    )
 
     id = Column(String(36), primary_key=True, default=_uuid)
     user_id = Column(String(36), ForeignKey("users.id"), nullable=False)
@@ -127,6 +169,6 @@ class PaperDraft(Base):
     template_id = Column(String(64), nullable=True)
     time_limit = Column(Integer, nullable=True)
     # 存储选中的题目和分值: [{questionId, score, order}]
-    questions_data = Column(JSON, default=list)
-    created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
-    updated_at = Column(DateTime, default=lambda: datetime.now(timezone.utc), onupdate=lambda: datetime.now(timezone.utc))
+    questions_data = Column(_JSON, default=list)
+    created_at = Column(DateTime, default=_now, server_default=func.now())
+    updated_at = Column(DateTime, default=_now, server_default=func.now(), onupdate=_now)
@@ -1,25 +1,19 @@
-import uuid
-from datetime import datetime, timezone
-
-from sqlalchemy import Column, DateTime, String, Text, ForeignKey
+from sqlalchemy import Column, DateTime, String, Text, ForeignKey, func
 from sqlalchemy.orm import relationship
 
 from db import Base
-
-
-def _uuid():
-    return str(uuid.uuid4())
+from models._defaults import new_uuid as _uuid, utc_now as _now
 
 
 class QuestionReview(Base):
     __tablename__ = "question_reviews"
 
     id = Column(String(36), primary_key=True, default=_uuid)
-    question_id = Column(String(36), ForeignKey("questions.id"), nullable=False)
+    question_id = Column(String(36), ForeignKey("questions.id"), nullable=False, index=True)
     reviewer_id = Column(String(36), nullable=True)
     status = Column(String(32), default="pending")  # pending/approved/rejected
     comment = Column(Text, nullable=True)
-    created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
-    updated_at = Column(DateTime, default=lambda: datetime.now(timezone.utc), onupdate=lambda: datetime.now(timezone.utc))
+    created_at = Column(DateTime, default=_now, server_default=func.now())
+    updated_at = Column(DateTime, default=_now, server_default=func.now(), onupdate=_now)
 
     question = relationship("Question", back_populates="reviews")
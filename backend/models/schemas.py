@@ -1,6 +1,19 @@
 from typing import List, Literal, Optional
 
-from pydantic import BaseModel
+from pydantic import AliasChoices, BaseModel, Field, field_validator
+
+
+def _alias(camel: str, snake: str) -> AliasChoices:
+    # 同时接受接口字段名与 ORM 属性名，便于 from_attributes 直接校验 ORM 对象
+    return AliasChoices(camel, snake)
+
+
+def orm_field_names(model) -> dict:
+    """视图字段名 -> ORM 属性名（取自 _alias 的第二个候选）"""
+    return {
+        name: field.validation_alias.choices[-1] if isinstance(field.validation_alias, AliasChoices) else name
+        for name, field in model.model_fields.items()
+    }
 
 
 class QuestionAnalysisResponse(BaseModel):
@@ -43,30 +56,55 @@ class QuestionCreateResponse(BaseModel):
 
 class QuestionView(BaseModel):
     id: str
-    questionText: str
+    questionText: str = Field(validation_alias=_alias("questionText", "question_text"))
     options: Optional[List[str]] = None
     answer: str
     explanation: Optional[str] = None
-    hasGeometry: bool = False
-    geometrySvg: Optional[str] = None
-    geometryTikz: Optional[str] = None
-    knowledgePoints: List[str] = []
+    hasGeometry: bool = Field(False, validation_alias=_alias("hasGeometry", "has_geometry"))
+    geometrySvg: Optional[str] = Field(None, validation_alias=_alias("geometrySvg", "geometry_svg"))
+    geometryTikz: Optional[str] = Field(None, validation_alias=_alias("geometryTikz", "geometry_tikz"))
+    knowledgePoints: List[str] = Field([], validation_alias=_alias("knowledgePoints", "knowledge_points"))
     difficulty: Optional[str] = None
-    questionType: Optional[str] = None
+    questionType: Optional[str] = Field(None, validation_alias=_alias("questionType", "question_type"))
     source: Optional[str] = None
     year: Optional[int] = None
-    aiGenerated: bool = True
-    isPublic: bool = False
+    aiGenerated: bool = Field(True, validation_alias=_alias("aiGenerated", "ai_generated"))
+    isPublic: bool = Field(False, validation_alias=_alias("isPublic", "is_public"))
     status: Optional[str] = "pending"
-    isHighSchool: bool = True
+    isHighSchool: bool = Field(True, validation_alias=_alias("isHighSchool", "is_high_school"))
 
     class Config:
         from_attributes = True
 
+    @field_validator("knowledgePoints", mode="before")
+    @classmethod
+    def _none_to_list(cls, v):
+        return v or []
+
+    @classmethod
+    def from_row(cls, row) -> "QuestionView":
+        """
+        由数据库行（ORM 对象或列元组）直接构造，跳过逐字段校验：
+        数据写入时已校验，列表接口每页上百行时校验开销明显。
+        """
+        return cls.model_construct(**cls.row_dict(row))
+
+    @staticmethod
+    def row_dict(row) -> dict:
+        """与 from_row 字段相同的纯 dict，列表接口直接序列化，不为每行构造模型对象"""
+        data = {name: getattr(row, attr) for name, attr in _QUESTION_ITEMS}
+        data["knowledgePoints"] = data["knowledgePoints"] or []
+        return data
+
+
+_QUESTION_FIELDS = orm_field_names(QuestionView)
+_QUESTION_ITEMS = list(_QUESTION_FIELDS.items())
+
 
 class QuestionListResponse(BaseModel):
     total: int
     items: List[QuestionView]
+    nextCursor: Optional[str] = None  # 下一页游标，无更多数据时为 None
 
 
 class PaperQuestionInput(BaseModel):
@@ -94,31 +132,67 @@ class PaperCreateResponse(BaseModel):
 
 
 class PaperQuestionView(BaseModel):
-    questionId: str
+    questionId: str = Field(validation_alias=_alias("questionId", "question_id"))
     order: int
     score: int
-    customLabel: Optional[str] = None
+    customLabel: Optional[str] = Field(None, validation_alias=_alias("customLabel", "custom_label"))
+
+    class Config:
+        from_attributes = True
 
 
 class PaperView(BaseModel):
     id: str
     title: str
     description: Optional[str] = None
-    templateType: str
-    totalScore: int
-    timeLimit: Optional[int] = None
+    templateType: str = Field(validation_alias=_alias("templateType", "template_type"))
+    totalScore: int = Field(validation_alias=_alias("totalScore", "total_score"))
+    timeLimit: Optional[int] = Field(None, validation_alias=_alias("timeLimit", "time_limit"))
     tags: List[str] = []
     subject: str
-    gradeLevel: str
+    gradeLevel: str = Field(validation_alias=_alias("gradeLevel", "grade_level"))
     questions: List[PaperQuestionView] = []
 
     class Config:
         from_attributes = True
 
+    @field_validator("tags", mode="before")
+    @classmethod
+    def _none_to_list(cls, v):
+        return v or []
+
+    @classmethod
+    def from_row(cls, paper) -> "PaperView":
+        """同 QuestionView.from_row；题目列表需已预加载"""
+        data = cls.row_dict(paper)
+        data["questions"] = [PaperQuestionView.model_construct(**pq) for pq in data["questions"]]
+        return cls.model_construct(**data)
+
+    @staticmethod
+    def row_dict(paper) -> dict:
+        """
+        与 from_row 字段相同，但直接返回可 JSON 序列化的 dict（出站专用）：
+        列表每页数百个题目条目，构造模型对象的开销约为组装 dict + orjson 序列化的 5~6 倍
+        """
+        data = {name: getattr(paper, attr) for name, attr in _PAPER_SCALAR_FIELDS}
+        data["tags"] = data["tags"] or []
+        data["questions"] = [
+            {name: getattr(pq, attr) for name, attr in _PAPER_QUESTION_ITEMS}
+            for pq in paper.questions
+        ]
+        return data
+
+
+_PAPER_FIELDS = orm_field_names(PaperView)
+_PAPER_QUESTION_FIELDS = orm_field_names(PaperQuestionView)
+_PAPER_SCALAR_FIELDS = [(name, attr) for name, attr in _PAPER_FIELDS.items() if name != "questions"]
+_PAPER_QUESTION_ITEMS = list(_PAPER_QUESTION_FIELDS.items())
+
 
 class PaperListResponse(BaseModel):
-    total: int
+    total: Optional[int] = None  # 游标翻页时不计算总数，为 None
     items: List[PaperView]
+    nextCursor: Optional[str] = None
 
 
 class ReviewCreateRequest(BaseModel):
@@ -1,9 +1,12 @@
+import asyncio
+
 from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 from pydantic import BaseModel
 
 from config import get_settings
-from db import get_db
+from db import dialect_insert, get_db
 from models import orm
 from models.schemas import LoginRequest, TokenResponse, UserCreateRequest, UserView
 from utils.security import (
@@ -49,26 +52,34 @@ async def register_user(body: UserCreateRequest, db: Session = Depends(get_db)):
     if not verify_captcha(body.captchaId, body.captchaCode):
         raise HTTPException(status_code=400, detail="验证码错误或已过期")
     
-    # 3. 检查用户名是否已存在
-    existing = db.query(orm.User).filter(orm.User.username == body.username).first()
-    if existing:
+    # 3. 检查用户名是否已存在（只查主键列，避免对已存在的用户名做哈希计算）
+    if db.execute(select(orm.User.id).where(orm.User.username == body.username)).first():
         raise HTTPException(status_code=400, detail="用户名已存在")
     
-    # 4. 创建用户
+    # 4. 创建用户（哈希计算较慢，放到线程池，避免阻塞事件循环）
+    password_hash = await asyncio.to_thread(get_password_hash, body.password)
+    values = dict(
+        username=body.username,
+        email=body.email,
+        role=body.role,
+        password_hash=password_hash,
+    )
+    # 并发注册同名用户时由唯一约束兜底：冲突则不插入、不返回行
+    stmt = (
+        dialect_insert(orm.User)
+        .values(**values)
+        .on_conflict_do_nothing(index_elements=["username"])
+        .returning(orm.User.id)
+    )
     try:
-        user = orm.User(
-            username=body.username,
-            email=body.email,
-            role=body.role,
-            password_hash=get_password_hash(body.password),
-        )
-        db.add(user)
+        user_id = db.execute(stmt).scalar()
         db.commit()
-        db.refresh(user)
     except Exception:
         db.rollback()
         raise
-    return UserView.model_validate(user)
+    if user_id is None:
+        raise HTTPException(status_code=400, detail="用户名已存在")
+    return UserView(id=user_id, username=body.username, email=body.email, role=body.role)
 
 
 @router.post("/auth/login", response_model=TokenResponse)
@@ -78,7 +89,7 @@ async def login_for_access_token(
     """
     登录并获取 JWT。传入 username/password。
     """
-    user = authenticate_user(db, body.username, body.password)
+    user = await asyncio.to_thread(authenticate_user, db, body.username, body.password)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -4,17 +4,17 @@ from sqlalchemy.orm import Session
 from db import get_db
 from models import orm
 from models.schemas import ReviewCreateRequest, ReviewView
-from utils.deps import require_role
+from utils.deps import require_teacher
 
 
 router = APIRouter(tags=["review"])
 
 
 @router.post("/reviews", response_model=ReviewView)
-async def create_review(
+def create_review(
     payload: ReviewCreateRequest,
     db: Session = Depends(get_db),
-    current_user: orm.User = Depends(require_role(["teacher", "admin"])),
+    current_user: orm.User = Depends(require_teacher),
 ):
     """
     题目审核记录创建（简易占位）。
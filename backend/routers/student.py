@@ -1,15 +1,25 @@
+import time
+
 from fastapi import APIRouter, Depends, Query, BackgroundTasks
+from sqlalchemy import func, select
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
 
-from db import get_db
+from config import get_settings
+from db import get_db, session_scope
 from models.schemas import StudentAskRequest, StudentAskResponse
 from models import orm
-from services.rag_service import RAGService
+from services.rag_service import get_rag_service
+from utils.responses import FastJSONResponse
 
 
 router = APIRouter(tags=["student"])
-rag_service = RAGService()
+settings = get_settings()
+
+# /embedding-status 的计数缓存：前端索引期间会轮询，短 TTL 内复用结果
+_STATUS_TTL = 5.0
+_status_cache = {"counts": None, "expires": 0.0}
+rag_service = get_rag_service()
 
 
 @router.post("/ask", response_model=StudentAskResponse)
@@ -25,26 +35,39 @@ async def student_ask(body: StudentAskRequest, db: Session = Depends(get_db)):
 async def semantic_search(
     q: str = Query(..., description="搜索关键词或问题描述"),
     top_k: int = Query(5, ge=1, le=20, description="返回的最大结果数"),
+    ef: Optional[int] = Query(None, ge=16, le=512, description="HNSW 搜索宽度，越大召回越高"),
     db: Session = Depends(get_db),
 ) -> List[dict]:
     """
     语义搜索题目：根据文本描述找到相似的题目。
     使用 Embedding 向量相似度匹配，支持自然语言描述。
     """
-    return await rag_service.search_similar(db, q, top_k=top_k)
+    # 结果已是可序列化的 dict，直接输出，跳过 jsonable_encoder 逐字段遍历
+    return FastJSONResponse(await rag_service.search_similar(db, q, top_k=top_k, ef=ef))
 
 
 @router.get("/embedding-status")
-async def embedding_status(db: Session = Depends(get_db)) -> dict:
+def embedding_status(db: Session = Depends(get_db)) -> dict:
     """
     检查 Embedding 服务状态和索引覆盖情况。
     """
-    total_questions = db.query(orm.Question).count()
-    indexed_questions = db.query(orm.QuestionEmbedding).count()
+    now = time.monotonic()
+    if _status_cache["counts"] is None or _status_cache["expires"] < now:
+        # 两个计数合并为一条语句、一次往返
+        row = db.execute(
+            select(
+                select(func.count()).select_from(orm.Question).scalar_subquery(),
+                select(func.count()).select_from(orm.QuestionEmbedding).scalar_subquery(),
+            )
+        ).one()
+        _status_cache["counts"] = (row[0], row[1])
+        _status_cache["expires"] = now + _STATUS_TTL
+    total_questions, indexed_questions = _status_cache["counts"]
     
     return {
         "embeddingAvailable": rag_service.client is not None,
         "embeddingModel": rag_service.embed_model,
+        "quantization": settings.embedding_quantization,
         "totalQuestions": total_questions,
         "indexedQuestions": indexed_questions,
         "coverage": f"{indexed_questions}/{total_questions}",
@@ -62,23 +85,26 @@ async def reindex_all(
     if not rag_service.client:
         return {"success": False, "message": "Embedding 服务未配置"}
     
-    # 获取所有未索引的题目ID
-    all_question_ids = [q.id for q in db.query(orm.Question.id).all()]
-    existing_ids = {e.question_id for e in db.query(orm.QuestionEmbedding.question_id).all()}
-    pending_ids = [qid for qid in all_question_ids if qid not in existing_ids]
+    # 未索引的题目由库内反连接找出，已索引数量用 COUNT 聚合，不把两张表的全部 ID 拉回内存比对
+    pending_ids = [
+        qid
+        for (qid,) in db.query(orm.Question.id)
+        .outerjoin(orm.QuestionEmbedding, orm.QuestionEmbedding.question_id == orm.Question.id)
+        .filter(orm.QuestionEmbedding.question_id.is_(None))
+    ]
+    already_indexed = db.query(func.count(orm.QuestionEmbedding.question_id)).scalar()
     
     async def reindex_in_background(question_ids: List[str]):
-        from db import session_scope
         with session_scope() as bg_db:
-            for qid in question_ids:
-                await rag_service.index_question(bg_db, qid)
+            await rag_service.index_questions_batch(bg_db, question_ids)
     
     if pending_ids:
         background_tasks.add_task(reindex_in_background, pending_ids)
+        _status_cache["counts"] = None
     
     return {
         "success": True,
         "message": f"开始后台索引 {len(pending_ids)} 道题目",
         "pendingCount": len(pending_ids),
-        "alreadyIndexed": len(existing_ids),
+        "alreadyIndexed": already_indexed,
     }
@@ -1,8 +1,18 @@
-from fastapi import APIRouter, BackgroundTasks, Depends, File, UploadFile, Query, HTTPException
-from fastapi.responses import FileResponse
-from sqlalchemy.orm import Session
+import asyncio
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+
+from fastapi import APIRouter, BackgroundTasks, Depends, File, UploadFile, Query, HTTPException, Request
+from fastapi.responses import FileResponse, Response, StreamingResponse
+from pydantic import BaseModel
+from sqlalchemy.orm import Session, aliased, joinedload, selectinload
 from pathlib import Path
-from sqlalchemy import or_
+from typing import Any, List, Optional
+from sqlalchemy import delete, func, insert, or_, select, update
 
 from models.schemas import (
     QuestionAnalysisResponse,
@@ -14,23 +24,27 @@ from models.schemas import (
     PaperCreateResponse,
     PaperListResponse,
     PaperView,
-    PaperQuestionView,
+    orm_field_names,
 )
 from models import orm
-from db import get_db
+from db import dialect_insert, get_db, session_scope
 from services.ai_service import AIService, get_ai_service
+from services.batch_queue import AsyncBatchQueue
 from services.export_service import ExportService
-from services.rag_service import RAGService
-from utils.deps import get_current_user, require_role
+from services.rag_service import get_rag_service
+from services.task_service import task_manager, TaskStatus
+from utils.deps import get_current_user, require_teacher, require_admin
+from utils.pagination import paginate, paginate_with_total
+from utils.responses import FastJSONResponse, json_bytes, stream_json_list
+from utils.redis_client import get_redis
 from templates import get_template
 
 
+# 只做同步数据库 / Redis I/O 的接口声明为普通 def：FastAPI 在线程池中执行，阻塞查询不占住事件循环；
+# 需要 await（AI、向量检索、编译 PDF）的接口保留 async def
 router = APIRouter(tags=["teacher"])
 export_service = ExportService()
-rag_service = RAGService()
-
-# 导入任务管理器
-from services.task_service import task_manager, TaskStatus
+rag_service = get_rag_service()
 
 # 默认提示词（可被前端修改）
 DEFAULT_PROMPT = """你是一个高考数学题目解析专家。请分析图片中的题目，返回严格的 JSON 格式。
@@ -100,17 +114,25 @@ DEFAULT_PROMPT = """你是一个高考数学题目解析专家。请分析图片
 - 如果图片模糊或无法识别，questionText 写"[无法识别]"并在 answer 中说明原因"""
 
 
+# 默认提示词是静态内容：导入时一次性序列化并计算 ETag，请求时直接返回字节
+DEFAULT_PROMPT_JSON = json.dumps({"prompt": DEFAULT_PROMPT}, ensure_ascii=False).encode()
+DEFAULT_PROMPT_ETAG = '"%s"' % hashlib.blake2b(DEFAULT_PROMPT.encode(), digest_size=8).hexdigest()
+_DEFAULT_PROMPT_HEADERS = {"Cache-Control": "public, max-age=86400", "ETag": DEFAULT_PROMPT_ETAG}
+
+
 @router.get("/prompt/default")
-async def get_default_prompt():
-    """获取默认的提示词"""
-    return {"prompt": DEFAULT_PROMPT}
+async def get_default_prompt(request: Request):
+    """获取默认的提示词（支持 If-None-Match 协商缓存）"""
+    if request.headers.get("if-none-match") == DEFAULT_PROMPT_ETAG:
+        return Response(status_code=304, headers=_DEFAULT_PROMPT_HEADERS)
+    return Response(content=DEFAULT_PROMPT_JSON, media_type="application/json", headers=_DEFAULT_PROMPT_HEADERS)
 
 @router.post("/questions/analyze", response_model=QuestionAnalysisResponse)
 async def analyze_question(
     file: UploadFile = File(...),
     ai_service: AIService = Depends(get_ai_service),
     # 临时移除认证，方便测试
-    # current_user: orm.User = Depends(require_role(["teacher", "admin"])),
+    # current_user: orm.User = Depends(require_teacher),
 ):
     """
     题目图片/文件解析：OCR + 结构化 + SVG（若有几何）。
@@ -128,7 +150,6 @@ async def preview_question(
     custom_prompt: str = Query(None, description="自定义提示词（可选）"),
     ai_service: AIService = Depends(get_ai_service),
     db: Session = Depends(get_db),
-    background_tasks: BackgroundTasks = None,
 ):
     """
     单题预览：上传图片 → AI 解析 → 生成 LaTeX，并可选编译 PDF。
@@ -137,26 +158,32 @@ async def preview_question(
     - custom_prompt: 自定义提示词（可选）
     """
     analysis = await ai_service.analyze(file, custom_prompt=custom_prompt)
-    latex, attachments = export_service.build_single_question_latex(
-        analysis, include_answer=include_answer, include_explanation=include_explanation
+    # LaTeX 组装含 SVG→TikZ/PNG 转换，同样放到线程池
+    latex, attachments = await asyncio.to_thread(
+        export_service.build_single_question_latex,
+        analysis,
+        include_answer=include_answer,
+        include_explanation=include_explanation,
     )
 
     if format == "pdf":
-        ok, out, log = export_service.compile_pdf(latex, attachments=attachments)
+        # 同一图片 + 选项生成的 LaTeX 相同，命中 PDF 缓存时跳过 xelatex；缓存文件不在响应后删除
+        ok, out, log = await asyncio.to_thread(export_service.compile_pdf_cached, latex, attachments)
         if ok:
-            file_path = Path(out)
-            bg = background_tasks or BackgroundTasks()
-            bg.add_task(export_service.cleanup_file, file_path)
             return FileResponse(
-                file_path,
+                Path(out),
                 media_type="application/pdf",
                 filename="question_preview.pdf",
-                background=bg,
             )
         raise HTTPException(status_code=500, detail={"error": "pdf_preview_failed", "detail": out, "log": log, "latex": latex})
 
     # 默认 json：返回结构化数据 + latex + PNG 预览（如可用）
-    svg_png = export_service.svg_to_png_base64(analysis.get("geometrySvg")) if analysis.get("hasGeometry") else None
+    # SVG 栅格化是 CPU 计算，放到线程池，避免阻塞事件循环
+    svg_png = (
+        await asyncio.to_thread(export_service.svg_to_png_base64, analysis.get("geometrySvg"))
+        if analysis.get("hasGeometry")
+        else None
+    )
     
     # 查重：用题目+答案进行语义搜索，找出相似题
     similar_questions = []
@@ -180,18 +207,33 @@ async def preview_question(
         except Exception:
             pass  # 查重失败不影响主流程
     
-    return {
+    # 含 SVG / base64 PNG 的大字典直接序列化，不经 jsonable_encoder 逐层遍历
+    return FastJSONResponse({
         "analysis": analysis,
         "latex": latex,
+        "katexHtml": export_service.build_katex_html(analysis),  # 前端 KaTeX 直接渲染，无需编译
         "svgPng": svg_png,
         "similarQuestions": similar_questions,  # 相似题列表
-    }
+    })
 
 
 # ===== 异步分析接口（解决 Cloudflare 100s 超时）=====
 
-import tempfile
-import shutil
+MAX_UPLOAD_BYTES = 20 * 1024 * 1024
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+
+async def _read_upload(file: UploadFile) -> bytes:
+    """
+    按 1 MiB 分块读取上传文件：每块之间让出事件循环（已溢写到磁盘的块由 Starlette 在线程池中读取），
+    超过 MAX_UPLOAD_BYTES 立即返回 413，不把超大文件整体读入内存
+    """
+    buf = bytearray()
+    while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+        buf += chunk
+        if len(buf) > MAX_UPLOAD_BYTES:
+            raise HTTPException(status_code=413, detail="上传文件过大")
+    return bytes(buf)
 
 @router.post("/questions/preview-async")
 async def preview_question_async(
@@ -205,27 +247,24 @@ async def preview_question_async(
     异步版本的题目预览：立即返回 task_id，后台处理 AI 分析。
     前端通过 GET /tasks/{task_id}/status 轮询结果。
     """
-    import asyncio
+    # 1. 读出上传内容交给后台任务（请求结束后 UploadFile 会被关闭）。
+    #    直接在内存中传递，不再落盘到临时目录再读回
+    file_content = await _read_upload(file)
     
-    # 1. 创建任务
+    # 2. 创建任务
     task_id = task_manager.create_task()
     
-    # 2. 保存上传文件到临时目录（因为后台任务无法访问 UploadFile）
-    temp_dir = tempfile.mkdtemp()
-    temp_file_path = Path(temp_dir) / file.filename
-    with open(temp_file_path, "wb") as f:
-        shutil.copyfileobj(file.file, f)
-    
     # 3. 使用 asyncio.create_task 启动后台任务（不阻塞主线程）
     asyncio.create_task(
         _process_preview_task(
             task_id=task_id,
-            file_path=str(temp_file_path),
+            file_content=file_content,
+            filename=file.filename or "upload",
+            content_type=file.content_type,
             format=format,
             include_answer=include_answer,
             include_explanation=include_explanation,
             custom_prompt=custom_prompt,
-            temp_dir=temp_dir,
         )
     )
     
@@ -233,37 +272,36 @@ async def preview_question_async(
     return {"taskId": task_id, "status": "pending"}
 
 
+class _MemUploadFile:
+    """
+    内存中的上传内容，提供 ai_service.analyze 所需的 UploadFile 接口（filename / content_type / read）。
+    read 直接返回原 bytes 对象，不再经 BytesIO 复制一份
+    """
+
+    def __init__(self, content: bytes, filename: str, content_type: Optional[str] = None):
+        self._content = content
+        self.filename = filename
+        self.content_type = content_type or "image/jpeg"
+
+    async def read(self, size: int = -1) -> bytes:
+        return self._content
+
+
 async def _process_preview_task(
     task_id: str,
-    file_path: str,
+    file_content: bytes,
+    filename: str,
+    content_type: Optional[str],
     format: str,
     include_answer: bool,
     include_explanation: bool,
     custom_prompt: str,
-    temp_dir: str,
 ):
     """后台任务：处理 AI 分析"""
-    import asyncio
-    from fastapi import UploadFile
-    from io import BytesIO
-    
     try:
         task_manager.update_status(task_id, TaskStatus.PROCESSING, progress=10)
         
-        # 读取文件
-        with open(file_path, "rb") as f:
-            file_content = f.read()
-        
-        # 创建模拟的 UploadFile 对象
-        class FakeUploadFile:
-            def __init__(self, content: bytes, filename: str):
-                self.file = BytesIO(content)
-                self.filename = filename
-                self.content_type = "image/jpeg"
-            async def read(self):
-                return self.file.read()
-        
-        fake_file = FakeUploadFile(file_content, Path(file_path).name)
+        fake_file = _MemUploadFile(file_content, filename, content_type)
         
         # 执行 AI 分析
         task_manager.update_status(task_id, TaskStatus.PROCESSING, progress=30)
@@ -273,14 +311,17 @@ async def _process_preview_task(
         task_manager.update_status(task_id, TaskStatus.PROCESSING, progress=70)
         
         # 生成 LaTeX
-        latex, attachments = export_service.build_single_question_latex(
-            analysis, include_answer=include_answer, include_explanation=include_explanation
+        latex, attachments = await asyncio.to_thread(
+            export_service.build_single_question_latex,
+            analysis,
+            include_answer=include_answer,
+            include_explanation=include_explanation,
         )
         
         # 生成 SVG PNG 预览
         svg_png = None
         if analysis.get("hasGeometry"):
-            svg_png = export_service.svg_to_png_base64(analysis.get("geometrySvg"))
+            svg_png = await asyncio.to_thread(export_service.svg_to_png_base64, analysis.get("geometrySvg"))
         
         task_manager.update_status(task_id, TaskStatus.PROCESSING, progress=90)
         
@@ -288,6 +329,7 @@ async def _process_preview_task(
         result = {
             "analysis": analysis,
             "latex": latex,
+            "katexHtml": export_service.build_katex_html(analysis),
             "svgPng": svg_png,
             "similarQuestions": [],  # 异步模式暂不做相似题搜索
         }
@@ -296,17 +338,10 @@ async def _process_preview_task(
         
     except Exception as e:
         task_manager.update_status(task_id, TaskStatus.FAILED, error=str(e))
-    
-    finally:
-        # 清理临时文件
-        try:
-            shutil.rmtree(temp_dir)
-        except:
-            pass
 
 
 @router.get("/tasks/{task_id}/status")
-async def get_task_status(task_id: str):
+def get_task_status(task_id: str):
     """
     查询异步任务状态。
     返回：status, progress, result(如果完成), error(如果失败)
@@ -314,7 +349,10 @@ async def get_task_status(task_id: str):
     task = task_manager.get_task(task_id)
     if not task:
         raise HTTPException(status_code=404, detail="Task not found")
-    
+    return FastJSONResponse(_task_payload(task))
+
+
+def _task_payload(task) -> dict:
     response = {
         "taskId": task.id,
         "status": task.status.value,
@@ -329,12 +367,32 @@ async def get_task_status(task_id: str):
     return response
 
 
+@router.get("/tasks/{task_id}/stream")
+async def stream_task_status(task_id: str):
+    """
+    以 SSE（text/event-stream）推送任务状态：每次进度变化发送一条 data，完成或失败后结束。
+    前端订阅一次即可，不必每秒轮询 /status（后者保留作为兼容）。
+    """
+    if not task_manager.get_task(task_id):
+        raise HTTPException(status_code=404, detail="Task not found")
+
+    async def events():
+        async for task in task_manager.watch(task_id):
+            yield f"data: {json.dumps(_task_payload(task), ensure_ascii=False)}\n\n"
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 @router.post("/questions/ingest", response_model=QuestionCreateResponse)
 async def ingest_and_create_question(
     file: UploadFile = File(...),
     db: Session = Depends(get_db),
     ai_service: AIService = Depends(get_ai_service),
-    current_user: orm.User = Depends(require_role(["teacher", "admin"])),
+    current_user: orm.User = Depends(require_teacher),
 ):
     """
     一步完成：上传图片 → AI 解析 → 清洗 → 入库。
@@ -376,20 +434,48 @@ async def ingest_and_create_question(
             created_by=current_user.id if current_user else None,
         )
         db.add(q)
+        # 主键由 Python 端默认值生成，flush 后即可读取；提交后对象过期，不再 refresh 重新 SELECT
+        db.flush()
+        question_id = q.id
         db.commit()
-        db.refresh(q)
-        return QuestionCreateResponse(id=q.id, created=True, payload=payload)
+        asyncio.create_task(_index_in_background(question_id))
+        return _json_response(QuestionCreateResponse(id=question_id, created=True, payload=payload))
     except Exception:
         db.rollback()
         raise
 
 
+# 批量录入时短时间内会连续触发索引：50ms 或 32 道题内的请求合成一次 IN 查询 + 一次 embedding 调用
+INDEX_BATCH_SIZE = 32
+INDEX_BATCH_WAIT = 0.05
+
+
+async def _index_batch(question_ids: List[str]) -> List[None]:
+    with session_scope() as bg_db:
+        await rag_service.index_questions_batch(bg_db, list(dict.fromkeys(question_ids)), batch_size=INDEX_BATCH_SIZE)
+    return [None] * len(question_ids)
+
+
+_index_queue = AsyncBatchQueue(_index_batch, max_batch_size=INDEX_BATCH_SIZE, max_wait_time=INDEX_BATCH_WAIT)
+
+
+async def _index_in_background(question_id: str):
+    """
+    入库 / 编辑后在后台生成并保存题目向量，之后的发布查重、相似检索直接读取已存向量，
+    不必在请求路径上再调用 embedding
+    """
+    try:
+        await _index_queue.add_request(question_id)
+    except Exception as e:
+        print(f"Embedding 索引创建失败: {e}")
+
+
 @router.post("/questions", response_model=QuestionCreateResponse)
 async def create_question(
     payload: QuestionCreateRequest,
     background_tasks: BackgroundTasks,
     db: Session = Depends(get_db),
-    current_user: orm.User = Depends(require_role(["teacher", "admin"])),
+    current_user: orm.User = Depends(require_teacher),
 ):
     """
     教师审核后提交题目入库。
@@ -416,22 +502,15 @@ async def create_question(
         created_by=current_user.id if current_user else None,
     )
         db.add(q)
+        # 主键由 Python 端默认值生成，flush 后即可读取；提交后对象过期，不再 refresh 重新 SELECT
+        db.flush()
+        question_id = q.id
         db.commit()
-        db.refresh(q)
         
         # 后台异步生成 embedding 索引（使用 asyncio.create_task 避免阻塞）
-        async def index_in_background(question_id: str):
-            try:
-                from db import session_scope
-                with session_scope() as bg_db:
-                    await rag_service.index_question(bg_db, question_id)
-            except Exception as e:
-                print(f"Embedding 索引创建失败: {e}")
+        asyncio.create_task(_index_in_background(question_id))
         
-        import asyncio
-        asyncio.create_task(index_in_background(q.id))
-        
-        return QuestionCreateResponse(id=q.id, created=True, payload=payload)
+        return _json_response(QuestionCreateResponse(id=question_id, created=True, payload=payload))
     except Exception:
         db.rollback()
         raise
@@ -450,15 +529,22 @@ async def search_questions_semantic(
     """
     try:
         results = await rag_service.search_similar(db, query, top_k=topK * 2)  # 多搜一些，后面过滤
-        # 转换为前端需要的格式（只返回公共题目 + 用户自己的题目）
+        # 一次 IN 查询取回全部命中题目，权限过滤（公共题目 + 用户自己的题目）也交给数据库
+        rows = (
+            db.query(orm.Question)
+            .filter(
+                orm.Question.id.in_([r["id"] for r in results]),
+                or_(orm.Question.is_public == True, orm.Question.created_by == current_user.id),
+            )
+            .all()
+        ) if results else []
+        by_id = {q.id: q for q in rows}
+        # 转换为前端需要的格式，保持相似度顺序
         questions = []
         for r in results:
-            q = db.query(orm.Question).filter(orm.Question.id == r["id"]).first()
+            q = by_id.get(r["id"])
             if not q:
                 continue
-            # 权限过滤：公共题目 或 自己创建的题目
-            if not q.is_public and q.created_by != current_user.id:
-                continue
             # options 和 knowledge_points 可能已经是 list（PostgreSQL JSON 字段），也可能是字符串
             options = q.options if isinstance(q.options, list) else (json.loads(q.options) if q.options else None)
             kp = q.knowledge_points if isinstance(q.knowledge_points, list) else (json.loads(q.knowledge_points) if q.knowledge_points else [])
@@ -476,25 +562,41 @@ async def search_questions_semantic(
             # 达到请求数量后停止
             if len(questions) >= topK:
                 break
-        return questions
+        # 直接序列化，跳过 jsonable_encoder 逐字段遍历
+        return FastJSONResponse(questions)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"搜索失败: {str(e)}")
 
 
+def _json_response(model: BaseModel) -> Response:
+    """
+    直接用 pydantic-core 把已构造好的响应模型序列化为 JSON 返回，
+    跳过 FastAPI 按 response_model 的 dump → 再校验 → jsonable_encoder 三趟处理
+    """
+    return Response(content=model.model_dump_json(), media_type="application/json")
+
+
+_QUESTION_VIEW_COLUMNS = [
+    getattr(orm.Question, attr) for attr in orm_field_names(QuestionView).values()
+] + [orm.Question.created_at]
+
+
 @router.get("/questions", response_model=QuestionListResponse)
-async def list_questions(
+def list_questions(
     db: Session = Depends(get_db),
     page: int = Query(1, ge=1),
     limit: int = Query(20, ge=1, le=100),
-    current_user: orm.User = Depends(require_role(["teacher", "admin"])),
+    current_user: orm.User = Depends(require_teacher),
     search: str = Query(None, description="按题干/答案模糊搜索"),
     includePublic: bool = Query(False, description="是否包含公共题目"),
+    cursor: Optional[str] = Query(None, description="上一页返回的 nextCursor；传入时忽略 page"),
 ):
     """
-    简单分页列出题目。
+    分页列出题目。顺序翻页请使用 nextCursor（keyset 分页），page 仅用于跳页。
     """
     offset = (page - 1) * limit
-    query = db.query(orm.Question)
+    # 只查视图需要的列（外加分页游标用的 created_at），返回轻量行元组而非 ORM 实体
+    query = db.query(*_QUESTION_VIEW_COLUMNS)
     if includePublic:
         query = query.filter(or_(orm.Question.created_by == current_user.id, orm.Question.is_public == True))
     else:
@@ -504,61 +606,22 @@ async def list_questions(
         query = query.filter(
             or_(orm.Question.question_text.ilike(like), orm.Question.answer.ilike(like))
         )
-    total = query.count()
-    items = query.order_by(orm.Question.created_at.desc()).offset(offset).limit(limit).all()
-    view_items = [
-        QuestionView(
-            id=item.id,
-            questionText=item.question_text,
-            options=item.options,
-            answer=item.answer,
-            explanation=item.explanation,
-            hasGeometry=item.has_geometry,
-            geometrySvg=item.geometry_svg,
-            geometryTikz=item.geometry_tikz,
-            knowledgePoints=item.knowledge_points or [],
-            difficulty=item.difficulty,
-            questionType=item.question_type,
-            source=item.source,
-            year=item.year,
-            aiGenerated=item.ai_generated,
-            isPublic=item.is_public,
-            status=item.status,
-            isHighSchool=item.is_high_school,
-        )
-        for item in items
-    ]
-    return QuestionListResponse(total=total, items=view_items)
+    items, next_cursor, total = paginate_with_total(query, orm.Question, limit, cursor, offset)
+    # 每行组装成 dict 后整页一次序列化，不逐行构造 QuestionView
+    view_items = [QuestionView.row_dict(row) for row in items]
+    return FastJSONResponse({"total": total, "items": view_items, "nextCursor": next_cursor})
 
 
 @router.get("/questions/{question_id}", response_model=QuestionView)
-async def get_question_detail(
+def get_question_detail(
     question_id: str,
     db: Session = Depends(get_db),
-    _: orm.User = Depends(require_role(["teacher", "admin"])),
+    _: orm.User = Depends(require_teacher),
 ):
     q = db.query(orm.Question).filter(orm.Question.id == question_id).first()
     if not q:
         raise HTTPException(status_code=404, detail="question not found")
-    return QuestionView(
-        id=q.id,
-        questionText=q.question_text,
-        options=q.options,
-        answer=q.answer,
-        explanation=q.explanation,
-        hasGeometry=q.has_geometry,
-        geometrySvg=q.geometry_svg,
-        geometryTikz=q.geometry_tikz,
-        knowledgePoints=q.knowledge_points or [],
-        difficulty=q.difficulty,
-        questionType=q.question_type,
-        source=q.source,
-        year=q.year,
-        aiGenerated=q.ai_generated,
-        isPublic=q.is_public,
-        status=q.status,
-        isHighSchool=q.is_high_school,
-    )
+    return _json_response(QuestionView.from_row(q))
 
 
 @router.put("/questions/{question_id}", response_model=QuestionView)
@@ -566,7 +629,7 @@ async def update_question(
     question_id: str,
     payload: QuestionCreateRequest,
     db: Session = Depends(get_db),
-    current_user: orm.User = Depends(require_role(["teacher", "admin"])),
+    current_user: orm.User = Depends(require_teacher),
 ):
     """
     更新题目信息。只能更新自己创建的题目。
@@ -630,6 +693,13 @@ async def update_question(
             )
         # 如果 approved，继续正常更新
     
+    # 参与向量的文本（题干 / 答案 / 知识点）变化时需重建向量
+    text_changed = (
+        q.question_text != payload.questionText
+        or q.answer != payload.answer
+        or (q.knowledge_points or []) != payload.knowledgePoints
+    )
+    
     # 更新字段
     q.question_text = payload.questionText
     q.options = payload.options
@@ -648,38 +718,24 @@ async def update_question(
     q.status = payload.status or q.status
     
     try:
+        # 响应视图在 flush 后、提交前构造：字段都已在内存中，省去提交后 refresh 的整行 SELECT
+        db.flush()
+        view = QuestionView.from_row(q)
         db.commit()
-        db.refresh(q)
     except Exception:
         db.rollback()
         raise
     
-    return QuestionView(
-        id=q.id,
-        questionText=q.question_text,
-        options=q.options,
-        answer=q.answer,
-        explanation=q.explanation,
-        hasGeometry=q.has_geometry,
-        geometrySvg=q.geometry_svg,
-        geometryTikz=q.geometry_tikz,
-        knowledgePoints=q.knowledge_points or [],
-        difficulty=q.difficulty,
-        questionType=q.question_type,
-        source=q.source,
-        year=q.year,
-        aiGenerated=q.ai_generated,
-        isPublic=q.is_public,
-        status=q.status,
-        isHighSchool=q.is_high_school,
-    )
+    if text_changed:
+        asyncio.create_task(_index_in_background(question_id))
+    return _json_response(view)
 
 
 @router.delete("/questions/{question_id}")
-async def delete_question(
+def delete_question(
     question_id: str,
     db: Session = Depends(get_db),
-    current_user: orm.User = Depends(require_role(["teacher", "admin"])),
+    current_user: orm.User = Depends(require_teacher),
 ):
     """
     删除题目。只能删除自己创建的题目。
@@ -700,6 +756,7 @@ async def delete_question(
     except Exception:
         db.rollback()
         raise
+    rag_service.remove_question(db, question_id)
     
     return {"success": True, "message": "题目已删除"}
 
@@ -718,23 +775,18 @@ async def export_paper(
     - pdf: 调用 pdflatex（如果可用），否则返回错误和 latex 文本。
     - docx: 使用 python-docx（如果已安装）。
     """
-    paper = db.query(orm.Paper).filter(orm.Paper.id == paper_id).first()
+    # 试卷题目及其题干一次 IN 查询加载（selectin + joined），避免懒加载与二次查询
+    paper = (
+        db.query(orm.Paper)
+        .options(selectinload(orm.Paper.questions).joinedload(orm.PaperQuestion.question))
+        .filter(orm.Paper.id == paper_id)
+        .first()
+    )
     if not paper:
         raise HTTPException(status_code=404, detail="paper not found")
     qlist = paper.questions
-    question_ids = [pq.question_id for pq in qlist]
-    questions = db.query(orm.Question).filter(orm.Question.id.in_(question_ids)).all()
-    qmap = {q.id: q for q in questions}
-
-    pq_view = [
-        PaperQuestionView(
-            questionId=pq.question_id,
-            order=pq.order,
-            score=pq.score,
-            customLabel=pq.custom_label,
-        )
-        for pq in qlist
-    ]
+    qmap = {pq.question_id: pq.question for pq in qlist if pq.question is not None}
+
     tpl = get_template(paper.template_type) if paper.template_type else None
     if tpl:
         latex, attachments = export_service.build_latex_from_template(
@@ -754,31 +806,14 @@ async def export_paper(
             include_explanation=include_explanation,
         )
 
-    payload = PaperView(
-        id=paper.id,
-        title=paper.title,
-        description=paper.description,
-        templateType=paper.template_type,
-        totalScore=paper.total_score,
-        timeLimit=paper.time_limit,
-        tags=paper.tags or [],
-        subject=paper.subject,
-        gradeLevel=paper.grade_level,
-        questions=pq_view,
-    ).model_dump()
-    payload["latex"] = latex
-
     if format == "pdf":
-        ok, out, log = export_service.compile_pdf(latex, attachments=attachments)
+        # xelatex 编译耗时数秒，放到线程池执行，避免阻塞事件循环；相同内容直接命中 PDF 缓存
+        ok, out, log = await asyncio.to_thread(export_service.compile_pdf_cached, latex, attachments)
         if ok:
-            file_path = Path(out)
-            bg = background_tasks or BackgroundTasks()
-            bg.add_task(export_service.cleanup_file, file_path)
             return FileResponse(
-                file_path,
+                Path(out),
                 media_type="application/pdf",
                 filename=f"{paper.title or 'paper'}.pdf",
-                background=bg,
             )
         raise HTTPException(status_code=500, detail={"error": "pdf_export_failed", "detail": out, "latex": latex, "log": log})
     elif format == "docx":
@@ -796,7 +831,9 @@ async def export_paper(
                 background=bg,
             )
         raise HTTPException(status_code=500, detail={"error": "docx_export_failed", "detail": out, "log": log, "latex": latex})
-    # fallback
+    # fallback：只有走到这里才需要试卷视图
+    payload = PaperView.row_dict(paper)
+    payload["latex"] = latex
     return await export_service.export_stub(paper_id, format, payload)
 
 
@@ -812,13 +849,17 @@ async def export_paper_answer(
     - 选择题/填空题：只显示答案结果
     - 解答题：显示完整答案
     """
-    paper = db.query(orm.Paper).filter(orm.Paper.id == paper_id).first()
+    # 试卷题目及其题干一次 IN 查询加载（selectin + joined），避免懒加载与二次查询
+    paper = (
+        db.query(orm.Paper)
+        .options(selectinload(orm.Paper.questions).joinedload(orm.PaperQuestion.question))
+        .filter(orm.Paper.id == paper_id)
+        .first()
+    )
     if not paper:
         raise HTTPException(status_code=404, detail="paper not found")
     qlist = paper.questions
-    question_ids = [pq.question_id for pq in qlist]
-    questions = db.query(orm.Question).filter(orm.Question.id.in_(question_ids)).all()
-    qmap = {q.id: q for q in questions}
+    qmap = {pq.question_id: pq.question for pq in qlist if pq.question is not None}
 
     latex, attachments = export_service.build_answer_latex(paper, qlist, qmap)
 
@@ -826,25 +867,45 @@ async def export_paper_answer(
         return {"latex": latex, "paper_id": paper_id}
 
     if format == "pdf":
-        ok, out, log = export_service.compile_pdf(latex, attachments=attachments)
+        # xelatex 编译耗时数秒，放到线程池执行，避免阻塞事件循环；相同内容直接命中 PDF 缓存
+        ok, out, log = await asyncio.to_thread(export_service.compile_pdf_cached, latex, attachments)
         if ok:
-            file_path = Path(out)
-            bg = background_tasks or BackgroundTasks()
-            bg.add_task(export_service.cleanup_file, file_path)
             return FileResponse(
-                file_path,
+                Path(out),
                 media_type="application/pdf",
                 filename=f"{paper.title or 'paper'}_答案卷.pdf",
-                background=bg,
             )
         raise HTTPException(status_code=500, detail={"error": "pdf_export_failed", "detail": out, "latex": latex, "log": log})
 
 
+# 模块级语句对象：每次请求复用，命中 SQLAlchemy 的编译缓存
+_PAPER_INSERT = insert(orm.Paper).returning(orm.Paper.id)
+
+
+def _insert_paper_questions(db: Session, paper_id: str, questions) -> None:
+    """
+    试卷题目一条多值 INSERT 写入（SQLAlchemy 2.0 ORM 批量插入，走 insertmanyvalues），
+    不逐行 db.add；与试卷本身在同一事务内，由调用方统一提交
+    """
+    rows = [
+        {
+            "paper_id": paper_id,
+            "question_id": pq.questionId,
+            "order": pq.order,
+            "score": pq.score,
+            "custom_label": pq.customLabel,
+        }
+        for pq in questions
+    ]
+    if rows:
+        db.execute(insert(orm.PaperQuestion), rows)
+
+
 @router.post("/papers", response_model=PaperCreateResponse)
-async def create_paper(
+def create_paper(
     payload: PaperCreateRequest,
     db: Session = Depends(get_db),
-    current_user: orm.User = Depends(require_role(["teacher", "admin"])),
+    current_user: orm.User = Depends(require_teacher),
 ):
     """
     创建试卷（基础数据 + 题目顺序/分值）。
@@ -853,7 +914,8 @@ async def create_paper(
     qids = [pq.questionId for pq in payload.questions]
     if not qids:
         raise HTTPException(status_code=400, detail="questions list cannot be empty")
-    exist_map = {q.id: q for q in db.query(orm.Question).filter(orm.Question.id.in_(qids)).all()}
+    # 只取校验所需的列，不加载整行题目
+    exist_map = dict(db.query(orm.Question.id, orm.Question.question_type).filter(orm.Question.id.in_(qids)).all())
     missing = [qid for qid in qids if qid not in exist_map]
     if missing:
         raise HTTPException(status_code=400, detail=f"question ids not found: {missing}")
@@ -868,149 +930,198 @@ async def create_paper(
         sorted_slots = sorted(tpl.slots, key=lambda s: s.order)
         sorted_pq = sorted(payload.questions, key=lambda s: s.order)
         for idx, (slot, pq) in enumerate(zip(sorted_slots, sorted_pq)):
-            q = exist_map.get(pq.questionId)
-            if not q:
+            if pq.questionId not in exist_map:
                 continue
-            if (q.question_type or "").lower() != slot.question_type:
-                raise HTTPException(status_code=400, detail=f"question {pq.questionId} type {q.question_type} does not match template {slot.question_type} at slot {slot.order}")
+            question_type = exist_map[pq.questionId]
+            if (question_type or "").lower() != slot.question_type:
+                raise HTTPException(status_code=400, detail=f"question {pq.questionId} type {question_type} does not match template {slot.question_type} at slot {slot.order}")
             if pq.score is None or pq.score <= 0:
                 sorted_pq[idx].score = slot.default_score
         payload.questions = sorted_pq
         computed_total = sum(pq.score for pq in payload.questions)
 
     try:
-        paper = orm.Paper(
-            title=payload.title,
-            description=payload.description,
-            template_type=payload.templateType,
-            total_score=payload.totalScore or computed_total,
-            time_limit=payload.timeLimit,
-            tags=payload.tags,
-            subject=payload.subject,
-            grade_level=payload.gradeLevel,
-            created_by=current_user.id if current_user else None,
-        )
-        db.add(paper)
-        db.flush()  # 拿到 paper.id
-
-        for pq in payload.questions:
-            db.add(
-                orm.PaperQuestion(
-                    paper_id=paper.id,
-                    question_id=pq.questionId,
-                    order=pq.order,
-                    score=pq.score,
-                    custom_label=pq.customLabel,
-                )
-            )
+        # INSERT ... RETURNING id 直接拿到主键，不经过会话的 add + flush（工作单元排序与身份映射）
+        paper_id = db.execute(
+            _PAPER_INSERT,
+            {
+                "title": payload.title,
+                "description": payload.description,
+                "template_type": payload.templateType,
+                "total_score": payload.totalScore or computed_total,
+                "time_limit": payload.timeLimit,
+                "tags": payload.tags,
+                "subject": payload.subject,
+                "grade_level": payload.gradeLevel,
+                "created_by": current_user.id if current_user else None,
+            },
+        ).scalar_one()
+
+        # 一条多值 INSERT 写入全部题目关联，而不是逐题 INSERT
+        _insert_paper_questions(db, paper_id, payload.questions)
         db.commit()
-        return PaperCreateResponse(id=paper.id, created=True)
+        _invalidate_paper_count()
+        return _json_response(PaperCreateResponse(id=paper_id, created=True))
     except Exception:
         db.rollback()
         raise
 
 
+# 试卷详情缓存：paper_id -> (updated_at, 序列化好的 JSON)。进程内 LRU 在前，
+# 配置了 Redis 时再共享给其他 worker（键含 updated_at，旧版本到期自动清除）
+PAPER_DETAIL_CACHE_SIZE = 256
+PAPER_DETAIL_CACHE_TTL = 3600
+_paper_details: "OrderedDict[str, tuple]" = OrderedDict()
+# 详情接口在线程池中执行，LRU 的调整需加锁
+_paper_details_lock = threading.Lock()
+
+
+def _get_paper_detail_cache(paper_id: str, stamp: str) -> Optional[bytes]:
+    with _paper_details_lock:
+        hit = _paper_details.get(paper_id)
+        if hit and hit[0] == stamp:
+            _paper_details.move_to_end(paper_id)
+            return hit[1]
+    r = get_redis()
+    if r is None:
+        return None
+    try:
+        text = r.get(f"paper:detail:{paper_id}:{stamp}")
+    except Exception as e:
+        print(f"Redis 读取试卷缓存失败: {e}")
+        return None
+    if text is None:
+        return None
+    body = text.encode("utf-8")
+    _remember_paper_detail(paper_id, stamp, body)
+    return body
+
+
+def _put_paper_detail_cache(paper_id: str, stamp: str, body: bytes) -> None:
+    _remember_paper_detail(paper_id, stamp, body)
+    r = get_redis()
+    if r is None:
+        return
+    try:
+        r.set(f"paper:detail:{paper_id}:{stamp}", body.decode("utf-8"), ex=PAPER_DETAIL_CACHE_TTL)
+    except Exception as e:
+        print(f"Redis 写入试卷缓存失败: {e}")
+
+
+def _remember_paper_detail(paper_id: str, stamp: str, body: bytes) -> None:
+    with _paper_details_lock:
+        _paper_details[paper_id] = (stamp, body)
+        _paper_details.move_to_end(paper_id)
+        while len(_paper_details) > PAPER_DETAIL_CACHE_SIZE:
+            _paper_details.popitem(last=False)
+
+
 @router.get("/papers/{paper_id}", response_model=PaperView)
-async def get_paper_detail(
+def get_paper_detail(
     paper_id: str,
     db: Session = Depends(get_db),
-    _: orm.User = Depends(require_role(["teacher", "admin"])),
+    _: orm.User = Depends(require_teacher),
 ):
-    paper = db.query(orm.Paper).filter(orm.Paper.id == paper_id).first()
-    if not paper:
+    # 先只查 updated_at（主键点查）作为版本号：未变化的试卷直接返回缓存的 JSON，
+    # 省去题目列表查询与序列化；任何修改都会更新 updated_at，旧版本自然不再命中。
+    # 旧数据 updated_at 可能为 NULL，退回 created_at；两者都没有时不走缓存
+    row = db.query(orm.Paper.updated_at, orm.Paper.created_at).filter(orm.Paper.id == paper_id).first()
+    if row is None:
         raise HTTPException(status_code=404, detail="paper not found")
-    pq_view = [
-        PaperQuestionView(
-            questionId=pq.question_id,
-            order=pq.order,
-            score=pq.score,
-            customLabel=pq.custom_label,
+    version = row.updated_at or row.created_at
+    stamp = version.isoformat() if version is not None else None
+    body = _get_paper_detail_cache(paper_id, stamp) if stamp else None
+    if body is None:
+        paper = (
+            db.query(orm.Paper)
+            .options(selectinload(orm.Paper.questions))
+            .filter(orm.Paper.id == paper_id)
+            .first()
         )
-        for pq in paper.questions
-    ]
-    return PaperView(
-        id=paper.id,
-        title=paper.title,
-        description=paper.description,
-        templateType=paper.template_type,
-        totalScore=paper.total_score,
-        timeLimit=paper.time_limit,
-        tags=paper.tags or [],
-        subject=paper.subject,
-        gradeLevel=paper.grade_level,
-        questions=pq_view,
-    )
+        if not paper:
+            raise HTTPException(status_code=404, detail="paper not found")
+        body = json_bytes(PaperView.row_dict(paper))
+        if stamp:
+            _put_paper_detail_cache(paper_id, stamp, body)
+    return Response(content=body, media_type="application/json")
+
+
+# 试卷总数短 TTL 缓存：列表每页都要 total，而总数只在增删试卷时变化。
+# 本进程增删时立即失效；多 worker 下其他进程最多滞后 PAPER_COUNT_TTL 秒
+PAPER_COUNT_TTL = 30
+_paper_count: Optional[tuple] = None  # (总数, 过期时间)
+
+
+def _cached_paper_count(db: Session) -> int:
+    global _paper_count
+    now = time.monotonic()
+    if _paper_count is None or _paper_count[1] <= now:
+        _paper_count = (db.execute(select(func.count()).select_from(orm.Paper)).scalar_one(), now + PAPER_COUNT_TTL)
+    return _paper_count[0]
+
+
+def _invalidate_paper_count() -> None:
+    global _paper_count
+    _paper_count = None
 
 
 @router.get("/papers", response_model=PaperListResponse)
-async def list_papers(
+def list_papers(
     db: Session = Depends(get_db),
     page: int = Query(1, ge=1),
     limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="上一页返回的 nextCursor；传入时忽略 page"),
+    withCount: bool = Query(False, description="游标翻页时也返回 total"),
 ):
     """
-    简单分页列出试卷。
+    分页列出试卷。顺序翻页请使用 nextCursor（keyset 分页），page 仅用于跳页。
+    游标翻页默认不返回 total（为 null）；total 取自短 TTL 缓存，不是每页一次 COUNT(*)。
     """
     offset = (page - 1) * limit
-    total = db.query(orm.Paper).count()
-    papers = (
-        db.query(orm.Paper)
-        .order_by(orm.Paper.created_at.desc())
-        .offset(offset)
-        .limit(limit)
-        .all()
+    total = _cached_paper_count(db) if not cursor or withCount else None
+    # 延迟关联：先只在 (created_at, id) 索引上排序 / 跳过取出本页 ID（仅扫索引），
+    # 再按主键回表本页这几行，而不是让数据库排序并丢弃 offset 行完整记录
+    id_rows, next_cursor = paginate(db.query(orm.Paper.id, orm.Paper.created_at), orm.Paper, limit, cursor, offset)
+    ids = [row.id for row in id_rows]
+    # 本页所有试卷的题目列表用一次 IN 查询加载，避免逐卷懒加载（N+1）
+    by_id = {
+        p.id: p
+        for p in db.query(orm.Paper).options(selectinload(orm.Paper.questions)).filter(orm.Paper.id.in_(ids))
+    } if ids else {}
+    # 逐卷序列化并流式输出：不再先为整页构造 dict 列表和完整响应体，峰值内存只有单卷大小。
+    # 生成器在依赖关闭会话之后才运行，因此只访问上面已加载的属性，不再查询数据库
+    items = (PaperView.row_dict(by_id[pid]) for pid in ids if pid in by_id)
+    return StreamingResponse(
+        stream_json_list({"total": total, "nextCursor": next_cursor}, "items", items),
+        media_type="application/json",
     )
-    items = []
-    for p in papers:
-        qlist = [
-            PaperQuestionView(
-                questionId=pq.question_id,
-                order=pq.order,
-                score=pq.score,
-                customLabel=pq.custom_label,
-            )
-            for pq in p.questions
-        ]
-        items.append(
-            PaperView(
-                id=p.id,
-                title=p.title,
-                description=p.description,
-                templateType=p.template_type,
-                totalScore=p.total_score,
-                timeLimit=p.time_limit,
-                tags=p.tags or [],
-                subject=p.subject,
-                gradeLevel=p.grade_level,
-                questions=qlist,
-            )
-        )
-    return PaperListResponse(total=total, items=items)
 
 
 @router.put("/papers/{paper_id}")
-async def update_paper(
+def update_paper(
     paper_id: str,
     payload: PaperCreateRequest,
     db: Session = Depends(get_db),
-    current_user: orm.User = Depends(require_role(["teacher", "admin"])),
+    current_user: orm.User = Depends(require_teacher),
 ):
     """
     更新试卷（标题、描述、时限、题目列表）。只能更新自己创建的试卷。
     """
-    paper = db.query(orm.Paper).filter(orm.Paper.id == paper_id).first()
-    if not paper:
+    # 只取权限检查所需的 created_by，不加载整行
+    row = db.query(orm.Paper.created_by).filter(orm.Paper.id == paper_id).first()
+    if not row:
         raise HTTPException(status_code=404, detail="paper not found")
     
     # 权限检查：只能更新自己的试卷
-    if paper.created_by != current_user.id:
+    if row.created_by != current_user.id:
         raise HTTPException(status_code=403, detail="无权限修改此试卷")
     
     # 校验题目是否存在
     qids = [pq.questionId for pq in payload.questions]
     if not qids:
         raise HTTPException(status_code=400, detail="questions list cannot be empty")
-    exist_map = {q.id: q for q in db.query(orm.Question).filter(orm.Question.id.in_(qids)).all()}
+    # 只取校验所需的列，不加载整行题目
+    exist_map = dict(db.query(orm.Question.id, orm.Question.question_type).filter(orm.Question.id.in_(qids)).all())
     missing = [qid for qid in qids if qid not in exist_map]
     if missing:
         raise HTTPException(status_code=400, detail=f"question ids not found: {missing}")
@@ -1018,60 +1129,72 @@ async def update_paper(
     computed_total = sum(pq.score for pq in payload.questions)
 
     try:
-        # 更新试卷基本信息
-        paper.title = payload.title
-        paper.description = payload.description
-        paper.template_type = payload.templateType
-        paper.total_score = payload.totalScore or computed_total
-        paper.time_limit = payload.timeLimit
-        paper.tags = payload.tags
-        paper.subject = payload.subject
-        paper.grade_level = payload.gradeLevel
+        # 更新试卷基本信息（一条 UPDATE，不经 ORM 对象）；updated_at 显式刷新：
+        # 只改题目列表时试卷行本身可能没有变化，而详情缓存以 updated_at 为版本号
+        db.execute(
+            update(orm.Paper)
+            .where(orm.Paper.id == paper_id)
+            .values(
+                title=payload.title,
+                description=payload.description,
+                template_type=payload.templateType,
+                total_score=payload.totalScore or computed_total,
+                time_limit=payload.timeLimit,
+                tags=payload.tags,
+                subject=payload.subject,
+                grade_level=payload.gradeLevel,
+                updated_at=datetime.now(timezone.utc),
+            )
+        )
         
         # 删除旧的题目关联
         db.query(orm.PaperQuestion).filter(orm.PaperQuestion.paper_id == paper_id).delete()
         
-        # 添加新的题目关联
-        for pq in payload.questions:
-            db.add(
-                orm.PaperQuestion(
-                    paper_id=paper.id,
-                    question_id=pq.questionId,
-                    order=pq.order,
-                    score=pq.score,
-                    custom_label=pq.customLabel,
-                )
-            )
+        # 添加新的题目关联（一条多值 INSERT）
+        _insert_paper_questions(db, paper_id, payload.questions)
         
         db.commit()
-        return {"success": True, "message": "试卷已更新", "id": paper.id}
+        return {"success": True, "message": "试卷已更新", "id": paper_id}
     except Exception:
         db.rollback()
         raise
 
 
 @router.delete("/papers/{paper_id}")
-async def delete_paper(
+def delete_paper(
     paper_id: str,
     db: Session = Depends(get_db),
-    current_user: orm.User = Depends(require_role(["teacher", "admin"])),
+    current_user: orm.User = Depends(require_teacher),
 ):
     """
     删除试卷。只能删除自己创建的试卷。
     """
-    paper = db.query(orm.Paper).filter(orm.Paper.id == paper_id).first()
-    if not paper:
-        raise HTTPException(status_code=404, detail="paper not found")
-    
-    # 权限检查：只能删除自己的试卷
-    if paper.created_by != current_user.id:
-        raise HTTPException(status_code=403, detail="无权限删除此试卷")
-    
     try:
-        # 删除关联的 PaperQuestion
-        db.query(orm.PaperQuestion).filter(orm.PaperQuestion.paper_id == paper_id).delete()
-        db.delete(paper)
+        # 权限条件并入 DELETE 的 WHERE：正常路径一条语句完成检查与删除，检查与删除之间也不会被并发修改。
+        # 题目关联由外键 ON DELETE CASCADE 在库内删除；SQLite 未启用外键约束，仍需手动删除关联
+        if db.get_bind().dialect.name == "sqlite":
+            db.query(orm.PaperQuestion).filter(
+                orm.PaperQuestion.paper_id == paper_id,
+                orm.PaperQuestion.paper_id.in_(
+                    select(orm.Paper.id).where(orm.Paper.id == paper_id, orm.Paper.created_by == current_user.id)
+                ),
+            ).delete(synchronize_session=False)
+        deleted = db.execute(
+            delete(orm.Paper).where(orm.Paper.id == paper_id, orm.Paper.created_by == current_user.id)
+        ).rowcount
+        if not deleted:
+            db.rollback()
+            # 未删除时再查一次，区分不存在（404）与无权限（403）
+            exists = db.query(orm.Paper.id).filter(orm.Paper.id == paper_id).first()
+            if not exists:
+                raise HTTPException(status_code=404, detail="paper not found")
+            raise HTTPException(status_code=403, detail="无权限删除此试卷")
         db.commit()
+        _invalidate_paper_count()
+        with _paper_details_lock:
+            _paper_details.pop(paper_id, None)
+    except HTTPException:
+        raise
     except Exception:
         db.rollback()
         raise
@@ -1082,105 +1205,115 @@ async def delete_paper(
 # ===== 管理员审核 API =====
 
 @router.get("/admin/publish-reviews")
-async def list_publish_reviews(
+def list_publish_reviews(
     status: str = Query("pending", pattern="^(pending|approved|rejected|all)$"),
     db: Session = Depends(get_db),
-    current_user: orm.User = Depends(require_role(["admin"])),
+    current_user: orm.User = Depends(require_admin),
 ):
     """
     管理员查看待审核的发布请求列表
     """
-    query = db.query(orm.PublishReview)
+    # 一次 LEFT JOIN 取回审核记录及两道题的题干预览：只取用到的列，题干在库内截断到 200 字，
+    # 不再逐条审核各查两次 Question、拉回完整题干
+    R = orm.PublishReview
+    Q = aliased(orm.Question)
+    SQ = aliased(orm.Question)
+    query = (
+        db.query(
+            R.id,
+            R.question_id,
+            R.status,
+            R.review_type,
+            R.similarity_score,
+            R.similar_question_id,
+            R.requested_by,
+            R.created_at,
+            func.substr(Q.question_text, 1, 200).label("qt"),
+            func.substr(SQ.question_text, 1, 200).label("sqt"),
+        )
+        .outerjoin(Q, Q.id == R.question_id)
+        .outerjoin(SQ, SQ.id == R.similar_question_id)
+    )
     if status != "all":
-        query = query.filter(orm.PublishReview.status == status)
-    reviews = query.order_by(orm.PublishReview.created_at.desc()).limit(50).all()
+        query = query.filter(R.status == status)
+    rows = query.order_by(R.created_at.desc()).limit(50).all()
     
-    result = []
-    for r in reviews:
-        q = db.query(orm.Question).filter(orm.Question.id == r.question_id).first()
-        similar_q = None
-        if r.similar_question_id:
-            similar_q = db.query(orm.Question).filter(orm.Question.id == r.similar_question_id).first()
-        
-        result.append({
+    result = [
+        {
             "id": r.id,
             "questionId": r.question_id,
-            "questionText": q.question_text[:200] if q else "",
+            "questionText": r.qt or "",
             "status": r.status,
             "reviewType": r.review_type,
             "similarityScore": r.similarity_score,
             "similarQuestionId": r.similar_question_id,
-            "similarQuestionText": similar_q.question_text[:200] if similar_q else None,
+            "similarQuestionText": r.sqt,
             "requestedBy": r.requested_by,
-            "createdAt": r.created_at.isoformat() if r.created_at else None,
-        })
+            "createdAt": r.created_at,
+        }
+        for r in rows
+    ]
     
-    return {"items": result, "total": len(result)}
+    # datetime 由 orjson 直接编码为 ISO 8601
+    return FastJSONResponse({"items": result, "total": len(result)})
+
+
+def _close_publish_review(db: Session, review_id: str, **values) -> str:
+    """
+    单条 UPDATE ... WHERE status='pending' RETURNING 完成审核，返回题目 ID；
+    不加载 ORM 对象，并发重复审核时也只有一方生效。未命中时再查一次区分 404 / 400
+    """
+    question_id = db.execute(
+        update(orm.PublishReview)
+        .where(orm.PublishReview.id == review_id, orm.PublishReview.status == "pending")
+        .values(reviewed_at=datetime.now(timezone.utc), **values)
+        .returning(orm.PublishReview.question_id)
+    ).scalar()
+    if question_id is None:
+        db.rollback()
+        exists = db.query(orm.PublishReview.id).filter(orm.PublishReview.id == review_id).first()
+        if not exists:
+            raise HTTPException(status_code=404, detail="review not found")
+        raise HTTPException(status_code=400, detail="该请求已处理")
+    return question_id
 
 
 @router.post("/admin/publish-reviews/{review_id}/approve")
-async def approve_publish_review(
+def approve_publish_review(
     review_id: str,
     db: Session = Depends(get_db),
-    current_user: orm.User = Depends(require_role(["admin"])),
+    current_user: orm.User = Depends(require_admin),
 ):
     """
     管理员批准发布请求
     """
-    from datetime import datetime, timezone
-    
-    review = db.query(orm.PublishReview).filter(orm.PublishReview.id == review_id).first()
-    if not review:
-        raise HTTPException(status_code=404, detail="review not found")
-    if review.status != "pending":
-        raise HTTPException(status_code=400, detail="该请求已处理")
-    
-    # 更新审核状态
-    review.status = "approved"
-    review.reviewed_by = current_user.id
-    review.reviewed_at = datetime.now(timezone.utc)
-    
+    question_id = _close_publish_review(db, review_id, status="approved", reviewed_by=current_user.id)
+
     # 将题目设为公开
-    q = db.query(orm.Question).filter(orm.Question.id == review.question_id).first()
-    if q:
-        q.is_public = True
-    
+    db.execute(update(orm.Question).where(orm.Question.id == question_id).values(is_public=True))
+
     db.commit()
     return {"success": True, "message": "已批准发布"}
 
 
 @router.post("/admin/publish-reviews/{review_id}/reject")
-async def reject_publish_review(
+def reject_publish_review(
     review_id: str,
     notes: str = Query(None),
     db: Session = Depends(get_db),
-    current_user: orm.User = Depends(require_role(["admin"])),
+    current_user: orm.User = Depends(require_admin),
 ):
     """
     管理员拒绝发布请求
     """
-    from datetime import datetime, timezone
-    
-    review = db.query(orm.PublishReview).filter(orm.PublishReview.id == review_id).first()
-    if not review:
-        raise HTTPException(status_code=404, detail="review not found")
-    if review.status != "pending":
-        raise HTTPException(status_code=400, detail="该请求已处理")
-    
-    review.status = "rejected"
-    review.reviewed_by = current_user.id
-    review.reviewed_at = datetime.now(timezone.utc)
-    review.admin_notes = notes
-    
+    _close_publish_review(db, review_id, status="rejected", reviewed_by=current_user.id, admin_notes=notes)
+
     db.commit()
     return {"success": True, "message": "已拒绝发布"}
 
 
 # ===================== 试卷草稿 API =====================
 
-from pydantic import BaseModel
-from typing import Optional, List, Any
-
 class DraftSaveRequest(BaseModel):
     title: Optional[str] = None
     templateId: Optional[str] = None
@@ -1188,52 +1321,54 @@ class DraftSaveRequest(BaseModel):
     questionsData: Optional[List[Any]] = None
 
 @router.post("/papers/drafts")
-async def save_draft(
+def save_draft(
     request: DraftSaveRequest,
     db: Session = Depends(get_db),
     current_user: orm.User = Depends(get_current_user),
 ):
     """保存或更新试卷草稿（每用户只保留一份最新草稿）"""
-    
-    # 查找现有草稿
-    draft = db.query(orm.PaperDraft).filter(orm.PaperDraft.user_id == current_user.id).first()
-    
-    if draft:
-        # 更新现有草稿
-        if request.title is not None:
-            draft.title = request.title
-        if request.templateId is not None:
-            draft.template_id = request.templateId
-        if request.timeLimit is not None:
-            draft.time_limit = request.timeLimit
-        if request.questionsData is not None:
-            draft.questions_data = request.questionsData
-    else:
-        # 创建新草稿
-        draft = orm.PaperDraft(
-            user_id=current_user.id,
-            title=request.title,
-            template_id=request.templateId,
-            time_limit=request.timeLimit,
-            questions_data=request.questionsData or [],
-        )
-        db.add(draft)
-    
+    # 只更新请求中给出的字段；updated_at 的 onupdate 对 ON CONFLICT 不生效，显式写入
+    changes = {
+        "title": request.title,
+        "template_id": request.templateId,
+        "time_limit": request.timeLimit,
+        "questions_data": request.questionsData,
+    }
+    changes = {k: v for k, v in changes.items() if v is not None}
+    changes["updated_at"] = datetime.now(timezone.utc)
+
+    # 单条 INSERT ... ON CONFLICT (user_id) DO UPDATE ... RETURNING：并发自动保存不会重复插入，也无需再 refresh
+    draft_table = orm.PaperDraft.__table__
+    stmt = dialect_insert(orm.PaperDraft).values(
+        user_id=current_user.id,
+        title=request.title,
+        template_id=request.templateId,
+        time_limit=request.timeLimit,
+        questions_data=request.questionsData or [],
+    )
+    stmt = stmt.on_conflict_do_update(index_elements=["user_id"], set_=changes).returning(
+        draft_table.c.id,
+        draft_table.c.title,
+        draft_table.c.template_id,
+        draft_table.c.time_limit,
+        draft_table.c.questions_data,
+        draft_table.c.updated_at,
+    )
+    draft = db.execute(stmt).one()
     db.commit()
-    db.refresh(draft)
-    
-    return {
+
+    return FastJSONResponse({
         "id": draft.id,
         "title": draft.title,
         "templateId": draft.template_id,
         "timeLimit": draft.time_limit,
         "questionsData": draft.questions_data,
-        "updatedAt": draft.updated_at.isoformat() if draft.updated_at else None,
-    }
+        "updatedAt": draft.updated_at,
+    })
 
 
 @router.get("/papers/drafts/current")
-async def get_current_draft(
+def get_current_draft(
     db: Session = Depends(get_db),
     current_user: orm.User = Depends(get_current_user),
 ):
@@ -1243,27 +1378,26 @@ async def get_current_draft(
     if not draft:
         return None
     
-    return {
+    return FastJSONResponse({
         "id": draft.id,
         "title": draft.title,
         "templateId": draft.template_id,
         "timeLimit": draft.time_limit,
         "questionsData": draft.questions_data or [],
-        "updatedAt": draft.updated_at.isoformat() if draft.updated_at else None,
-    }
+        "updatedAt": draft.updated_at,
+    })
 
 
 @router.delete("/papers/drafts/current")
-async def delete_current_draft(
+def delete_current_draft(
     db: Session = Depends(get_db),
     current_user: orm.User = Depends(get_current_user),
 ):
     """删除当前用户的草稿"""
-    draft = db.query(orm.PaperDraft).filter(orm.PaperDraft.user_id == current_user.id).first()
-    
-    if draft:
-        db.delete(draft)
-        db.commit()
+    # 直接按 user_id 删除并看影响行数，不先加载整行（含 questions_data JSON）
+    deleted = db.execute(delete(orm.PaperDraft).where(orm.PaperDraft.user_id == current_user.id)).rowcount
+    db.commit()
+    if deleted:
         return {"success": True, "message": "草稿已删除"}
     
     return {"success": True, "message": "无草稿"}
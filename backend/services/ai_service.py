@@ -1,30 +1,115 @@
 """
 统一AI服务层：支持Gemini和OpenAI（或OpenAI兼容API）
 """
+import asyncio
+import base64
+import copy
+import hashlib
 import json
 import mimetypes
 import os
-from typing import Optional
+import random
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Dict, List, Optional
 import re
 
 from fastapi import UploadFile
 
 from config import get_settings
+from services.batch_queue import AsyncBatchQueue
 
-# 可选依赖
-try:
-    import google.generativeai as genai
-except ImportError:
-    genai = None
-
-try:
-    from openai import OpenAI
-except ImportError:
-    OpenAI = None
+# 可选依赖（google-generativeai / openai）在 _init_* 中按需导入，
+# 避免应用启动时加载未使用的 SDK
 
 
 settings = get_settings()
 
+# 同一图片（+ 提示词 / 模型）的分析去重：
+# - _inflight：正在进行的分析，并发的相同请求共享同一个 Future，只调用一次模型
+# - _results：已完成的结果短期缓存，刷新页面 / 重复上传时直接命中
+ANALYZE_CACHE_TTL = 3600
+ANALYZE_CACHE_SIZE = 1024
+_inflight: Dict[bytes, asyncio.Future] = {}
+_results: "OrderedDict[bytes, tuple]" = OrderedDict()  # key -> (过期时间, 结果)
+
+
+# 暂时性错误（429 / 超时 / 5xx）的重试：共 AI_RETRY_ATTEMPTS 次，等待按指数增长
+AI_RETRY_ATTEMPTS = 3
+AI_RETRY_BASE_WAIT = 1.0
+AI_RETRY_MAX_WAIT = 8.0
+_TRANSIENT_STATUS = {408, 429, 500, 502, 503, 504}
+_TRANSIENT_MARKERS = ("rate limit", "ratelimit", "quota", "resource exhausted", "timeout", "timed out", "overloaded")
+
+
+def _is_transient_error(e: Exception) -> bool:
+    """按状态码（openai 的 status_code / google api_core 的 code）、异常类名与消息判断是否值得重试"""
+    status = getattr(e, "status_code", None) or getattr(e, "code", None)
+    if isinstance(status, int) and status in _TRANSIENT_STATUS:
+        return True
+    name = type(e).__name__
+    if name in ("RateLimitError", "APITimeoutError", "APIConnectionError", "ResourceExhausted",
+                "ServiceUnavailable", "DeadlineExceeded", "InternalServerError"):
+        return True
+    text = str(e).lower()
+    return "429" in text or any(marker in text for marker in _TRANSIENT_MARKERS)
+
+
+# 分析提示词：固定的 JSON 格式要求 + 默认附加说明（可被自定义提示词替换）。
+# 默认组合在导入时拼好一次，每次分析直接复用
+_FORMAT_REQUIREMENT = """请分析这道数学题，按以下 JSON 格式返回：
+{
+  "questionText": "题目完整文本（Markdown 格式，公式用 LaTeX）",
+  "options": ["A. ...", "B. ..."],  // 如果是选择题
+  "answer": "详细解答过程（Markdown + LaTeX）",
+  "hasGeometry": true/false,
+  "geometrySvg": "如果有几何图，生成 SVG 代码",
+  "knowledgePoints": ["知识点1", "知识点2"],
+  "difficulty": "easy/medium/hard",
+  "questionType": "choice/multi/fillblank/solve/proof",
+  "confidence": 0.0-1.0,
+  "isHighSchool": true/false  // 是否为高中数学范围的题目（若判断不出，返回 false）
+}
+仅输出 JSON，不要额外说明。"""
+
+_DEFAULT_INSTRUCTIONS = """重要：
+- questionText 只包含题干和选项，不要包含任何答案或解析。
+- 不要在题干前自动加题号（如 1.、(1) 等），题号由系统生成。
+- 答案与解题步骤只放在 answer 字段。
+- questionType 只能是 choice/multi/fillblank/solve/proof 之一，禁止组合值。
+- isHighSchool 为 true 仅限高中数学题；如果不是高中数学或无法判断，请返回 false。
+
+图形处理规则（非常重要）：
+- hasGeometry：如果图片中包含几何图形、函数图像、坐标系等图形，设为 true
+- geometrySvg：必须根据图片中的原始图形精确重绘为 SVG，禁止凭空想象或编造
+- 如果图片中没有图形，hasGeometry 设为 false，geometrySvg 设为 null
+
+SVG 重绘要求：
+1. 精确还原：
+   - 必须忠实还原图片中的图形，包括形状、位置、标注、虚实线等
+   - 坐标、角度、比例要与原图一致
+   - 所有文字标注（如点的名称 A/B/C、坐标值、角度等）必须完整保留
+
+2. 基本规范：
+   - viewBox="0 0 400 300"
+   - 只使用基础标签：<svg>, <line>, <circle>, <ellipse>, <path>, <polyline>, <polygon>, <rect>, <text>
+   - 禁止使用：<defs>, <marker>, <use>, <g>, <clipPath>, <mask> 等高级标签
+   - 虚线用 stroke-dasharray="5,5"
+   - 线条默认 stroke="#000" stroke-width="1.5"
+
+3. 文本标注规则：
+   - <text> 标签内容必须使用 Unicode 数学符号，禁止使用 LaTeX 格式（禁止 $...$）
+   - 分数写法：用斜杠表示，如 "π/6"、"2π/3"、"1/2"
+   - 常用符号：π ω φ θ α β γ（希腊字母）、√（根号）、x₁ x₂（下标）、x² x³（上标）
+   - 示例：<text x="100" y="180">π/6</text>
+
+4. 坐标轴与曲线：
+   - 坐标轴用 <line> 绘制，箭头用三角形 <polygon> 表示
+   - 曲线用 <polyline> 或 <path> 的 L/M 命令绘制"""
+
+_DEFAULT_ANALYSIS_PROMPT = f"{_FORMAT_REQUIREMENT}\n\n{_DEFAULT_INSTRUCTIONS}"
+
 
 class AIService:
     """
@@ -33,6 +118,13 @@ class AIService:
     
     def __init__(self):
         self.provider = settings.ai_provider
+        # 并发上限 + 最小发起间隔：超出时请求排队等待，而不是一起打到上游换来 429
+        self._sem = asyncio.Semaphore(max(1, settings.ai_max_concurrency))
+        self._min_interval = 1.0 / settings.ai_rps if settings.ai_rps > 0 else 0.0
+        self._next_slot = 0.0
+        # 多图合批队列：同一批必须共用提示词，只合并使用默认提示词的请求；
+        # 自定义提示词由调用方任意提供，逐个建队列会无限增长，直接单张分析
+        self._batch_queue: Optional[AsyncBatchQueue] = None
         
         if self.provider == "gemini":
             self._init_gemini()
@@ -44,6 +136,12 @@ class AIService:
     def _init_gemini(self):
         """初始化Gemini"""
         api_key = settings.gemini_api_key or os.getenv("GEMINI_API_KEY")
+        genai = None
+        if api_key:
+            try:
+                import google.generativeai as genai
+            except ImportError:
+                genai = None
         if api_key and genai:
             try:
                 genai.configure(api_key=api_key)
@@ -57,6 +155,12 @@ class AIService:
         """初始化OpenAI（或兼容API）"""
         api_key = settings.openai_api_key or os.getenv("OPENAI_API_KEY")
         base_url = settings.openai_base_url
+        OpenAI = None
+        if api_key:
+            try:
+                from openai import OpenAI
+            except ImportError:
+                OpenAI = None
         
         if api_key and OpenAI:
             try:
@@ -70,45 +174,168 @@ class AIService:
             self.client = None
     
     async def analyze(self, file: UploadFile, custom_prompt: str = None):
-        """分析题目图片，支持自定义提示词"""
-        if not self.client:
-            return self._stub_response(file.filename or "题目")
-        
-        if self.provider == "gemini":
-            return await self._analyze_with_gemini(file, custom_prompt)
-        elif self.provider == "openai":
-            return await self._analyze_with_openai(file, custom_prompt)
-        else:
+        """
+        分析题目图片，支持自定义提示词。
+        按图片内容哈希去重：并发的相同请求只调用一次模型，完成的结果缓存 ANALYZE_CACHE_TTL 秒
+        """
+        if not self.client or self.provider not in ("gemini", "openai"):
             return self._stub_response(file.filename or "题目")
+
+        # 只读取一次；调用方之后不再使用该文件对象，无需 seek 回开头
+        file_bytes = await file.read()
+        model = settings.gemini_model if self.provider == "gemini" else settings.openai_model
+        digest = hashlib.blake2b(file_bytes, digest_size=32)
+        digest.update(f"\0{self.provider}\0{model}\0{custom_prompt or ''}".encode("utf-8"))
+        key = digest.digest()
+
+        now = time.time()
+        hit = _results.get(key)
+        if hit is not None:
+            if hit[0] > now:
+                _results.move_to_end(key)
+                return copy.deepcopy(hit[1])
+            del _results[key]
+
+        fut = _inflight.get(key)
+        if fut is None:
+            fut = asyncio.ensure_future(self._analyze_bytes(file_bytes, file.filename, custom_prompt))
+            _inflight[key] = fut
+            fut.add_done_callback(lambda f: self._on_analyze_done(key, f))
+        # shield：某个请求被取消（如客户端断开）不影响共享同一分析的其他请求
+        return copy.deepcopy(await asyncio.shield(fut))
+
+    @staticmethod
+    def _on_analyze_done(key: bytes, fut: asyncio.Future):
+        _inflight.pop(key, None)
+        if fut.cancelled() or fut.exception() is not None:
+            return  # 失败不缓存，下次重新请求
+        _results[key] = (time.time() + ANALYZE_CACHE_TTL, fut.result())
+        _results.move_to_end(key)
+        while len(_results) > ANALYZE_CACHE_SIZE:
+            _results.popitem(last=False)
+
+    async def _analyze_bytes(self, file_bytes: bytes, filename: Optional[str], custom_prompt: str = None):
+        if not custom_prompt and settings.ai_batch_size > 1 and self.provider == "openai":
+            if self._batch_queue is None:
+                self._batch_queue = AsyncBatchQueue(
+                    self._analyze_openai_batch,
+                    max_batch_size=settings.ai_batch_size,
+                    max_wait_time=settings.ai_batch_wait_ms / 1000,
+                )
+            return await self._batch_queue.add_request((file_bytes, filename))
+        return await self._analyze_single(file_bytes, filename, custom_prompt)
+
+    async def _analyze_single(self, file_bytes: bytes, filename: Optional[str], custom_prompt: str = None):
+        # 去重之后才限流：共享同一 Future 的并发请求只占一个名额
+        call = self._analyze_with_gemini if self.provider == "gemini" else self._analyze_with_openai
+        async with self._sem:
+            return await self._call_with_retry(call, file_bytes, filename, custom_prompt)
+
+    async def _analyze_openai_batch(self, items: List[tuple]) -> list:
+        """
+        一次多图请求分析一批图片，按顺序拆回各自结果；
+        请求失败或返回条数不符时退回逐张分析，单张失败只影响对应请求
+        """
+        if len(items) == 1:
+            return [await self._analyze_single(items[0][0], items[0][1])]
+        results = None
+        try:
+            async with self._sem:
+                text = await self._call_with_retry(self._request_openai_batch, items)
+            results = self._extract_batch_json(text, len(items))
+            if results is None:
+                print(f"合批响应无法按 {len(items)} 条拆分，改为逐张分析")
+        except Exception as e:
+            print(f"合批分析失败，改为逐张分析: {e}")
+        if results is None:
+            results = await asyncio.gather(
+                *(self._analyze_single(data, name) for data, name in items),
+                return_exceptions=True,
+            )
+        return results
+
+    async def _request_openai_batch(self, items: List[tuple]) -> str:
+        n = len(items)
+        instruction = (
+            f"{self._get_analysis_prompt()}\n\n"
+            f"本次共 {n} 张图片，每张是一道独立的题目。请按图片顺序分别分析，"
+            f'返回 {{"results": [...]}}，results 为长度 {n} 的数组，每个元素是上述格式的 JSON 对象。仅输出 JSON。'
+        )
+        content = [{"type": "text", "text": instruction}]
+        content.extend(
+            {"type": "image_url", "image_url": {"url": self._data_url(data, name)}} for data, name in items
+        )
+        response = await asyncio.to_thread(
+            self.client.chat.completions.create,
+            model=settings.openai_model,
+            messages=[{"role": "user", "content": content}],
+            max_tokens=2000 * n,
+        )
+        return response.choices[0].message.content or ""
+
+    def _extract_batch_json(self, text: str, n: int) -> Optional[list]:
+        """解析合批响应 {"results": [...]}；格式或条数不符返回 None"""
+        cleaned = text.strip()
+        if "```" in cleaned:
+            cleaned = cleaned.split("```", 2)[1]
+            if cleaned.startswith("json"):
+                cleaned = cleaned[4:]
+        start, end = cleaned.find("{"), cleaned.rfind("}")
+        if start == -1 or end <= start:
+            return None
+        try:
+            data = json.loads(cleaned[start:end + 1], strict=False)
+        except ValueError:
+            return None
+        results = data.get("results") if isinstance(data, dict) else None
+        if not isinstance(results, list) or len(results) != n or not all(isinstance(r, dict) for r in results):
+            return None
+        return [self._post_process_json(r) for r in results]
+
+    async def _call_with_retry(self, fn, *args):
+        """
+        限流 / 超时 / 上游 5xx 等暂时性错误按指数退避重试（1s、2s…，上限 AI_RETRY_MAX_WAIT 秒）；
+        其他错误与最后一次失败直接抛出
+        """
+        for attempt in range(AI_RETRY_ATTEMPTS):
+            await self._wait_rate_limit()
+            try:
+                return await fn(*args)
+            except Exception as e:
+                if attempt == AI_RETRY_ATTEMPTS - 1 or not _is_transient_error(e):
+                    raise
+                wait = min(AI_RETRY_MAX_WAIT, AI_RETRY_BASE_WAIT * 2 ** attempt)
+                print(f"AI 调用暂时失败，{wait:g}s 后重试（第 {attempt + 1} 次）: {e}")
+                await asyncio.sleep(wait * random.uniform(0.8, 1.2))
+
+    async def _wait_rate_limit(self):
+        """按最小间隔预约下一个发起时刻；预约与更新之间没有 await，单事件循环内无需加锁"""
+        if not self._min_interval:
+            return
+        now = asyncio.get_running_loop().time()
+        slot = max(now, self._next_slot)
+        self._next_slot = slot + self._min_interval
+        if slot > now:
+            await asyncio.sleep(slot - now)
     
-    async def _analyze_with_gemini(self, file: UploadFile, custom_prompt: str = None):
+    async def _analyze_with_gemini(self, file_bytes: bytes, filename: Optional[str], custom_prompt: str = None):
         """使用Gemini分析"""
-        file_bytes = await file.read()
-        if hasattr(file, "file") and hasattr(file.file, "seek"):
-            file.file.seek(0)
-        mime, _ = mimetypes.guess_type(file.filename or "")
+        mime, _ = mimetypes.guess_type(filename or "")
         mime = mime or "image/png"
-        image_part = {"mime_type": mime, "data": file_bytes}
-        
+        # 原始 bytes 直接交给 SDK，不做额外编码或复制
         prompt = self._get_analysis_prompt(custom_prompt)
-        response = self.client.generate_content([prompt, image_part])
+        # SDK 为同步阻塞调用（数秒），放到线程池执行，不阻塞事件循环上的其他请求
+        response = await asyncio.to_thread(self.client.generate_content, [prompt, {"mime_type": mime, "data": file_bytes}])
         text = response.text or ""
         return self._extract_json(text)
     
-    async def _analyze_with_openai(self, file: UploadFile, custom_prompt: str = None):
+    async def _analyze_with_openai(self, file_bytes: bytes, filename: Optional[str], custom_prompt: str = None):
         """使用OpenAI（或兼容API）分析"""
-        import base64
-        
-        file_bytes = await file.read()
-        if hasattr(file, "file") and hasattr(file.file, "seek"):
-            file.file.seek(0)
-        base64_image = base64.b64encode(file_bytes).decode('utf-8')
-        
-        # 判断MIME类型
-        mime, _ = mimetypes.guess_type(file.filename or "")
-        mime = mime or "image/png"
+        data_url = self._data_url(file_bytes, filename)
         
-        response = self.client.chat.completions.create(
+        # SDK 为同步阻塞调用（数秒），放到线程池执行，不阻塞事件循环上的其他请求
+        response = await asyncio.to_thread(
+            self.client.chat.completions.create,
             model=settings.openai_model,
             messages=[
                 {
@@ -118,7 +345,7 @@ class AIService:
                         {
                             "type": "image_url",
                             "image_url": {
-                                "url": f"data:{mime};base64,{base64_image}"
+                                "url": data_url
                             }
                         }
                     ]
@@ -130,70 +357,22 @@ class AIService:
         text = response.choices[0].message.content
         return self._extract_json(text)
     
-    def _get_analysis_prompt(self, custom_prompt: str = None) -> str:
-        """获取分析提示词，支持自定义提示词"""
-        # 固定的JSON格式要求
-        format_requirement = """请分析这道数学题，按以下 JSON 格式返回：
-{
-  "questionText": "题目完整文本（Markdown 格式，公式用 LaTeX）",
-  "options": ["A. ...", "B. ..."],  // 如果是选择题
-  "answer": "详细解答过程（Markdown + LaTeX）",
-  "hasGeometry": true/false,
-  "geometrySvg": "如果有几何图，生成 SVG 代码",
-  "knowledgePoints": ["知识点1", "知识点2"],
-  "difficulty": "easy/medium/hard",
-  "questionType": "choice/multi/fillblank/solve/proof",
-  "confidence": 0.0-1.0,
-  "isHighSchool": true/false  // 是否为高中数学范围的题目（若判断不出，返回 false）
-}
-仅输出 JSON，不要额外说明。"""
-        
-        # 默认的附加说明
-        default_instructions = """重要：
-- questionText 只包含题干和选项，不要包含任何答案或解析。
-- 不要在题干前自动加题号（如 1.、(1) 等），题号由系统生成。
-- 答案与解题步骤只放在 answer 字段。
-- questionType 只能是 choice/multi/fillblank/solve/proof 之一，禁止组合值。
-- isHighSchool 为 true 仅限高中数学题；如果不是高中数学或无法判断，请返回 false。
-
-图形处理规则（非常重要）：
-- hasGeometry：如果图片中包含几何图形、函数图像、坐标系等图形，设为 true
-- geometrySvg：必须根据图片中的原始图形精确重绘为 SVG，禁止凭空想象或编造
-- 如果图片中没有图形，hasGeometry 设为 false，geometrySvg 设为 null
-
-SVG 重绘要求：
-1. 精确还原：
-   - 必须忠实还原图片中的图形，包括形状、位置、标注、虚实线等
-   - 坐标、角度、比例要与原图一致
-   - 所有文字标注（如点的名称 A/B/C、坐标值、角度等）必须完整保留
-
-2. 基本规范：
-   - viewBox="0 0 400 300"
-   - 只使用基础标签：<svg>, <line>, <circle>, <ellipse>, <path>, <polyline>, <polygon>, <rect>, <text>
-   - 禁止使用：<defs>, <marker>, <use>, <g>, <clipPath>, <mask> 等高级标签
-   - 虚线用 stroke-dasharray="5,5"
-   - 线条默认 stroke="#000" stroke-width="1.5"
-
-3. 文本标注规则：
-   - <text> 标签内容必须使用 Unicode 数学符号，禁止使用 LaTeX 格式（禁止 $...$）
-   - 分数写法：用斜杠表示，如 "π/6"、"2π/3"、"1/2"
-   - 常用符号：π ω φ θ α β γ（希腊字母）、√（根号）、x₁ x₂（下标）、x² x³（上标）
-   - 示例：<text x="100" y="180">π/6</text>
+    @staticmethod
+    def _data_url(file_bytes: bytes, filename: Optional[str]) -> str:
+        # 判断MIME类型
+        mime, _ = mimetypes.guess_type(filename or "")
+        mime = mime or "image/png"
+        # data URL 直接在 bytes 上拼接后一次解码，不再先生成 base64 str 再经 f-string 复制一遍
+        return (b"data:" + mime.encode("ascii") + b";base64," + base64.b64encode(file_bytes)).decode("ascii")
 
-4. 坐标轴与曲线：
-   - 坐标轴用 <line> 绘制，箭头用三角形 <polygon> 表示
-   - 曲线用 <polyline> 或 <path> 的 L/M 命令绘制"""
-        
-        # 如果有自定义提示词，用它替换默认说明
+    def _get_analysis_prompt(self, custom_prompt: str = None) -> str:
+        """获取分析提示词，支持自定义提示词（替换默认附加说明）"""
         if custom_prompt:
-            return f"{format_requirement}\n\n{custom_prompt}"
-        else:
-            return f"{format_requirement}\n\n{default_instructions}"
+            return f"{_FORMAT_REQUIREMENT}\n\n{custom_prompt}"
+        return _DEFAULT_ANALYSIS_PROMPT
     
     def _extract_json(self, text: str):
         """从文本中提取JSON，增强版：处理嵌套内容、控制字符等"""
-        import re
-        
         cleaned = text.strip()
         
         # 1. 处理 ```json ... ``` 格式
@@ -440,6 +619,10 @@ SVG 重绘要求：
         }
 
 
-def get_ai_service():
-    """获取AI服务实例"""
+@lru_cache
+def get_ai_service() -> AIService:
+    """
+    进程内共享一个 AIService：SDK 客户端只创建一次，
+    其内部 HTTP 连接池跨请求复用（keep-alive，免去每次 TCP + TLS 握手）
+    """
     return AIService()
@@ -0,0 +1,55 @@
+"""
+异步请求合批：短时间窗口内到达的多个请求攒成一批，交给 process_fn 一次处理，
+再把结果按顺序分发回各自的 Future。
+- 攒满 max_batch_size 立即发出；否则最早的请求等待 max_wait_time 秒后发出
+- process_fn(items) 返回与 items 等长的结果列表；元素为异常时只让对应请求失败，
+  process_fn 整体抛出异常时整批失败
+"""
+import asyncio
+from typing import Any, Awaitable, Callable, List, Optional, Tuple
+
+
+class AsyncBatchQueue:
+    def __init__(
+        self,
+        process_fn: Callable[[List[Any]], Awaitable[List[Any]]],
+        max_batch_size: int = 8,
+        max_wait_time: float = 0.1,
+    ):
+        self.process_fn = process_fn
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait_time = max_wait_time
+        self._pending: List[Tuple[Any, asyncio.Future]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+
+    async def add_request(self, item: Any) -> Any:
+        fut = asyncio.get_running_loop().create_future()
+        self._pending.append((item, fut))
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(self.max_wait_time, self._flush)
+        return await fut
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if batch:
+            asyncio.ensure_future(self._run(batch))
+
+    async def _run(self, batch: List[Tuple[Any, asyncio.Future]]) -> None:
+        try:
+            results = await self.process_fn([item for item, _ in batch])
+            if len(results) != len(batch):
+                raise RuntimeError(f"batch returned {len(results)} results for {len(batch)} requests")
+        except Exception as e:
+            results = [e] * len(batch)
+        for (_, fut), result in zip(batch, results):
+            if fut.done():
+                continue
+            if isinstance(result, BaseException):
+                fut.set_exception(result)
+            else:
+                fut.set_result(result)
@@ -1,16 +1,34 @@
 """
 验证码服务 - 生成图片验证码
+图片渲染 + PNG 编码是毫秒级 CPU 开销，预先在后台线程渲染一批 (文本, 图片) 放入池中，
+请求时直接取用；每张图片只发放一次，池空时退回同步渲染。
 """
+import hmac
+import logging
 import random
 import string
+import threading
 import time
 import base64
+from collections import deque
 from io import BytesIO
-from typing import Dict, Tuple
+from typing import Deque, Dict, Optional, Tuple
 
-# 验证码存储 (生产环境应使用 Redis)
+from utils.redis_client import get_redis, warn_local_fallback
+
+logger = logging.getLogger(__name__)
+
+# 验证码存储：配置 REDIS_URL 时存 Redis（多 worker 共享，GETDEL 原子取出），否则存进程内字典
 _captcha_store: Dict[str, Tuple[str, float]] = {}
+_REDIS_PREFIX = "captcha:"
 CAPTCHA_EXPIRE_SECONDS = 300  # 5分钟过期
+CLEANUP_INTERVAL_SECONDS = 60  # 过期清理需遍历整个存储，按间隔执行而非每次创建都执行
+
+# 预渲染池：低于一半时触发后台补充
+CAPTCHA_POOL_SIZE = 256
+_captcha_pool: Deque[Tuple[str, str]] = deque()
+_refill_lock = threading.Lock()
+_last_cleanup = 0.0
 
 
 def generate_captcha_id() -> str:
@@ -107,48 +125,90 @@ def create_captcha_svg(text: str) -> str:
     return f"data:image/svg+xml;base64,{svg_base64}"
 
 
+def _render_captcha() -> Tuple[str, str]:
+    text = generate_captcha_text()
+    return text, create_captcha_image(text)
+
+
+def _refill_pool():
+    try:
+        while len(_captcha_pool) < CAPTCHA_POOL_SIZE:
+            _captcha_pool.append(_render_captcha())
+    finally:
+        _refill_lock.release()
+
+
+def warm_captcha_pool():
+    """在后台线程补满预渲染池；已有补充线程在运行时直接返回"""
+    if not _refill_lock.acquire(blocking=False):
+        return
+    threading.Thread(target=_refill_pool, name="captcha-refill", daemon=True).start()
+
+
 def create_captcha() -> Tuple[str, str]:
     """
     创建新验证码
     返回: (captcha_id, image_base64)
     """
+    global _last_cleanup
+    try:
+        captcha_text, captcha_image = _captcha_pool.popleft()
+    except IndexError:
+        captcha_text, captcha_image = _render_captcha()
+    if len(_captcha_pool) < CAPTCHA_POOL_SIZE // 2:
+        warm_captcha_pool()
+
     captcha_id = generate_captcha_id()
-    captcha_text = generate_captcha_text()
-    captcha_image = create_captcha_image(captcha_text)
-    
-    # 存储验证码（小写存储，验证时也用小写比较）
+    # 存储验证码（大写存储，验证时也转大写比较）
+    r = get_redis()
+    if r is not None:
+        try:
+            r.set(_REDIS_PREFIX + captcha_id, captcha_text.upper(), ex=CAPTCHA_EXPIRE_SECONDS)
+            return captcha_id, captcha_image
+        except Exception as e:
+            logger.warning("Redis 写入验证码失败，改用本地存储: %s", e)
+    warn_local_fallback("验证码")
     _captcha_store[captcha_id] = (captcha_text.upper(), time.time())
     
     # 清理过期验证码
-    _cleanup_expired()
+    now = time.time()
+    if now - _last_cleanup > CLEANUP_INTERVAL_SECONDS:
+        _last_cleanup = now
+        _cleanup_expired()
     
     return captcha_id, captcha_image
 
 
 def verify_captcha(captcha_id: str, captcha_code: str) -> bool:
     """
-    验证验证码
+    验证验证码：无论对错都一次性取出作废，防止对同一验证码反复尝试
     """
     if not captcha_id or not captcha_code:
         return False
     
-    stored = _captcha_store.get(captcha_id)
-    if not stored:
+    text = _pop_captcha(captcha_id)
+    if not text:
         return False
-    
+    return hmac.compare_digest(captcha_code.upper().encode(), text.encode())
+
+
+def _pop_captcha(captcha_id: str) -> Optional[str]:
+    r = get_redis()
+    if r is not None:
+        try:
+            text = r.getdel(_REDIS_PREFIX + captcha_id)
+            if text:
+                return text
+        except Exception as e:
+            logger.warning("Redis 读取验证码失败: %s", e)
+    # Redis 写入失败时验证码落在本地存储
+    stored = _captcha_store.pop(captcha_id, None)
+    if not stored:
+        return None
     text, created_at = stored
-    
-    # 检查是否过期
     if time.time() - created_at > CAPTCHA_EXPIRE_SECONDS:
-        del _captcha_store[captcha_id]
-        return False
-    
-    # 验证成功后删除（一次性使用）
-    if captcha_code.upper() == text:
-        del _captcha_store[captcha_id]
-        return True
-    
-    return False
+        return None
+    return text
 
 
 def _cleanup_expired():
@@ -1,7 +1,13 @@
 from __future__ import annotations
 import base64
+import hashlib
+import html
+import os
+import shutil
 import subprocess
+import sys
 import tempfile
+import threading
 import uuid
 from pathlib import Path
 from typing import List, Mapping, Tuple
@@ -32,6 +38,7 @@ class ExportService:
     导出服务：
     - build_latex: 生成可编译的 LaTeX 文本。
     - compile_pdf: 调用本地 pdflatex，如果不可用则返回错误。
+    - compile_pdf_cached: 按 LaTeX + 附件内容缓存编译结果，重复导出不再调用 xelatex。
     - build_docx: 使用 python-docx 生成 Word。
     """
     def build_latex_from_template(
@@ -249,7 +256,6 @@ class ExportService:
             if not answer_text:
                 return ""
             # 尝试提取【答案】后的内容
-            import re
             match = re.search(r'【答案】\s*([A-Za-z]+)', answer_text)
             if match:
                 return match.group(1).upper()
@@ -264,7 +270,6 @@ class ExportService:
             """从答案文本中提取填空答案"""
             if not answer_text:
                 return ""
-            import re
             match = re.search(r'【答案】\s*(.+?)(?=【|$)', answer_text, re.DOTALL)
             if match:
                 return match.group(1).strip()[:50]
@@ -669,8 +674,6 @@ class ExportService:
         """
         调用 xelatex 编译，返回 (ok, path/message, log_text)
         """
-        import shutil
-
         engine = shutil.which("xelatex")
         if not engine:
             return False, "xelatex not found (please install texlive-xetex)", ""
@@ -685,19 +688,28 @@ class ExportService:
                     (tmp_path / fname).write_bytes(data)
                 cmd = [
                     engine,
-                    "-interaction=nonstopmode",
+                    "-interaction=batchmode",
                     "-halt-on-error",
                     tex_file.name,
                 ]
-                # 编译两次以解析交叉引用（如 \pageref{LastPage}）
-                subprocess.run(cmd, cwd=tmp_path, capture_output=True, text=True)
-                proc = subprocess.run(
-                    cmd,
-                    cwd=tmp_path,
-                    capture_output=True,
-                    text=True,
-                )
+                env = {**os.environ, "TEXMFVAR": str(self.TEXMFVAR_DIR)}
+                with self._compile_slots:
+                    # 含交叉引用（如 \pageref{LastPage}）时需编译两次；
+                    # 第一遍只为生成 .aux，用 -no-pdf 跳过 PDF 输出（相当于 pdflatex -draftmode）
+                    if self._needs_second_pass(latex_content):
+                        subprocess.run(cmd[:1] + ["-no-pdf"] + cmd[1:], cwd=tmp_path, capture_output=True, text=True, env=env)
+                    proc = subprocess.run(
+                        cmd,
+                        cwd=tmp_path,
+                        capture_output=True,
+                        text=True,
+                        env=env,
+                    )
                 log = proc.stdout + "\n" + proc.stderr
+                # batchmode 不向终端输出，错误信息在 .log 文件里
+                log_file = tmp_path / "paper.log"
+                if log_file.exists():
+                    log += log_file.read_text(encoding="utf-8", errors="replace")
                 pdf_file = tmp_path / "paper.pdf"
                 # 只要 PDF 存在就算成功（LaTeX 警告会导致非零返回码）
                 if pdf_file.exists():
@@ -712,6 +724,53 @@ class ExportService:
         except Exception as exc:  # pragma: no cover - unexpected
             return False, f"compile error: {exc}", str(exc)
 
+    # 同时运行的 xelatex 不超过 CPU 核数，避免并发导出互相争抢
+    _compile_slots = threading.BoundedSemaphore(os.cpu_count() or 1)
+    # 固定的 TEXMFVAR：字体 / 格式文件缓存跨次编译复用
+    TEXMFVAR_DIR = Path(tempfile.gettempdir()) / "texmf-var"
+    _CROSS_REF_RE = re.compile(r"\\(?:pageref|ref|eqref|tableofcontents|cite)\b")
+
+    @classmethod
+    def _needs_second_pass(cls, latex_content: str) -> bool:
+        return cls._CROSS_REF_RE.search(latex_content) is not None
+
+    PDF_CACHE_DIR = Path(tempfile.gettempdir()) / "paper_pdf_cache"
+    PDF_CACHE_MAX = 64
+
+    def compile_pdf_cached(self, latex_content: str, attachments: List[Tuple[str, bytes]] | None = None) -> tuple[bool, str | Path, str]:
+        """
+        带缓存的 compile_pdf：以 LaTeX 与附件内容的 sha256 为键，命中时直接返回缓存文件。
+        返回的文件归缓存所有，调用方不要 cleanup。
+        """
+        digest = hashlib.sha256(latex_content.encode("utf-8"))
+        for fname, data in attachments or []:
+            digest.update(fname.encode("utf-8"))
+            digest.update(data)
+        cached = self.PDF_CACHE_DIR / f"{digest.hexdigest()}.pdf"
+        if cached.exists():
+            os.utime(cached)  # 刷新 mtime，淘汰时按最近使用排序
+            return True, cached, ""
+
+        ok, out, log = self.compile_pdf(latex_content, attachments=attachments)
+        if not ok:
+            return ok, out, log
+        try:
+            self.PDF_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+            os.replace(out, cached)
+        except OSError:
+            # 缓存目录不可写时退化为不缓存（临时文件交由定期清理）
+            return ok, out, log
+        self._evict_pdf_cache()
+        return True, cached, log
+
+    def _evict_pdf_cache(self):
+        try:
+            files = sorted(self.PDF_CACHE_DIR.glob("*.pdf"), key=lambda p: p.stat().st_mtime)
+            for path in files[:-self.PDF_CACHE_MAX]:
+                path.unlink(missing_ok=True)
+        except OSError:
+            pass
+
     def build_docx(
         self,
         paper: orm.Paper,
@@ -835,7 +894,6 @@ class ExportService:
         # 优先使用 svg2tikz 库
         if svg2tikz is not None:
             try:
-                import sys
                 # svg2tikz 内部使用 argparse.parse_args()，会读取 sys.argv
                 # 在服务器环境下会和 uvicorn 参数冲突，需要临时替换
                 original_argv = sys.argv
@@ -1132,6 +1190,36 @@ class ExportService:
         except Exception:
             return None
 
+    _MATH_SPAN_RE = re.compile(r"\$\$(.+?)\$\$|\$(.+?)\$", re.S)
+
+    def build_katex_html(self, analysis: dict) -> str:
+        """
+        将解析结果（题干 / 选项 / 答案 / 解析）转成 HTML 片段：$...$ 包成 <span class="math inline">，
+        $$...$$ 包成 <div class="math display">，由前端 KaTeX（auto-render 或 katex.render）就地渲染。
+        JSON 预览只需要这段 HTML，不必走 xelatex 编译。
+        """
+        def render(text: str) -> str:
+            parts, pos = [], 0
+            for m in self._MATH_SPAN_RE.finditer(text):
+                parts.append(html.escape(text[pos:m.start()]).replace("\n", "<br>"))
+                if m.group(1) is not None:
+                    parts.append(f'<div class="math display">{html.escape(m.group(1))}</div>')
+                else:
+                    parts.append(f'<span class="math inline">{html.escape(m.group(2))}</span>')
+                pos = m.end()
+            parts.append(html.escape(text[pos:]).replace("\n", "<br>"))
+            return "".join(parts)
+
+        blocks = [f'<div class="question">{render(analysis.get("questionText") or "")}</div>']
+        options = analysis.get("options") or []
+        if options:
+            items = "".join(f"<li>{render(str(opt))}</li>" for opt in options)
+            blocks.append(f'<ol class="options">{items}</ol>')
+        for key, cls in (("answer", "answer"), ("explanation", "explanation")):
+            if analysis.get(key):
+                blocks.append(f'<div class="{cls}">{render(str(analysis[key]))}</div>')
+        return "\n".join(blocks)
+
     def _wrap_diagram_block(self, content: str) -> str:
         """
         将图形包裹在 minipage 中，默认居右，避免占满版心。
@@ -1,33 +1,273 @@
+import asyncio
 import json
-from typing import List, Optional
+import time
+from datetime import datetime, timezone
+from functools import lru_cache
+from itertools import islice
+from typing import Dict, List, Optional
 
+import numpy as np
 from sqlalchemy.orm import Session
 
 from config import get_settings
+from db import dialect_insert, session_scope
 from models import orm
 from models.schemas import StudentAskResponse
-from sqlalchemy import or_
+from services.semantic_cache import SemanticCache
+from services.vector_index import question_index, question_matrix
+from sqlalchemy import func, or_, select, text
 
 settings = get_settings()
 
+# SIMD（AVX2/AVX-512/NEON）距离内核，可直接处理 float16。
+# numkong 是 simsimd 的新包名，随 usearch 安装；两者不能同时加载，优先使用 numkong
 try:
-    from openai import OpenAI
+    import numkong as simsimd
+    _COSINE_METRIC = "angular"
 except ImportError:  # pragma: no cover
-    OpenAI = None
+    try:
+        import simsimd
+        _COSINE_METRIC = "cosine"
+    except ImportError:
+        simsimd = None
+
+
+def _load_openai():
+    """按需导入 openai SDK，未配置 key 时不付出导入开销"""
+    try:
+        from openai import OpenAI
+    except ImportError:  # pragma: no cover
+        return None
+    return OpenAI
+
+
+# 学生问答的语义缓存：相近问题（余弦 >= 0.95）直接复用上次结果；题库向量变化时清空
+_ask_cache = SemanticCache(threshold=0.95, ttl=300, maxsize=1024)
+# search_similar 结果缓存：预览上传的题目常与近期上传的高度相似，命中时跳过检索与回表。
+# 缓存在各 worker 进程内，写入时只清空本进程的一份；TTL 与 _ask_cache 一致，限制其他 worker 读到旧结果的时长
+_search_cache = SemanticCache(threshold=0.95, ttl=300, maxsize=1024, nbits=12, ntables=8)
+
+
+def pack_vector(vec: List[float], quantization: str = "f16") -> bytes:
+    """
+    向量 -> 字节，用于写入 QuestionEmbedding.vector。入库前先做 L2 归一化，
+    余弦相似度即点积（旧数据未归一化，查询时仍按预先算好的行范数相除，结果一致）。
+    - f16：float16，1024 维 2KB
+    - i8：对称标量量化到 int8（按本行最大绝对值缩放到 ±127），1024 维 1KB。
+      余弦相似度与整行缩放无关，读取时直接转 float32 使用，无需保存 scale
+    """
+    arr = np.asarray(vec, dtype=np.float32)
+    norm = float(np.linalg.norm(arr))
+    if norm > 0:
+        arr = arr / norm
+    if quantization == "i8":
+        peak = float(np.abs(arr).max()) if arr.size else 0.0
+        scale = 127.0 / peak if peak > 0 else 0.0
+        return np.clip(np.rint(arr * scale), -127, 127).astype(np.int8).tobytes()
+    return arr.astype("<f2").tobytes()
+
+
+def _upsert_embeddings(db: Session, items: List[tuple]) -> None:
+    """
+    一条多值 INSERT ... ON CONFLICT (question_id) DO UPDATE 写入一批 (question_id, 向量)，
+    取代逐行 merge（每行先 SELECT 再 INSERT/UPDATE）。
+    """
+    if not items:
+        return
+    kind = settings.embedding_quantization
+    stmt = dialect_insert(orm.QuestionEmbedding).values(
+        [{"question_id": qid, "vector": pack_vector(vec, kind), "quantization": kind} for qid, vec in items]
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["question_id"],
+        set_={
+            "vector": stmt.excluded.vector,
+            "quantization": stmt.excluded.quantization,
+            "embedding": None,
+            "updated_at": datetime.now(timezone.utc),
+        },
+    )
+    db.execute(stmt)
+    if _pgvector_available(db):
+        _write_pgvector(db, items)
+
+
+# pgvector 可用性（PostgreSQL 且 question_embeddings.vector_v 列存在），进程内首次检查后缓存
+_pgvector_ok: Optional[bool] = None
+_pgvector_backfilled = False
+
+
+def _pgvector_available(db: Session) -> bool:
+    global _pgvector_ok
+    if _pgvector_ok is None:
+        _pgvector_ok = False
+        bind = db.get_bind()
+        if bind.dialect.name == "postgresql":
+            # 用独立连接检查，出错时不会使调用方的事务进入 aborted 状态
+            try:
+                with bind.connect() as conn:
+                    _pgvector_ok = conn.execute(text(
+                        "SELECT 1 FROM information_schema.columns "
+                        "WHERE table_name = 'question_embeddings' AND column_name = 'vector_v'"
+                    )).first() is not None
+            except Exception as e:
+                print(f"pgvector check error: {e}")
+    return _pgvector_ok
+
+
+def _pgvector_literal(vec) -> Optional[str]:
+    """向量 -> pgvector 文本格式 '[x1,x2,...]'（L2 归一化）；维度与列不一致时返回 None"""
+    arr = np.asarray(vec, dtype=np.float32)
+    norm = float(np.linalg.norm(arr))
+    if arr.shape[0] != settings.pgvector_dim or norm == 0:
+        return None
+    return "[" + ",".join(f"{x:.6g}" for x in (arr / norm).tolist()) + "]"
+
+
+def _write_pgvector(db: Session, items: List[tuple]) -> int:
+    rows = [{"qid": qid, "v": lit} for qid, vec in items if (lit := _pgvector_literal(vec)) is not None]
+    if rows:
+        db.execute(
+            text("UPDATE question_embeddings SET vector_v = CAST(:v AS vector) WHERE question_id = :qid"),
+            rows,
+        )
+    return len(rows)
+
+
+def _backfill_pgvector(db: Session, batch_size: int = 500) -> None:
+    """
+    为加列之前写入的向量回填 vector_v。每进程首次检索时在独立会话中执行一次；
+    只选维度与列一致的行（按字节长度判断），已回填完时只是一次空查询。
+    """
+    global _pgvector_backfilled
+    _pgvector_backfilled = True
+    dim = settings.pgvector_dim
+    try:
+        while True:
+            rows = db.execute(text(
+                "SELECT question_id, vector, quantization FROM question_embeddings "
+                "WHERE vector_v IS NULL AND octet_length(vector) = "
+                "CASE WHEN quantization = 'i8' THEN :dim ELSE 2 * :dim END LIMIT :n"
+            ), {"dim": dim, "n": batch_size}).all()
+            # 全零向量无法归一化、不会被写入；一批都写不进时结束，避免反复选中同几行
+            written = _write_pgvector(db, [(qid, _unpack_row(vector, None, quant)) for qid, vector, quant in rows])
+            db.commit()
+            if not written:
+                return
+    except Exception as e:
+        db.rollback()
+        print(f"pgvector backfill error: {e}")
+
+
+def _unpack_row(vector: Optional[bytes], embedding, quantization: Optional[str] = None) -> Optional[np.ndarray]:
+    if vector:
+        if quantization == "i8":
+            # 保持 int8：常驻矩阵按 1 字节/维存放，由 SIMD 内核直接计算
+            return np.frombuffer(vector, dtype=np.int8)
+        return np.frombuffer(vector, dtype="<f2")
+    if embedding:
+        # 兼容旧数据：JSON 列表
+        return np.asarray(embedding, dtype=np.float32)
+    return None
+
+
+_FALLBACK_BLOCK_ROWS = 1024
+
+
+def _cosine_scores(matrix: np.ndarray, query: np.ndarray, norms: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    查询向量与矩阵每一行的余弦相似度（矩阵行均非零）。
+    norms 为 None 表示各行已在构建矩阵时归一化（float16 / float32），余弦即与单位查询向量的点积；
+    int8 矩阵不做归一化，norms 为预先算好的行范数
+    """
+    if norms is None:
+        q = query / np.linalg.norm(query)
+        if simsimd is not None:
+            # float16 矩阵直接交给 SIMD 点积内核，省去转 float32 的拷贝与 2 倍内存带宽；内核要求两侧类型一致
+            dtype = np.float16 if matrix.dtype == np.float16 else np.float32
+            dist = simsimd.cdist(q.astype(dtype)[None, :], matrix.astype(dtype, copy=False), metric="dot")
+            scores = np.asarray(dist, dtype=np.float32)[0]
+        else:
+            scores = _dots(matrix, q)
+        # float16 行归一化后范数有约 1e-3 的舍入误差，截断到余弦的值域
+        return np.clip(scores, -1.0, 1.0)
+    if simsimd is not None:
+        # int8 矩阵时查询向量同样做对称量化（余弦与缩放无关）
+        q = np.clip(np.rint(query * (127.0 / np.abs(query).max())), -127, 127).astype(np.int8)
+        dist = simsimd.cdist(q[None, :], matrix, metric=_COSINE_METRIC)
+        return 1.0 - np.asarray(dist)[0]
+    return _dots(matrix, query) / (norms * np.linalg.norm(query))
+
+
+def _dots(matrix: np.ndarray, query: np.ndarray) -> np.ndarray:
+    if matrix.dtype == np.float32:
+        return matrix @ query
+    # float16 / int8 矩阵按块转 float32 再做 BLAS 矩阵-向量乘，避免每次查询复制整个矩阵，
+    # 块大小使转换结果留在 CPU 缓存中
+    dots = np.empty(matrix.shape[0], dtype=np.float32)
+    for start in range(0, matrix.shape[0], _FALLBACK_BLOCK_ROWS):
+        block = matrix[start:start + _FALLBACK_BLOCK_ROWS].astype(np.float32)
+        dots[start:start + _FALLBACK_BLOCK_ROWS] = block @ query
+    return dots
+
+
+# 多 worker 时每个进程各有一份 ANN 索引 / 常驻矩阵，只随本进程的写入增量维护；
+# 以 (行数, 最近写入时间) 作为库内版本号发现其他 worker 的写入，最多每隔该秒数查询一次
+VECTOR_VERSION_CHECK_INTERVAL = 2.0
+_vector_version: Optional[tuple] = None
+_vector_version_checked = 0.0
+
+
+def _fetch_embedding_version(db: Session) -> tuple:
+    count, latest = db.execute(
+        select(func.count(), func.max(orm.QuestionEmbedding.updated_at))
+    ).one()
+    return count, latest
+
+
+def _embedding_version(db: Session) -> tuple:
+    global _vector_version, _vector_version_checked
+    now = time.monotonic()
+    if _vector_version is None or now - _vector_version_checked >= VECTOR_VERSION_CHECK_INTERVAL:
+        _vector_version = _fetch_embedding_version(db)
+        _vector_version_checked = now
+    return _vector_version
+
+
+def _adopt_version(version: tuple) -> None:
+    """
+    本进程的写入已增量同步到 ANN 索引：把写入后的版本记为当前版本，
+    下次检索不会把自己的写入当作其他 worker 的写入而全量重建
+    """
+    global _vector_version, _vector_version_checked
+    _vector_version = version
+    _vector_version_checked = time.monotonic()
+    if question_index.loaded:
+        question_index.version = version
+
+
+def _clear_caches() -> None:
+    """题目向量变化后，按旧向量得出的问答与检索结果都已失效"""
+    _ask_cache.clear()
+    _search_cache.clear()
 
 
 class RAGService:
     """
     RAG 实现（硅基流动 Embedding 版）：
     - 使用硅基流动 BGE-M3 生成向量（兼容 OpenAI API 格式）
-    - 将向量存入 question_embeddings 表（JSON）
-    - 查询时对所有向量做余弦相似度，返回 topK 关联题目
+    - 将向量以 float16 / int8 字节存入 question_embeddings 表（EMBEDDING_QUANTIZATION）
+    - PostgreSQL + pgvector 时同时写入 vector_v 列，检索走库内 HNSW 索引；
+      否则用进程内 HNSW（usearch）或对候选向量矩阵一次性计算余弦相似度，返回 topK 关联题目
     """
 
     def __init__(self):
         # 优先使用硅基流动，其次 OpenAI
         self.client = None
         self.embed_model = None
+        OpenAI = None
+        if settings.siliconflow_api_key or settings.openai_api_key:
+            OpenAI = _load_openai()
         
         # 尝试硅基流动
         if settings.siliconflow_api_key and OpenAI:
@@ -68,30 +308,20 @@ class RAGService:
                 sources=[],
             )
 
-        # 确保已有题目都有向量
-        all_questions: List[orm.Question] = db.query(orm.Question).filter(
-            or_(orm.Question.is_public == True, orm.Question.created_by != None)
-        ).all()
-        existing = {emb.question_id: emb for emb in db.query(orm.QuestionEmbedding).all()}
+        cached = _ask_cache.get(query_vec)
+        if cached is not None:
+            return cached
 
-        for q in all_questions:
-            if q.id in existing:
-                continue
-            vec = await self._get_embedding(self._build_text(q))
-            if vec:
-                db.merge(orm.QuestionEmbedding(question_id=q.id, embedding=vec))
-        db.commit()
-
-        # 重新读取全部向量
-        embeddings = {emb.question_id: emb.embedding for emb in db.query(orm.QuestionEmbedding).all()}
-
-        scored = []
-        for q in all_questions:
-            vec = embeddings.get(q.id)
-            if not vec:
-                continue
-            sim = self._cosine_similarity(query_vec, vec)
-            scored.append((sim, q))
+        # 多取一些候选，只回表这些 ID 并按题目范围过滤；缺失的向量由后台索引与 /reindex 补齐
+        hits = self._nearest(db, query_vec, top_k * 4)
+        qmap = {
+            q.id: q
+            for q in db.query(orm.Question).filter(
+                orm.Question.id.in_([qid for qid, _ in hits]),
+                or_(orm.Question.is_public == True, orm.Question.created_by != None),
+            )
+        } if hits else {}
+        scored = [(sim, qmap[qid]) for qid, sim in hits if qid in qmap]
 
         scored.sort(key=lambda x: x[0] if x[0] else 0, reverse=True)
         top = scored[:top_k]
@@ -114,10 +344,14 @@ class RAGService:
                 answer_parts.append(f"参考解答：{(q.answer or '')[:200]} ...")
         answer = "\n".join(answer_parts)
 
-        return StudentAskResponse(answer=answer, relatedQuestions=related, sources=sources)
+        response = StudentAskResponse(answer=answer, relatedQuestions=related, sources=sources)
+        _ask_cache.put(query_vec, response)
+        return response
     
-    async def search_similar(self, db: Session, question_text: str, top_k: int = 5) -> List[dict]:
-        """语义搜索题目"""
+    async def search_similar(
+        self, db: Session, question_text: str, top_k: int = 5, ef: Optional[int] = None
+    ) -> List[dict]:
+        """语义搜索题目；走 pgvector / usearch 的 HNSW 索引（见 _nearest），ef 为搜索宽度"""
         if not self.client:
             return []
         
@@ -125,22 +359,22 @@ class RAGService:
         if not query_vec:
             return []
         
-        # 获取所有题目和向量
-        all_questions = db.query(orm.Question).all()
-        embeddings = {emb.question_id: emb.embedding for emb in db.query(orm.QuestionEmbedding).all()}
+        cached = _search_cache.get(query_vec)
+        if cached is not None and cached[0] >= top_k:
+            return [dict(r) for r in cached[1][:top_k]]
         
-        scored = []
-        for q in all_questions:
-            vec = embeddings.get(q.id)
-            if not vec:
-                continue
-            sim = self._cosine_similarity(query_vec, vec)
-            if sim:
-                scored.append((sim, q))
+        hits = self._nearest(db, query_vec, top_k, ef)
+        hits = [(qid, sim) for qid, sim in hits if sim]
+        # 只回表取前 top_k 道题，而不是加载全部题目
+        qmap = {
+            q.id: q
+            for q in db.query(orm.Question).filter(orm.Question.id.in_([qid for qid, _ in hits]))
+        } if hits else {}
+        scored = [(sim, qmap[qid]) for qid, sim in hits if qid in qmap]
         
         scored.sort(key=lambda x: x[0], reverse=True)
         
-        return [
+        results = [
             {
                 "id": q.id,
                 "questionText": q.question_text,
@@ -152,6 +386,9 @@ class RAGService:
             }
             for sim, q in scored[:top_k]
         ]
+        # 连同 top_k 一起缓存：之后请求不超过该数量时可直接截取
+        _search_cache.put(query_vec, (top_k, results))
+        return [dict(r) for r in results]
     
     async def check_publish_eligibility(self, db: Session, question_id: str) -> dict:
         """
@@ -219,35 +456,44 @@ class RAGService:
                 'review_type': None
             }
         
-        # 获取当前题目向量
-        text = self._build_text(q)
-        query_vec = await self._get_embedding(text)
-        if not query_vec:
-            return {
-                'eligible': True, 'status': 'approved',
-                'reason': 'Embedding生成失败，自动通过',
-                'max_similarity': 0, 'similar_question_id': None,
-                'review_type': None
-            }
-        
-        # 只与已公开题目比较
-        public_questions = db.query(orm.Question).filter(
-            orm.Question.is_public == True,
-            orm.Question.id != question_id
-        ).all()
-        embeddings = {emb.question_id: emb.embedding for emb in db.query(orm.QuestionEmbedding).all()}
+        # 获取当前题目向量：优先用入库 / 编辑时已写入的向量，缺失时才调用 embedding 并补存
+        query_vec = self._stored_vector(db, question_id)
+        if query_vec is None:
+            query_vec = await self._get_embedding(self._build_text(q))
+            if not query_vec:
+                return {
+                    'eligible': True, 'status': 'approved',
+                    'reason': 'Embedding生成失败，自动通过',
+                    'max_similarity': 0, 'similar_question_id': None,
+                    'review_type': None
+                }
+            # 补存的是已提交题目的向量，用独立会话写入并提交，不提交调用方（编辑题目）尚未完成的事务
+            with session_scope() as bg_db:
+                self._store_embeddings(bg_db, [(q.id, query_vec)])
         
+        # 只与已公开题目比较：先取最近的若干候选，一次 IN 查询筛出其中的公开题
         max_sim = 0.0
         most_similar_id = None
-        
-        for pq in public_questions:
-            vec = embeddings.get(pq.id)
-            if not vec:
-                continue
-            sim = self._cosine_similarity(query_vec, vec)
-            if sim and sim > max_sim:
+        hits = [(qid, sim) for qid, sim in self._nearest(db, query_vec, 50) if qid != question_id and sim]
+        public_ids = {
+            qid for (qid,) in db.query(orm.Question.id).filter(
+                orm.Question.id.in_([qid for qid, _ in hits]),
+                orm.Question.is_public == True,
+            )
+        } if hits else set()
+        if not public_ids:
+            # 候选中没有公开题（公开题占比很低时），退回与全部公开题比较
+            public_ids = {
+                qid for (qid,) in db.query(orm.Question.id).filter(
+                    orm.Question.is_public == True,
+                    orm.Question.id != question_id,
+                )
+            }
+            hits = list(self._similarities(db, query_vec).items())
+        for qid, sim in hits:
+            if qid in public_ids and sim > max_sim:
                 max_sim = sim
-                most_similar_id = pq.id
+                most_similar_id = qid
         
         # 根据阈值判定
         if max_sim > 0.95:
@@ -298,21 +544,180 @@ class RAGService:
         if not vec:
             return False
         
-        db.merge(orm.QuestionEmbedding(question_id=q.id, embedding=vec))
-        db.commit()
+        self._store_embeddings(db, [(q.id, vec)])
         return True
 
-    def _cosine_similarity(self, a: List[float], b: List[float]) -> Optional[float]:
-        if not a or not b or len(a) != len(b):
+    def _store_embeddings(self, db: Session, items: List[tuple]) -> None:
+        """
+        写入 (题目 ID, 向量) 并提交，同步 ANN 索引、使常驻矩阵与结果缓存失效。
+        会提交 db，调用方需传入专用于写向量的会话。
+        """
+        if not items:
+            return
+        # 写入前索引与库内版本一致时，写入后只差本次增量，可直接沿用新版本
+        in_sync = question_index.loaded and question_index.version == _fetch_embedding_version(db)
+        _upsert_embeddings(db, items)
+        db.commit()
+        for qid, vec in items:
+            question_index.add(qid, vec)
+        question_matrix.invalidate()
+        _clear_caches()
+        if in_sync:
+            _adopt_version(_fetch_embedding_version(db))
+
+    def _stored_vector(self, db: Session, question_id: str) -> Optional[np.ndarray]:
+        row = db.query(
+            orm.QuestionEmbedding.vector,
+            orm.QuestionEmbedding.embedding,
+            orm.QuestionEmbedding.quantization,
+        ).filter(orm.QuestionEmbedding.question_id == question_id).first()
+        vec = _unpack_row(*row) if row else None
+        if vec is None or not np.any(vec):
+            return None
+        return vec.astype(np.float32)
+
+    async def index_questions_batch(self, db: Session, question_ids: List[str], batch_size: int = 64) -> int:
+        """
+        批量生成 embedding：每 batch_size 道题一次 IN 查询 + 一次 embedding 请求 + 一次提交。
+        返回成功索引的题目数。
+        """
+        if not self.client:
+            return 0
+        indexed = 0
+        it = iter(question_ids)
+        while True:
+            chunk = list(islice(it, batch_size))
+            if not chunk:
+                return indexed
+            questions = db.query(orm.Question).filter(orm.Question.id.in_(chunk)).all()
+            if not questions:
+                continue
+            vecs = await self._get_embeddings([self._build_text(q) for q in questions])
+            if not vecs:
+                continue
+            items = [(q.id, vec) for q, vec in zip(questions, vecs) if vec]
+            self._store_embeddings(db, items)
+            indexed += len(items)
+
+    def remove_question(self, db: Session, question_id: str) -> None:
+        """题目删除（已提交）后同步移出 ANN 索引"""
+        known = _vector_version
+        question_index.remove(question_id)
+        question_matrix.invalidate()
+        _clear_caches()
+        if not question_index.loaded or known is None or question_index.version != known:
+            return
+        # 与上次所见版本相比只少了本题这一行（或本题本无向量）时，说明没有其他 worker 的写入
+        count, latest = _fetch_embedding_version(db)
+        if latest == known[1] and count in (known[0], known[0] - 1):
+            _adopt_version((count, latest))
+
+    def _nearest(self, db: Session, query_vec: List[float], k: int, ef: Optional[int] = None) -> List[tuple]:
+        """
+        前 k 个 (题目 ID, 相似度)，依次尝试：
+        1. PostgreSQL + pgvector：库内 HNSW 近似检索，各 worker 无需各自加载全部向量
+        2. usearch：进程内 HNSW 索引
+        3. 常驻矩阵精确扫描
+        """
+        if len(query_vec) == settings.pgvector_dim and _pgvector_available(db):
+            hits = self._pg_top_similar(db, query_vec, k, ef)
+            if hits is not None:
+                return hits
+        if self._ann_ready(db):
+            return question_index.search(query_vec, k, ef)
+        return self._top_similar(db, query_vec, k)
+
+    def _pg_top_similar(self, db: Session, query_vec: List[float], k: int, ef: Optional[int] = None) -> Optional[List[tuple]]:
+        """pgvector 余弦距离 <=> 排序取前 k；hnsw.ef_search 只在本事务内生效。出错时返回 None 交由调用方退回"""
+        if not _pgvector_backfilled:
+            # 回填逐批提交，用独立会话，不会连带提交调用方会话中的未提交状态
+            with session_scope() as bg_db:
+                _backfill_pgvector(bg_db)
+        literal = _pgvector_literal(query_vec)
+        if literal is None:
+            return []
+        try:
+            db.execute(text(f"SET LOCAL hnsw.ef_search = {int(max(ef or settings.pgvector_ef_search, k))}"))
+            rows = db.execute(text(
+                "SELECT question_id, 1 - (vector_v <=> CAST(:q AS vector)) AS sim FROM question_embeddings "
+                "WHERE vector_v IS NOT NULL ORDER BY vector_v <=> CAST(:q AS vector) LIMIT :k"
+            ), {"q": literal, "k": k}).all()
+        except Exception as e:
+            db.rollback()
+            print(f"pgvector search error: {e}")
             return None
-        import math
+        return [(qid, float(sim)) for qid, sim in rows]
 
-        dot = sum(x * y for x, y in zip(a, b))
-        na = math.sqrt(sum(x * x for x in a))
-        nb = math.sqrt(sum(y * y for y in b))
-        if na == 0 or nb == 0:
+    def _ann_ready(self, db: Session) -> bool:
+        if not question_index.available:
+            return False
+        version = _embedding_version(db)
+        if not question_index.loaded or question_index.version != version:
+            question_index.load(self._iter_vectors(db), version)
+        return True
+
+    def _iter_vectors(self, db: Session):
+        for qid, vector, embedding, quantization in db.query(
+            orm.QuestionEmbedding.question_id,
+            orm.QuestionEmbedding.vector,
+            orm.QuestionEmbedding.embedding,
+            orm.QuestionEmbedding.quantization,
+        ):
+            vec = _unpack_row(vector, embedding, quantization)
+            if vec is not None:
+                yield qid, vec
+
+    def _scores(self, db: Session, query_vec: List[float]):
+        """
+        与常驻向量矩阵（首次使用时堆叠一次）批量计算余弦相似度，返回 (题目 ID 列表, 相似度数组)
+        （安装 simsimd 时走 SIMD 内核，否则 NumPy 矩阵乘法）。维度不一致时返回空。
+        行数较多时只返回 IVF 候选簇内题目的相似度。
+        """
+        query = np.asarray(query_vec, dtype=np.float32)
+        if not np.any(query):
+            return [], None
+        ids, matrix, norms, ivf = question_matrix.get(lambda: self._iter_vectors(db), _embedding_version(db))
+        if matrix is None or matrix.shape[1] != query.shape[0]:
+            return [], None
+        if ivf is not None:
+            # 大库先按 IVF 粗筛，只精算最近几个簇内的行
+            rows = ivf.probe(query / np.linalg.norm(query))
+            ids = [ids[i] for i in rows]
+            matrix = matrix[rows]
+            norms = norms[rows] if norms is not None else None
+        return ids, _cosine_scores(matrix, query, norms)
+
+    def _similarities(self, db: Session, query_vec: List[float]) -> Dict[str, float]:
+        ids, scores = self._scores(db, query_vec)
+        if scores is None:
+            return {}
+        return dict(zip(ids, scores.tolist()))
+
+    def _top_similar(self, db: Session, query_vec: List[float], k: int) -> List[tuple]:
+        """精确扫描的前 k 个 (题目 ID, 相似度)：argpartition 选出 k 个再排序，O(N + k log k)"""
+        ids, scores = self._scores(db, query_vec)
+        if scores is None or k <= 0:
+            return []
+        if k < len(ids):
+            top = np.argpartition(-scores, k - 1)[:k]
+        else:
+            top = np.arange(len(ids))
+        top = top[np.argsort(-scores[top])]
+        return [(ids[i], float(scores[i])) for i in top]
+
+    async def _get_embeddings(self, texts: List[str]) -> Optional[List[List[float]]]:
+        """一次请求为多段文本生成向量（硅基流动与 OpenAI 均支持 input 传列表）"""
+        if not self.client or not self.embed_model:
+            return None
+        try:
+            texts = [t[:8000] for t in texts]
+            # 同步 SDK 调用放到线程池，等待 embedding 接口期间不阻塞事件循环
+            resp = await asyncio.to_thread(self.client.embeddings.create, model=self.embed_model, input=texts)
+            # 按 index 排序，保证与输入顺序一致
+            return [d.embedding for d in sorted(resp.data, key=lambda d: d.index)]  # type: ignore
+        except Exception as e:
+            print(f"Embedding error: {e}")
             return None
-        return dot / (na * nb)
 
     async def _get_embedding(self, text: str) -> Optional[List[float]]:
         if not self.client or not self.embed_model:
@@ -320,7 +725,7 @@ class RAGService:
         try:
             # 截断过长文本
             text = text[:8000] if len(text) > 8000 else text
-            resp = self.client.embeddings.create(model=self.embed_model, input=text)
+            resp = await asyncio.to_thread(self.client.embeddings.create, model=self.embed_model, input=text)
             return resp.data[0].embedding  # type: ignore
         except Exception as e:
             print(f"Embedding error: {e}")
@@ -333,3 +738,9 @@ class RAGService:
         if q.knowledge_points:
             parts.append(" ".join(q.knowledge_points))
         return "\n".join(parts)
+
+
+@lru_cache
+def get_rag_service() -> RAGService:
+    """进程内共享一个 RAGService，避免各路由重复创建 embedding 客户端"""
+    return RAGService()
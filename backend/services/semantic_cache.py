@@ -0,0 +1,107 @@
+"""
+语义缓存：按查询向量的余弦相似度命中，而非文本完全相同。
+- 随机超平面 LSH 分桶（多张哈希表），只与同桶候选比较，查找代价与缓存大小基本无关
+- 命中条件：与缓存向量余弦相似度 >= threshold
+- 条目带 TTL，超过 maxsize 时淘汰最早写入的条目
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+
+class SemanticCache:
+    def __init__(
+        self,
+        threshold: float = 0.95,
+        ttl: float = 300,
+        maxsize: int = 1024,
+        nbits: int = 8,
+        ntables: int = 4,
+        seed: int = 0,
+    ):
+        self.threshold = threshold
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.nbits = nbits
+        self.ntables = ntables
+        self._seed = seed
+        self._planes: Optional[np.ndarray] = None  # (ntables * nbits, dim)，首次写入时按维度生成
+        self._tables: List[Dict[int, List[int]]] = [{} for _ in range(ntables)]
+        self._entries: "OrderedDict[int, tuple]" = OrderedDict()  # id -> (单位向量, 值, 过期时间)
+        self._next_id = 0
+        self._lock = threading.Lock()
+
+    def get(self, vec) -> Optional[Any]:
+        unit = self._normalize(vec)
+        if unit is None:
+            return None
+        now = time.time()
+        with self._lock:
+            if self._planes is None or self._planes.shape[1] != unit.shape[0]:
+                return None
+            best, best_sim = None, self.threshold
+            seen = set()
+            for table, key in zip(self._tables, self._keys(unit)):
+                for eid in table.get(key, ()):
+                    if eid in seen:
+                        continue
+                    seen.add(eid)
+                    entry = self._entries.get(eid)
+                    if entry is None or entry[2] < now:
+                        continue
+                    sim = float(entry[0] @ unit)
+                    if sim >= best_sim:
+                        best, best_sim = entry[1], sim
+            return best
+
+    def put(self, vec, value: Any) -> None:
+        unit = self._normalize(vec)
+        if unit is None:
+            return
+        with self._lock:
+            if self._planes is None or self._planes.shape[1] != unit.shape[0]:
+                rng = np.random.default_rng(self._seed)
+                self._planes = rng.standard_normal((self.ntables * self.nbits, unit.shape[0])).astype(np.float32)
+                self._clear_locked()
+            eid = self._next_id
+            self._next_id += 1
+            self._entries[eid] = (unit, value, time.time() + self.ttl)
+            for table, key in zip(self._tables, self._keys(unit)):
+                table.setdefault(key, []).append(eid)
+            while len(self._entries) > self.maxsize:
+                self._evict_locked(next(iter(self._entries)))
+
+    def clear(self) -> None:
+        with self._lock:
+            self._clear_locked()
+
+    def _keys(self, unit: np.ndarray) -> List[int]:
+        bits = (self._planes @ unit) > 0
+        weights = 1 << np.arange(self.nbits)
+        return [int(bits[i * self.nbits:(i + 1) * self.nbits] @ weights) for i in range(self.ntables)]
+
+    def _evict_locked(self, eid: int) -> None:
+        unit, _, _ = self._entries.pop(eid)
+        for table, key in zip(self._tables, self._keys(unit)):
+            bucket = table.get(key)
+            if bucket is None:
+                continue
+            bucket.remove(eid)
+            if not bucket:
+                del table[key]
+
+    def _clear_locked(self) -> None:
+        self._entries.clear()
+        for table in self._tables:
+            table.clear()
+
+    @staticmethod
+    def _normalize(vec) -> Optional[np.ndarray]:
+        arr = np.asarray(vec, dtype=np.float32)
+        norm = float(np.linalg.norm(arr))
+        if arr.ndim != 1 or norm == 0:
+            return None
+        return arr / norm
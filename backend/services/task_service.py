@@ -2,14 +2,21 @@
 任务管理服务：用于异步 AI 分析任务
 """
 from __future__ import annotations
+import json
+import logging
+import time
 import uuid
 import asyncio
 import threading
 from datetime import datetime, timezone
-from typing import Optional, Dict, Any
-from dataclasses import dataclass, field
+from typing import AsyncIterator, Optional, Dict, Any
+from dataclasses import asdict, dataclass, field
 from enum import Enum
 
+from utils.redis_client import get_async_redis, get_redis, warn_local_fallback
+
+logger = logging.getLogger(__name__)
+
 
 class TaskStatus(str, Enum):
     PENDING = "pending"
@@ -29,27 +36,62 @@ class Task:
     progress: int = 0  # 0-100
 
 
+TASK_TTL_SECONDS = 3600
+CLEANUP_INTERVAL_SECONDS = 300
+_REDIS_PREFIX = "task:"
+
+
+def _dump(task: Task) -> str:
+    data = asdict(task)
+    data["status"] = task.status.value
+    data["created_at"] = task.created_at.isoformat()
+    data["updated_at"] = task.updated_at.isoformat()
+    return json.dumps(data, ensure_ascii=False)
+
+
+def _load(raw: str) -> Task:
+    data = json.loads(raw)
+    data["status"] = TaskStatus(data["status"])
+    data["created_at"] = datetime.fromisoformat(data["created_at"])
+    data["updated_at"] = datetime.fromisoformat(data["updated_at"])
+    return Task(**data)
+
+
 class TaskManager:
     """
-    内存任务管理器
-    - 简单高效，适合单服务器部署
-    - 服务重启会丢失任务状态（可接受，因为 AI 分析需要重试）
+    任务管理器
+    - 配置 REDIS_URL 时任务状态存 Redis（SET task:{id} EX 3600），多 worker 共享：
+      创建任务与轮询状态落在不同 worker 也能查到；每次更新同时 PUBLISH 到 task:{id}:events，
+      供 SSE 推送
+    - 未配置或 Redis 不可用时退回进程内存储，仅适用于单 worker
+    - 服务重启会丢失进程内任务状态（可接受，因为 AI 分析需要重试）
     """
     
     def __init__(self):
         self._tasks: Dict[str, Task] = {}
         self._lock = threading.Lock()
+        self._last_cleanup = time.time()
     
     def create_task(self) -> str:
         """创建新任务，返回 task_id"""
         task_id = str(uuid.uuid4())
-        task = Task(id=task_id)
-        with self._lock:
-            self._tasks[task_id] = task
+        self._save(Task(id=task_id))
+        now = time.time()
+        if now - self._last_cleanup > CLEANUP_INTERVAL_SECONDS:
+            self._last_cleanup = now
+            self.cleanup_old_tasks(max_age_hours=TASK_TTL_SECONDS / 3600)
         return task_id
     
     def get_task(self, task_id: str) -> Optional[Task]:
         """获取任务"""
+        r = get_redis()
+        if r is not None:
+            try:
+                raw = r.get(_REDIS_PREFIX + task_id)
+                if raw:
+                    return _load(raw)
+            except Exception as e:
+                logger.warning("Redis 读取任务失败: %s", e)
         with self._lock:
             return self._tasks.get(task_id)
     
@@ -57,21 +99,72 @@ class TaskManager:
                       result: Dict[str, Any] = None, 
                       error: str = None,
                       progress: int = None):
-        """更新任务状态"""
+        """更新任务状态（每个任务只由创建它的后台协程更新，读-改-写无需加锁）"""
+        task = self.get_task(task_id)
+        if task:
+            task.status = status
+            task.updated_at = datetime.now(timezone.utc)
+            if result is not None:
+                task.result = result
+            if error is not None:
+                task.error = error
+            if progress is not None:
+                task.progress = progress
+            self._save(task)
+
+    async def watch(self, task_id: str, timeout: float = 600) -> AsyncIterator[Task]:
+        """
+        依次产出任务的每次状态变化，直到完成 / 失败或超时。
+        Redis 下订阅 task:{id}:events 由更新方推送；否则在进程内每 0.5 秒检查一次。
+        """
+        deadline = time.monotonic() + timeout
+        r = get_async_redis()
+        pubsub = None
+        if r is not None:
+            try:
+                pubsub = r.pubsub()
+                # 先订阅再读当前状态，避免两步之间的更新丢失
+                await pubsub.subscribe(f"{_REDIS_PREFIX}{task_id}:events")
+            except Exception as e:
+                logger.warning("Redis 订阅任务失败，改为本地轮询: %s", e)
+                pubsub = None
+        try:
+            task = self.get_task(task_id)
+            last = None
+            while task is not None and time.monotonic() < deadline:
+                if (task.status, task.progress) != last:
+                    last = (task.status, task.progress)
+                    yield task
+                if task.status in (TaskStatus.COMPLETED, TaskStatus.FAILED):
+                    return
+                if pubsub is not None:
+                    msg = await pubsub.get_message(ignore_subscribe_messages=True, timeout=5.0)
+                    task = _load(msg["data"]) if msg else self.get_task(task_id)
+                else:
+                    await asyncio.sleep(0.5)
+                    task = self.get_task(task_id)
+        finally:
+            if pubsub is not None:
+                await pubsub.aclose()
+
+    def _save(self, task: Task) -> None:
+        r = get_redis()
+        if r is not None:
+            try:
+                raw = _dump(task)
+                pipe = r.pipeline(transaction=False)
+                pipe.set(_REDIS_PREFIX + task.id, raw, ex=TASK_TTL_SECONDS)
+                pipe.publish(f"{_REDIS_PREFIX}{task.id}:events", raw)
+                pipe.execute()
+                return
+            except Exception as e:
+                logger.warning("Redis 写入任务失败，改用本地存储: %s", e)
+        warn_local_fallback("异步任务状态")
         with self._lock:
-            task = self._tasks.get(task_id)
-            if task:
-                task.status = status
-                task.updated_at = datetime.now(timezone.utc)
-                if result is not None:
-                    task.result = result
-                if error is not None:
-                    task.error = error
-                if progress is not None:
-                    task.progress = progress
+            self._tasks[task.id] = task
     
-    def cleanup_old_tasks(self, max_age_hours: int = 2):
-        """清理超过指定时间的任务"""
+    def cleanup_old_tasks(self, max_age_hours: float = 2):
+        """清理超过指定时间的进程内任务（Redis 中的任务由 EX 自动过期）"""
         now = datetime.now(timezone.utc)
         with self._lock:
             old_ids = [
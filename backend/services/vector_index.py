@@ -0,0 +1,236 @@
+"""
+题目向量的进程内索引：
+- VectorIndex：HNSW 近似最近邻索引（基于 usearch）。首次检索时从 question_embeddings 全量构建，
+  之后随本进程的 index_question / 删除题目增量维护，库内版本变化（其他 worker 写入）时全量重建；
+  查询为 O(log N) 图搜索。
+  未安装 usearch 时 available 为 False，调用方退回精确扫描
+- EmbeddingMatrix：精确扫描用的常驻 (N, d) 矩阵及各行范数，向量变化时失效、下次查询时重建。
+  行数较多时同时训练 IVF 粗聚类（√N 个中心），查询只对最近 nprobe 个簇内的行精算
+"""
+import threading
+from collections import Counter
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+try:
+    from usearch.index import Index
+except ImportError:  # pragma: no cover
+    Index = None
+
+
+class VectorIndex:
+    def __init__(self, connectivity: int = 16, expansion_add: int = 64, expansion_search: int = 64):
+        self.connectivity = connectivity
+        self.expansion_add = expansion_add
+        self.expansion_search = expansion_search
+        self.loaded = False
+        # 构建时对应的库内向量版本（见 RAGService._embedding_version），版本变化后需重建
+        self.version = None
+        self._index = None
+        self._ndim: Optional[int] = None
+        # usearch 只接受整数 key，维护题目 ID <-> key 的映射
+        self._keys: Dict[str, int] = {}
+        self._ids: Dict[int, str] = {}
+        self._next_key = 0
+        self._lock = threading.Lock()
+
+    @property
+    def available(self) -> bool:
+        return Index is not None
+
+    def load(self, items: Iterable[Tuple[str, np.ndarray]], version=None):
+        """
+        用 (question_id, 向量) 全量重建索引。整批一次性插入（usearch 多线程并行建图），
+        而不是逐条 add；维度取占多数者，全零向量剔除（与 EmbeddingMatrix 一致）
+        """
+        items = [(qid, np.asarray(vec, dtype=np.float32)) for qid, vec in items]
+        with self._lock:
+            self._index = None
+            self._ndim = None
+            self.version = version
+            self._keys.clear()
+            self._ids.clear()
+            self._next_key = 0
+            if items:
+                ndim = Counter(vec.shape[0] for _, vec in items).most_common(1)[0][0]
+                items = [(qid, vec) for qid, vec in items if vec.shape[0] == ndim and np.any(vec)]
+                self._create_locked(ndim)
+            if items:
+                self._index.add(np.arange(len(items), dtype=np.uint64), np.stack([vec for _, vec in items]))
+                for key, (qid, _) in enumerate(items):
+                    self._keys[qid] = key
+                    self._ids[key] = qid
+                self._next_key = len(items)
+            self.loaded = True
+
+    def add(self, question_id: str, vec) -> None:
+        if not self.loaded:
+            # 尚未构建时不必增量维护，首次检索会全量加载
+            return
+        with self._lock:
+            self._add_locked(question_id, vec)
+
+    def remove(self, question_id: str) -> None:
+        with self._lock:
+            key = self._keys.pop(question_id, None)
+            if key is None:
+                return
+            self._ids.pop(key, None)
+            self._index.remove(key)
+
+    def search(self, vec, k: int, ef: Optional[int] = None) -> List[Tuple[str, float]]:
+        """返回 [(question_id, 余弦相似度)]，按相似度降序"""
+        query = np.asarray(vec, dtype=np.float32)
+        with self._lock:
+            if self._index is None or len(self._index) == 0 or query.shape[0] != self._ndim:
+                return []
+            # ef 越大召回越高、越慢；需不小于 k
+            self._index.expansion_search = max(ef or self.expansion_search, k)
+            matches = self._index.search(query, min(k, len(self._index)))
+            self._index.expansion_search = self.expansion_search
+            return [
+                (self._ids[int(key)], 1.0 - float(dist))
+                for key, dist in zip(matches.keys, matches.distances)
+                if int(key) in self._ids
+            ]
+
+    def _add_locked(self, question_id: str, vec) -> None:
+        arr = np.asarray(vec, dtype=np.float32)
+        if self._index is None:
+            self._create_locked(arr.shape[0])
+        if arr.shape[0] != self._ndim or not np.any(arr):
+            return
+        old = self._keys.pop(question_id, None)
+        if old is not None:
+            self._ids.pop(old, None)
+            self._index.remove(old)
+        key = self._next_key
+        self._next_key += 1
+        self._keys[question_id] = key
+        self._ids[key] = question_id
+        self._index.add(key, arr)
+
+
+    def _create_locked(self, ndim: int) -> None:
+        self._ndim = ndim
+        self._index = Index(
+            ndim=ndim,
+            metric="cos",
+            dtype="f16",
+            connectivity=self.connectivity,
+            expansion_add=self.expansion_add,
+            expansion_search=self.expansion_search,
+        )
+
+
+class IVFPartition:
+    """
+    倒排文件（IVF）粗划分：球面 k-means 得到 k 个中心，每行归入最近中心。
+    查询先与 k 个中心比较，只返回最近 nprobe 个簇的行号，扫描量约为 N·nprobe/k。
+    """
+
+    def __init__(self, matrix: np.ndarray, norms: Optional[np.ndarray], nprobe: int = 8, iters: int = 10, seed: int = 0):
+        n = matrix.shape[0]
+        k = max(1, int(np.sqrt(n)))
+        self.nprobe = nprobe
+        rng = np.random.default_rng(seed)
+        # 训练集取 32·k 行即可稳定聚类，不必用全量
+        sample = rng.choice(n, size=min(n, 32 * k), replace=False)
+        train = matrix[sample].astype(np.float32)
+        if norms is not None:
+            train /= norms[sample, None]
+        centroids = train[rng.choice(train.shape[0], size=k, replace=False)]
+        for _ in range(iters):
+            assign = np.argmax(train @ centroids.T, axis=1)
+            for c in range(k):
+                members = train[assign == c]
+                if len(members):
+                    mean = members.sum(axis=0)
+                    centroids[c] = mean / (np.linalg.norm(mean) or 1.0)
+        self.centroids = centroids
+        # 全量分配按块计算，避免一次生成 N×k 的大矩阵
+        assign = np.empty(n, dtype=np.int64)
+        for start in range(0, n, 8192):
+            block = matrix[start:start + 8192].astype(np.float32)
+            assign[start:start + 8192] = np.argmax(block @ centroids.T, axis=1)
+        order = np.argsort(assign, kind="stable")
+        bounds = np.searchsorted(assign[order], np.arange(k + 1))
+        self.lists = [order[bounds[c]:bounds[c + 1]] for c in range(k)]
+
+    def probe(self, query: np.ndarray) -> np.ndarray:
+        """返回候选行号（升序，便于顺序读取矩阵）"""
+        scores = self.centroids @ query
+        nprobe = min(self.nprobe, len(self.lists))
+        top = np.argpartition(-scores, nprobe - 1)[:nprobe]
+        return np.sort(np.concatenate([self.lists[c] for c in top]))
+
+
+class MatrixSnapshot(NamedTuple):
+    ids: List[str]
+    matrix: Optional[np.ndarray]
+    norms: Optional[np.ndarray]
+    ivf: Optional[IVFPartition]
+
+
+class EmbeddingMatrix:
+    def __init__(self, ivf_min_rows: int = 10000, nprobe: int = 8):
+        # 行数不足 ivf_min_rows 时全量精算已足够快，不建 IVF
+        self.ivf_min_rows = ivf_min_rows
+        self.nprobe = nprobe
+        self._snapshot: Optional[MatrixSnapshot] = None
+        self._version = None
+        self._lock = threading.Lock()
+
+    def get(self, load: Callable[[], Iterable[Tuple[str, np.ndarray]]], version=None) -> MatrixSnapshot:
+        """
+        返回 (题目 ID 列表, 矩阵, 行范数, IVF)；未构建时调用 load() 读取全部向量堆叠一次。
+        浮点矩阵各行归一化后返回（行范数为 None），int8 矩阵附带预先算好的行范数，
+        查询时余弦相似度只需一次矩阵乘法。version 与构建时不同（其他 worker 写入了向量）时重建。
+        """
+        with self._lock:
+            if self._snapshot is None or self._version != version:
+                self._version = version
+                ids, matrix = self._build(load())
+                norms = ivf = None
+                if matrix is not None:
+                    if matrix.dtype == np.int8:
+                        # int8 量化行若归一化会损失精度，保留原值并记录行范数
+                        norms = np.linalg.norm(matrix.astype(np.float32), axis=1)
+                    else:
+                        # 浮点行构建时归一化一次（保持原类型），查询时余弦即点积，不必每次除以范数
+                        unit = matrix.astype(np.float32)
+                        unit /= np.linalg.norm(unit, axis=1, keepdims=True)
+                        matrix = unit.astype(matrix.dtype, copy=False)
+                    if matrix.shape[0] >= self.ivf_min_rows:
+                        ivf = IVFPartition(matrix, norms, nprobe=self.nprobe)
+                self._snapshot = MatrixSnapshot(ids, matrix, norms, ivf)
+            return self._snapshot
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._snapshot = None
+
+    @staticmethod
+    def _build(items: Iterable[Tuple[str, np.ndarray]]):
+        items = list(items)
+        if not items:
+            return [], None
+        # 模型更换后可能残留其他维度的旧向量，只保留占多数的维度；全零向量无法计算余弦，剔除
+        ndim = Counter(vec.shape[0] for _, vec in items).most_common(1)[0][0]
+        items = [(qid, vec) for qid, vec in items if vec.shape[0] == ndim and np.any(vec)]
+        if not items:
+            return [], None
+        # 全部为同一紧凑类型（f16 / i8 量化）时保持原类型，混合时统一为 float32
+        dtype = items[0][1].dtype
+        if dtype not in (np.float16, np.int8) or any(vec.dtype != dtype for _, vec in items):
+            dtype = np.float32
+        matrix = np.empty((len(items), ndim), dtype=dtype)
+        for i, (_, vec) in enumerate(items):
+            matrix[i] = vec
+        return [qid for qid, _ in items], matrix
+
+
+# 进程内共享：RAGService 的所有实例使用同一份索引
+question_index = VectorIndex()
+question_matrix = EmbeddingMatrix()
@@ -1,4 +1,4 @@
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Request, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
 from sqlalchemy.orm import Session
@@ -6,6 +6,7 @@ from sqlalchemy.orm import Session
 from config import get_settings
 from db import get_db
 from models import orm
+from utils.security import get_user_by_username
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/login")
 settings = get_settings()
@@ -24,7 +25,7 @@ def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(
             raise credentials_exception
     except JWTError:
         raise credentials_exception
-    user = db.query(orm.User).filter(orm.User.username == username).first()
+    user = get_user_by_username(db, username)
     if user is None:
         raise credentials_exception
     return user
@@ -37,3 +38,14 @@ def require_role(allowed: list[str]):
         return user
 
     return checker
+
+
+# 常用角色校验在模块级创建一次，各路由共用同一依赖对象（同一请求内 FastAPI 只解析一次）
+require_teacher = require_role(["teacher", "admin"])
+require_admin = require_role(["admin"])
+
+
+def require_db_ready(request: Request):
+    """数据库初始化（建表/补列）完成前，业务接口返回 503。"""
+    if not getattr(request.app.state, "db_ready", True):
+        raise HTTPException(status_code=503, detail="Service is starting, please retry later")
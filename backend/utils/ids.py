@@ -0,0 +1,23 @@
+"""
+主键 ID 生成：UUIDv7（RFC 9562）
+前 48 位为毫秒时间戳，新记录按时间递增，B-tree 插入集中在索引尾部，
+减少页分裂；字符串格式与 uuid4 相同，仍存入 String(36) 列。
+"""
+import os
+import time
+import uuid
+
+
+def uuid7() -> uuid.UUID:
+    ts_ms = time.time_ns() // 1_000_000
+    rand = int.from_bytes(os.urandom(10), "big")
+    value = (ts_ms & ((1 << 48) - 1)) << 80
+    value |= 0x7 << 76                         # version 7
+    value |= ((rand >> 62) & 0xFFF) << 64      # rand_a（12 位）
+    value |= 0b10 << 62                        # RFC 4122 variant
+    value |= rand & ((1 << 62) - 1)            # rand_b（62 位）
+    return uuid.UUID(int=value)
+
+
+def new_id() -> str:
+    return str(uuid7())
@@ -0,0 +1,69 @@
+"""
+按 (created_at, id) 倒序的游标（keyset）分页：
+每页都是一次索引定位 + 顺序读取，代价与翻到第几页无关，不像 OFFSET 需要扫描并丢弃前面的行。
+"""
+import base64
+from datetime import datetime
+from typing import Optional, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy import func, select, tuple_
+
+
+def encode_cursor(created_at: datetime, row_id: str) -> str:
+    raw = f"{created_at.isoformat()}|{row_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, str]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        ts, row_id = raw.split("|", 1)
+        return datetime.fromisoformat(ts), row_id
+    except Exception:
+        raise HTTPException(status_code=400, detail="invalid cursor")
+
+
+def paginate(query, model, limit: int, cursor: Optional[str] = None, offset: int = 0):
+    """
+    返回 (本页行, 下一页游标)。传入 cursor 时走 keyset，否则退回 offset（兼容按页码跳转）。
+    """
+    if cursor:
+        created_at, row_id = decode_cursor(cursor)
+        query = query.filter(tuple_(model.created_at, model.id) < tuple_(created_at, row_id))
+        offset = 0
+    rows = (
+        query.order_by(model.created_at.desc(), model.id.desc())
+        .offset(offset)
+        .limit(limit)
+        .all()
+    )
+    next_cursor = None
+    if len(rows) == limit and rows[-1].created_at is not None:
+        next_cursor = encode_cursor(rows[-1].created_at, rows[-1].id)
+    return rows, next_cursor
+
+
+def _count(query, model) -> int:
+    # 直接 SELECT count(*) FROM 表 WHERE ...，不像 Query.count() 那样把整条 SELECT 包成子查询
+    stmt = select(func.count()).select_from(model)
+    if query.whereclause is not None:
+        stmt = stmt.where(query.whereclause)
+    return query.session.execute(stmt).scalar_one()
+
+
+def paginate_with_total(query, model, limit: int, cursor: Optional[str] = None, offset: int = 0):
+    """
+    同 paginate，另返回过滤条件下的总行数：(本页行, 下一页游标, 总数)。
+    offset 翻页时用 count(*) OVER () 随本页一并取回，一次查询、一次扫描；
+    cursor 翻页时游标条件会缩小窗口范围，仍单独 COUNT。
+    """
+    if cursor:
+        total = _count(query, model)
+        rows, next_cursor = paginate(query, model, limit, cursor)
+        return rows, next_cursor, total
+    rows, next_cursor = paginate(query.add_columns(func.count().over().label("_total")), model, limit, offset=offset)
+    if rows:
+        return rows, next_cursor, rows[0]._total
+    # 页码超出范围时窗口为空，补一次 COUNT
+    return rows, next_cursor, _count(query, model) if offset else 0
@@ -0,0 +1,72 @@
+"""
+可选的 Redis 连接：配置了 REDIS_URL 且安装了 redis 包时返回进程内共享的客户端，
+否则返回 None，调用方退回进程内存储（仅适用于单 worker 部署）。
+"""
+import logging
+import os
+
+from config import get_settings
+
+try:
+    import redis
+    import redis.asyncio as aioredis
+except ImportError:  # pragma: no cover - optional dependency
+    redis = None
+    aioredis = None
+
+logger = logging.getLogger(__name__)
+
+settings = get_settings()
+_client = None
+_async_client = None
+
+
+def get_redis():
+    global _client
+    if _client is None and redis is not None and settings.redis_url:
+        # 连接池惰性建立；超时设短，Redis 不可用时尽快退回本地存储
+        _client = redis.Redis.from_url(
+            settings.redis_url,
+            decode_responses=True,
+            socket_timeout=1,
+            socket_connect_timeout=1,
+        )
+    return _client
+
+
+def get_async_redis():
+    """
+    asyncio 版客户端，用于需要长时间等待的操作（如 pub/sub 订阅），不阻塞事件循环。
+    不设 socket_timeout：订阅连接空闲等待消息是正常状态
+    """
+    global _async_client
+    if _async_client is None and aioredis is not None and settings.redis_url:
+        _async_client = aioredis.Redis.from_url(
+            settings.redis_url,
+            decode_responses=True,
+            socket_connect_timeout=1,
+        )
+    return _async_client
+
+
+_fallback_warned = set()
+
+
+def warn_local_fallback(feature: str) -> None:
+    """
+    feature 退回进程内存储时告警，每个功能只告警一次：多 worker 部署下其他 worker 读不到这些数据
+    （如任务轮询落在别的 worker 上返回 404）。单 worker 且未配置 Redis 属正常情况，不告警。
+    """
+    if feature in _fallback_warned:
+        return
+    if _client is None and _worker_count() <= 1:
+        return
+    _fallback_warned.add(feature)
+    logger.warning("%s已退回进程内存储，多个 worker 之间不共享；请检查 REDIS_URL 与 Redis 服务", feature)
+
+
+def _worker_count() -> int:
+    try:
+        return int(os.environ.get("WEB_CONCURRENCY") or 1)
+    except ValueError:
+        return 1
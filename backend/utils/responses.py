@@ -0,0 +1,43 @@
+"""
+JSON 响应类：安装 orjson 时用 ORJSONResponse（序列化快 3~5 倍，原生支持 datetime / UUID），
+否则退回标准库 json，datetime 同样按 ISO 8601 输出，调用方无需手动 isoformat()。
+"""
+import json
+from datetime import date, datetime
+from typing import Iterable, Iterator
+
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+    from fastapi.responses import ORJSONResponse as FastJSONResponse
+
+    def json_bytes(content) -> bytes:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY)
+except ImportError:  # pragma: no cover - optional dependency
+    def _default(obj):
+        if isinstance(obj, (datetime, date)):
+            return obj.isoformat()
+        raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+    def json_bytes(content) -> bytes:
+        return json.dumps(content, ensure_ascii=False, separators=(",", ":"), default=_default).encode("utf-8")
+
+    class FastJSONResponse(JSONResponse):
+        def render(self, content) -> bytes:
+            return json_bytes(content)
+
+
+def stream_json_list(head: dict, key: str, items: Iterable) -> Iterator[bytes]:
+    """
+    逐块输出 {**head, key: [items...]}：每个元素单独序列化后立即交给响应，
+    不必先把整页拼成一个大 dict / bytes。items 可为惰性生成器
+    """
+    prefix = json_bytes(head)[:-1]
+    yield prefix + (b"," if len(prefix) > 1 else b"") + json_bytes(key) + b":["
+    for i, item in enumerate(items):
+        yield (b"," if i else b"") + json_bytes(item)
+    yield b"]}"
+
+
+__all__ = ["FastJSONResponse", "json_bytes", "stream_json_list"]
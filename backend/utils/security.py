@@ -3,14 +3,32 @@ from typing import Optional
 
 from jose import JWTError, jwt
 from passlib.context import CryptContext
+from sqlalchemy import lambda_stmt, select
 from sqlalchemy.orm import Session
 
 from config import get_settings
 from models import orm
 
-pwd_context = CryptContext(schemes=["pbkdf2_sha256"], deprecated="auto")
+try:
+    import argon2  # noqa: F401  passlib 的 argon2 后端
+except ImportError:  # pragma: no cover - optional dependency
+    argon2 = None
+
+# 新口令使用 Argon2id（未安装 argon2-cffi 时仍用 pbkdf2_sha256）；
+# 旧的 pbkdf2 哈希照常校验，登录成功后透明升级为 argon2
+pwd_context = CryptContext(
+    schemes=["argon2", "pbkdf2_sha256"] if argon2 else ["pbkdf2_sha256"],
+    deprecated="auto",
+    argon2__type="ID",
+    argon2__time_cost=2,
+    argon2__memory_cost=65536,
+    argon2__parallelism=1,
+)
 settings = get_settings()
 
+# 用户不存在时也做一次等价的校验，使登录耗时与用户名是否存在无关
+_DUMMY_HASH = pwd_context.hash("dummy-password")
+
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
@@ -20,14 +38,28 @@ def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
 
 
+def get_user_by_username(db: Session, username: str) -> Optional[orm.User]:
+    # lambda_stmt 按 lambda 代码位置缓存语句构造与编译结果，username 作为绑定参数传入
+    stmt = lambda_stmt(lambda: select(orm.User).where(orm.User.username == username).limit(1))
+    return db.execute(stmt).scalars().first()
+
+
 def authenticate_user(db: Session, username: str, password: str) -> Optional[orm.User]:
-    user = db.query(orm.User).filter(orm.User.username == username).first()
-    if not user:
-        return None
-    if not user.password_hash:
+    user = get_user_by_username(db, username)
+    if not user or not user.password_hash:
+        pwd_context.verify(password, _DUMMY_HASH)
         return None
-    if not verify_password(password, user.password_hash):
+    # 每次都完整计算 KDF（不缓存验证结果），否则命中缓存与未命中的耗时差会泄露口令是否刚被验证过
+    ok, new_hash = pwd_context.verify_and_update(password, user.password_hash)
+    if not ok:
         return None
+    if new_hash:
+        try:
+            user.password_hash = new_hash
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            print(f"口令哈希升级失败: {e}")
     return user
 
 
@@ -213,6 +213,7 @@ export const questionApi = {
   preview: async (file: File, opts?: { includeAnswer?: boolean; includeExplanation?: boolean; customPrompt?: string }): Promise<{
     analysis?: Record<string, unknown>;
     latex?: string;
+    katexHtml?: string;
     svgPng?: string | null;
     similarQuestions?: Array<{ id: string; questionText: string; similarity: number; difficulty?: string }>;
   }> => {
@@ -273,6 +274,7 @@ export const questionApi = {
     result?: {
       analysis?: Record<string, unknown>;
       latex?: string;
+      katexHtml?: string;
       svgPng?: string | null;
       similarQuestions?: Array<{ id: string; questionText: string; similarity: number; difficulty?: string }>;
     };